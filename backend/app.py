@@ -7,10 +7,16 @@ from flask_babel import Babel
 from flask_migrate import Migrate
 
 from models import db
+# 定义在 utils 中的数据表和索引，导入后注册到 db.metadata，db.create_all() 和迁移
+# 自动生成不依赖蓝图的导入顺序
+from utils.job_queue import DetectionJob
+from utils.detection_objects import DetectionObject
+from utils.history import history_index
 from routes.api import api_bp
 from routes.auth import auth_bp
 from routes.detection import detection_bp
 from routes.users import users_bp
+from utils.inference_backends import parse_backend_overrides
 
 # 加载环境变量
 load_dotenv()
@@ -24,11 +30,83 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URI', 'sqlite:///app.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt_dev_key')
+    # API 密钥验证缓存：有效期（秒）、最多缓存的密钥数；使用记录批量写入的间隔（秒）
+    app.config['API_KEY_CACHE_TTL'] = float(os.environ.get('API_KEY_CACHE_TTL', 60))
+    app.config['API_KEY_CACHE_ENTRIES'] = int(os.environ.get('API_KEY_CACHE_ENTRIES', 10000))
+    app.config['API_KEY_USAGE_FLUSH_INTERVAL'] = float(os.environ.get('API_KEY_USAGE_FLUSH_INTERVAL', 10))
+    # 认证用户快照缓存：有效期（秒）、最多缓存的用户数
+    app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 30))
+    app.config['USER_CACHE_ENTRIES'] = int(os.environ.get('USER_CACHE_ENTRIES', 10000))
     app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', 'uploads')
     app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 10 * 1024 * 1024))  # 10MB
     app.config['MODEL_FOLDER'] = os.environ.get('MODEL_FOLDER', 'models')
     app.config['DEFAULT_MODEL'] = os.environ.get('DEFAULT_MODEL', 'yolov8s')
     app.config['DEFAULT_CONFIDENCE'] = float(os.environ.get('DEFAULT_CONFIDENCE', 0.25))
+    app.config['SAVE_UPLOADED_IMAGES'] = os.environ.get('SAVE_UPLOADED_IMAGES', 'true').lower() == 'true'
+    # 结果图像默认懒绘制（首次访问时生成），磁盘缓存上限（MB）
+    app.config['RESULT_RENDER_MODE'] = os.environ.get('RESULT_RENDER_MODE', 'lazy')
+    app.config['RESULT_CACHE_MAX_MB'] = int(os.environ.get('RESULT_CACHE_MAX_MB', 512))
+    # 检测结果缓存：进程内LRU，DETECTION_CACHE_DIR 非空时启用磁盘二级缓存
+    app.config['DETECTION_CACHE_ENABLED'] = os.environ.get('DETECTION_CACHE_ENABLED', 'true').lower() == 'true'
+    app.config['DETECTION_CACHE_ENTRIES'] = int(os.environ.get('DETECTION_CACHE_ENTRIES', 1024))
+    app.config['DETECTION_CACHE_TTL'] = int(os.environ.get('DETECTION_CACHE_TTL', 3600))
+    app.config['DETECTION_CACHE_DIR'] = os.environ.get('DETECTION_CACHE_DIR', '')
+    app.config['DETECTION_CACHE_DISK_MAX_MB'] = int(os.environ.get('DETECTION_CACHE_DISK_MAX_MB', 256))
+    # 检测历史延迟写入：达到条数或间隔（秒）时批量插入；worker 退出时是否写入剩余记录
+    app.config['HISTORY_WRITE_BEHIND'] = os.environ.get('HISTORY_WRITE_BEHIND', 'false').lower() == 'true'
+    app.config['HISTORY_FLUSH_SIZE'] = int(os.environ.get('HISTORY_FLUSH_SIZE', 100))
+    app.config['HISTORY_FLUSH_INTERVAL'] = float(os.environ.get('HISTORY_FLUSH_INTERVAL', 1))
+    app.config['HISTORY_FLUSH_ON_SHUTDOWN'] = os.environ.get('HISTORY_FLUSH_ON_SHUTDOWN', 'true').lower() == 'true'
+    # 异步检测任务：运行超时后重新排队，最大重试次数，长轮询最长等待时间（秒）
+    app.config['JOB_STALE_SECONDS'] = int(os.environ.get('JOB_STALE_SECONDS', 600))
+    app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    app.config['JOB_MAX_WAIT_SECONDS'] = float(os.environ.get('JOB_MAX_WAIT_SECONDS', 30))
+    # 启动时预加载并预热的模型，例如 "yolov8n,yolov8s"
+    app.config['PRELOAD_MODELS'] = [m.strip() for m in os.environ.get('PRELOAD_MODELS', '').split(',') if m.strip()]
+    app.config['MODEL_WARMUP_SIZES'] = os.environ.get('MODEL_WARMUP_SIZES', '640')
+    # 推理后端：auto（优先 OpenVINO，其次 ONNX Runtime，最后 PyTorch）、openvino、onnx 或 torch，
+    # 可按模型覆盖，例如 "yolov8x:onnx,yolov8n:torch"
+    app.config['INFERENCE_BACKEND'] = os.environ.get('INFERENCE_BACKEND', 'auto').lower()
+    app.config['INFERENCE_BACKEND_OVERRIDES'] = parse_backend_overrides(os.environ.get('INFERENCE_BACKEND_OVERRIDES', ''))
+    # 模型内存预算（MB），超出时淘汰最近最少使用且未固定的模型，0 表示不限制
+    app.config['MODEL_MEMORY_BUDGET_MB'] = int(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0))
+    # 批量推理：合并同一模型的并发请求（需要 gunicorn 使用多线程 worker 才能形成批次）
+    app.config['BATCH_INFERENCE_ENABLED'] = os.environ.get('BATCH_INFERENCE_ENABLED', 'false').lower() == 'true'
+    app.config['BATCH_MAX_SIZE'] = int(os.environ.get('BATCH_MAX_SIZE', 8))
+    app.config['BATCH_MAX_WAIT_MS'] = float(os.environ.get('BATCH_MAX_WAIT_MS', 10))
+    # 批量检测接口单次请求最多处理的图像数（请求总大小仍受 MAX_CONTENT_LENGTH 限制）
+    app.config['BATCH_MAX_IMAGES'] = int(os.environ.get('BATCH_MAX_IMAGES', 500))
+    # 图像URL下载：每个主机的连接池大小、连接/读取/总超时（秒）、批量检测时并发下载数；大小上限沿用 MAX_CONTENT_LENGTH
+    app.config['URL_FETCH_POOL_SIZE'] = int(os.environ.get('URL_FETCH_POOL_SIZE', 10))
+    app.config['URL_FETCH_CONNECT_TIMEOUT'] = float(os.environ.get('URL_FETCH_CONNECT_TIMEOUT', 3))
+    app.config['URL_FETCH_READ_TIMEOUT'] = float(os.environ.get('URL_FETCH_READ_TIMEOUT', 10))
+    app.config['URL_FETCH_TOTAL_TIMEOUT'] = float(os.environ.get('URL_FETCH_TOTAL_TIMEOUT', 30))
+    app.config['URL_FETCH_CONCURRENCY'] = int(os.environ.get('URL_FETCH_CONCURRENCY', 8))
+    # 大图解码方式：reduced 按模型输入尺寸缩小解码 JPEG（仅用于推理，有预处理或需要立即
+    # 绘制结果图像时仍按原尺寸解码），full 始终按原尺寸解码
+    app.config['DECODE_MODE'] = os.environ.get('DECODE_MODE', 'reduced').lower()
+    app.config['MODEL_INPUT_SIZE'] = int(os.environ.get('MODEL_INPUT_SIZE', 640))
+    # 多模型对比：单次请求最多对比的模型数、并发推理的线程数
+    app.config['COMPARE_MAX_MODELS'] = int(os.environ.get('COMPARE_MAX_MODELS', 5))
+    app.config['COMPARE_MAX_WORKERS'] = int(os.environ.get('COMPARE_MAX_WORKERS', 3))
+    # 分块推理的默认参数：分块边长（像素）、相邻分块重叠比例、每批推理的分块数
+    app.config['TILE_SIZE'] = int(os.environ.get('TILE_SIZE', 640))
+    app.config['TILE_OVERLAP'] = float(os.environ.get('TILE_OVERLAP', 0.2))
+    app.config['TILE_BATCH_SIZE'] = int(os.environ.get('TILE_BATCH_SIZE', 8))
+    # 视频检测：默认每隔多少帧采样一次、场景变化阈值（直方图 Bhattacharyya 距离）、最多处理的帧数
+    app.config['VIDEO_SAMPLE_EVERY'] = int(os.environ.get('VIDEO_SAMPLE_EVERY', 5))
+    app.config['VIDEO_SCENE_THRESHOLD'] = float(os.environ.get('VIDEO_SCENE_THRESHOLD', 0.3))
+    app.config['VIDEO_MAX_FRAMES'] = int(os.environ.get('VIDEO_MAX_FRAMES', 18000))
+    # 级联模型（model=auto）：依次尝试的模型，以及升级到下一级的条件——置信度低于
+    # CASCADE_LOW_CONFIDENCE 的框占比超过上限、没有检测结果、物体数达到密集场景阈值（0 表示不检查）
+    app.config['CASCADE_STAGES'] = [m.strip() for m in os.environ.get('CASCADE_STAGES', 'yolov8n,yolov8m').split(',') if m.strip()]
+    app.config['CASCADE_LOW_CONFIDENCE'] = float(os.environ.get('CASCADE_LOW_CONFIDENCE', 0.5))
+    app.config['CASCADE_MAX_LOW_CONFIDENCE_RATIO'] = float(os.environ.get('CASCADE_MAX_LOW_CONFIDENCE_RATIO', 0.3))
+    app.config['CASCADE_ESCALATE_ON_EMPTY'] = os.environ.get('CASCADE_ESCALATE_ON_EMPTY', 'true').lower() == 'true'
+    app.config['CASCADE_CROWDED_OBJECTS'] = int(os.environ.get('CASCADE_CROWDED_OBJECTS', 30))
+    # 本机模型服务（model_server.py）的 Unix socket，配置后 web worker 不加载模型，推理请求转发给模型服务
+    app.config['MODEL_SERVER_SOCKET'] = os.environ.get('MODEL_SERVER_SOCKET', '')
+    app.config['MODEL_SERVER_TIMEOUT'] = float(os.environ.get('MODEL_SERVER_TIMEOUT', 30))
     app.config['BABEL_DEFAULT_LOCALE'] = 'en'
     app.config['BABEL_TRANSLATION_DIRECTORIES'] = 'translations'
     
@@ -54,6 +132,13 @@ def create_app():
         from flask import request
         return request.accept_languages.best_match(['en', 'zh', 'es', 'fr', 'de', 'ja'])
     
+    # 预加载模型：gunicorn preload_app 模式下在 master 进程中执行，worker 直接继承预热好的模型；
+    # 使用模型服务时由模型服务加载
+    if app.config['PRELOAD_MODELS'] and not app.config['MODEL_SERVER_SOCKET']:
+        from utils.detection_utils import preload_models, parse_warmup_sizes
+        with app.app_context():
+            preload_models(app.config['PRELOAD_MODELS'], parse_warmup_sizes(app.config['MODEL_WARMUP_SIZES']))
+    
     @app.route('/')
     def index():
         return {'message': 'ObjectDetectAI API is running'}
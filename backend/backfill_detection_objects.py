@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""为已有的检测历史补写 detection_objects 表
+
+用法：
+    python backfill_detection_objects.py --chunk-size 1000
+
+按记录 id 分块处理，每块一个事务；已经有物体行的记录会跳过，中断后可以
+用 --start-id 从输出的最后一个 id 继续。
+"""
+
+import sys
+import argparse
+
+def main():
+    parser = argparse.ArgumentParser(description='补写检测物体表')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='每个事务处理的检测记录数')
+    parser.add_argument('--start-id', type=int, default=0, help='从大于该 id 的记录开始')
+    parser.add_argument('--limit', type=int, default=None, help='最多处理的检测记录数')
+    args = parser.parse_args()
+    
+    from app import create_app
+    from utils.detection_objects import backfill_detection_objects
+    
+    app = create_app()
+    total_detections = 0
+    total_objects = 0
+    with app.app_context():
+        for last_id, detections, objects in backfill_detection_objects(args.chunk_size, args.start_id, args.limit):
+            total_detections += detections
+            total_objects += objects
+            print(f"Backfilled up to id {last_id}: {detections} detections, {objects} objects")
+    
+    print(f"Done: {total_detections} detections, {total_objects} objects")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
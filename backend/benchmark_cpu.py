@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""CPU 规划基准测试：扫描不同的 worker 数 x 线程数组合并记录吞吐
+
+用法：
+    python benchmark_cpu.py --model yolov8s --duration 20 --output models/cpu_benchmark.json
+
+将结果文件路径配置为 CPU_BENCHMARK_FILE 后，规划器会在核心数相同的主机上
+直接采用吞吐最高的组合。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from utils.cpu_planner import make_plan
+
+def candidate_threads(effective_cores):
+    """每个 worker 的线程数候选：1, 2, 4, ... 直到全部核心"""
+    threads = []
+    value = 1
+    while value < effective_cores:
+        threads.append(value)
+        value *= 2
+    threads.append(effective_cores)
+    return threads
+
+def _run_worker(index, plan, weights, imgsz, duration, barrier, queue):
+    from utils.cpu_planner import apply_plan
+    apply_plan(plan, index)
+
+    from ultralytics import YOLO
+    model = YOLO(weights)
+    image = np.random.randint(0, 255, (imgsz, imgsz, 3), dtype=np.uint8)
+    model(image, verbose=False)  # 预热
+
+    # 所有 worker 加载完模型后同时开始计时
+    barrier.wait()
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start_time = time.perf_counter()
+        model(image, verbose=False)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    queue.put(latencies)
+
+def run_candidate(plan, weights, imgsz, duration):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(plan['workers'])
+    queue = ctx.Queue()
+    processes = [
+        ctx.Process(target=_run_worker, args=(i, plan, weights, imgsz, duration, barrier, queue))
+        for i in range(plan['workers'])
+    ]
+    for process in processes:
+        process.start()
+    latencies = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    all_latencies = np.concatenate([np.array(items) for items in latencies])
+    return {
+        "workers": plan['workers'],
+        "threads": plan['torch_intra_op_threads'],
+        "pin": plan['pin'],
+        "images": int(len(all_latencies)),
+        "throughput": round(len(all_latencies) / duration, 2),
+        "latency_ms": {
+            "p50": round(float(np.percentile(all_latencies, 50)), 2),
+            "p95": round(float(np.percentile(all_latencies, 95)), 2)
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="扫描 worker 数和线程数组合，记录推理吞吐")
+    parser.add_argument('--model', default=os.environ.get('DEFAULT_MODEL', 'yolov8s'))
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--duration', type=float, default=20, help="每个组合的测试时长（秒）")
+    parser.add_argument('--pin', action='store_true', help="同时测试绑核")
+    parser.add_argument('--output', default=os.environ.get('CPU_BENCHMARK_FILE') or
+                        os.path.join(os.environ.get('MODEL_FOLDER', 'models'), 'cpu_benchmark.json'))
+    args = parser.parse_args()
+
+    weights = os.path.join(os.environ.get('MODEL_FOLDER', 'models'), f"{args.model}.pt")
+    if not os.path.exists(weights):
+        weights = f"{args.model}.pt"
+
+    effective_cores = make_plan()['effective_cores']
+    results = []
+    for threads in candidate_threads(effective_cores):
+        for pin in ((False, True) if args.pin else (False,)):
+            plan = make_plan(threads_per_worker=threads, pin=pin)
+            print(f"Benchmarking {plan['workers']} workers x {threads} threads (pin={pin})...")
+            result = run_candidate(plan, weights, args.imgsz, args.duration)
+            print(f"  {result['throughput']} images/s, p95 {result['latency_ms']['p95']}ms")
+            results.append(result)
+
+    best = max(results, key=lambda item: item['throughput'])
+    with open(args.output, 'w') as f:
+        json.dump({
+            "effective_cores": effective_cores,
+            "model": args.model,
+            "imgsz": args.imgsz,
+            "duration": args.duration,
+            "results": results,
+            "best": best
+        }, f, indent=2)
+    print(f"Best: {best['workers']} workers x {best['threads']} threads, {best['throughput']} images/s")
+    print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -31,6 +31,30 @@ MODELS = [
     'yolov8x.pt',  # YOLOv8 XLarge
 ]
 
+# 是否额外导出 OpenVINO 模型（需要安装 openvino）
+EXPORT_OPENVINO = os.getenv('EXPORT_OPENVINO', 'false').lower() == 'true'
+
+def export_model(model_path):
+    """将PyTorch模型导出为ONNX（以及可选的OpenVINO）格式，供CPU推理后端使用"""
+    formats = ['onnx']
+    if EXPORT_OPENVINO:
+        formats.append('openvino')
+
+    for fmt in formats:
+        suffix = '.onnx' if fmt == 'onnx' else '_openvino_model'
+        target = model_path.parent / f"{model_path.stem}{suffix}"
+        if target.exists():
+            logger.info(f"{fmt} 模型 {target.name} 已存在，跳过导出")
+            continue
+
+        logger.info(f"导出 {model_path.name} 为 {fmt} 格式...")
+        try:
+            # 导出文件写在权重文件旁边；两种格式都使用动态输入（批大小和尺寸），
+            # 以支持批量推理和不同的推理分辨率
+            YOLO(str(model_path)).export(format=fmt, dynamic=True)
+        except Exception as e:
+            logger.error(f"导出模型 {model_path.name} 为 {fmt} 时出错: {str(e)}")
+
 def download_models():
     """下载YOLOv8模型到指定目录"""
     # 确保模型目录存在
@@ -45,6 +69,7 @@ def download_models():
         # 检查模型是否已存在
         if model_path.exists():
             logger.info(f"模型 {model_name} 已存在，跳过下载")
+            export_model(model_path)
             continue
         
         logger.info(f"下载模型 {model_name}...")
@@ -62,6 +87,8 @@ def download_models():
                 logger.error(f"模型文件不存在: {model_file}")
                 
             logger.info(f"模型 {model_name} 下载完成")
+            if model_path.exists():
+                export_model(model_path)
         except Exception as e:
             logger.error(f"下载模型 {model_name} 时出错: {str(e)}")
     
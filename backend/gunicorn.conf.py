@@ -0,0 +1,56 @@
+# gunicorn 配置文件
+import os
+import sys
+import json
+
+# gunicorn 在读取配置文件之后才把工作目录加入 sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.cpu_planner import plan_from_env, thread_env, apply_plan
+
+# 根据可用核心和 cgroup 配额统一规划 worker 数和每个 worker 的推理线程数；
+# 显式设置 GUNICORN_WORKERS / CPU_THREADS_PER_WORKER 时以配置为准
+cpu_plan = plan_from_env()
+os.environ['CPU_PLAN'] = json.dumps(cpu_plan)
+
+# OpenMP / MKL 的线程池大小需要在导入 torch 之前确定
+for name, value in thread_env(cpu_plan).items():
+    os.environ.setdefault(name, value)
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = cpu_plan['workers']
+
+# 推理线程数决定 worker 数，请求并发由每个 worker 的线程提供，
+# 慢请求（流式响应、长轮询）不会阻塞同一 worker 上的其他请求
+worker_class = 'gthread'
+threads = cpu_plan['http_threads']
+
+# 配置了预加载模型时，在 master 进程中创建应用（加载并预热模型）后再 fork，
+# 各 worker 通过写时复制共享只读的模型权重
+preload_app = bool(os.environ.get('PRELOAD_MODELS', '').strip())
+
+# 预加载时 master 启动较慢，避免 worker 在预热期间被判定为超时
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+def when_ready(server):
+    server.log.info(
+        f"CPU plan ({cpu_plan['source']}): {cpu_plan['workers']} workers x "
+        f"{cpu_plan['torch_intra_op_threads']} threads on {cpu_plan['effective_cores']} cores, "
+        f"{cpu_plan['http_threads']} request threads per worker"
+    )
+    if preload_app:
+        server.log.info("Models preloaded and warmed up before forking workers")
+
+def pre_fork(server, worker):
+    # 为新 worker 分配一个未被占用的槽位，绑核时按槽位选择核心组
+    used = {getattr(w, 'cpu_slot', None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in range(len(used) + 1) if slot not in used)
+
+def post_fork(server, worker):
+    # 使用模型服务时 web worker 不推理，不导入 torch
+    apply_plan(cpu_plan, worker.cpu_slot, torch_threads=not os.environ.get('MODEL_SERVER_SOCKET'))
+
+def worker_exit(server, worker):
+    # 延迟写入模式下，worker 退出前写入队列中的检测历史
+    from utils.history_writer import close_history_writer
+    close_history_writer()
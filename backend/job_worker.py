@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import signal
+import socket
+import argparse
+import threading
+import multiprocessing
+
+from utils.cpu_planner import plan_from_env, thread_env
+
+def run_worker(worker_index, plan):
+    """单个 worker 进程：按 CPU 规划设置线程数，创建应用并循环领取任务"""
+    from utils.cpu_planner import apply_plan
+    apply_plan(plan, worker_index)
+    
+    from app import create_app
+    from utils.job_queue import worker_loop
+    
+    app = create_app()
+    stop_event = threading.Event()
+    
+    # 收到终止信号后执行完当前任务再退出
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+    
+    with app.app_context():
+        worker_loop(f"{socket.gethostname()}-{os.getpid()}", stop_event=stop_event)
+
+def main():
+    parser = argparse.ArgumentParser(description='异步检测任务 worker')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('JOB_WORKERS', 2)),
+                        help='推理 worker 进程数')
+    args = parser.parse_args()
+    
+    # 按 worker 数平分可用核心，避免多个进程的推理线程互相抢占
+    plan = plan_from_env(workers=args.workers)
+    for name, value in thread_env(plan).items():
+        os.environ.setdefault(name, value)
+    
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(i, plan), name=f"job-worker-{i}")
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    
+    def shutdown(*_):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    
+    for process in processes:
+        process.join()
+    
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
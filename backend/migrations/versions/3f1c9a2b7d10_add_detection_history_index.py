@@ -0,0 +1,27 @@
+"""add (user_id, created_at, id) index for detection history
+
+Revision ID: 3f1c9a2b7d10
+Revises: 
+Create Date: 2026-10-18 14:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a2b7d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 历史记录按 (created_at, id) 游标分页，每页只需在索引上做一次范围扫描
+    op.create_index(
+        'ix_detection_user_created_id', 'detection', ['user_id', 'created_at', 'id'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_detection_user_created_id', table_name='detection')
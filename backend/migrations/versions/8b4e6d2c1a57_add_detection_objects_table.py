@@ -0,0 +1,52 @@
+"""add detection_objects table
+
+Revision ID: 8b4e6d2c1a57
+Revises: 3f1c9a2b7d10
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d2c1a57'
+down_revision = '3f1c9a2b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'detection_objects',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('detection_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('class_id', sa.Integer(), nullable=False),
+        sa.Column('class_name', sa.String(length=64), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=False),
+        sa.Column('x1', sa.Float(), nullable=False),
+        sa.Column('y1', sa.Float(), nullable=False),
+        sa.Column('x2', sa.Float(), nullable=False),
+        sa.Column('y2', sa.Float(), nullable=False),
+        sa.Column('area', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['detection_id'], ['detection.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_detection_objects_detection_id', 'detection_objects', ['detection_id'], unique=False)
+    op.create_index(
+        'ix_detection_objects_user_class_conf', 'detection_objects', ['user_id', 'class_name', 'confidence'], unique=False
+    )
+    op.create_index(
+        'ix_detection_objects_user_created', 'detection_objects', ['user_id', 'created_at', 'detection_id'], unique=False
+    )
+    # 已有记录的物体行由 backfill_detection_objects.py 分块补写
+
+
+def downgrade():
+    op.drop_index('ix_detection_objects_user_created', table_name='detection_objects')
+    op.drop_index('ix_detection_objects_user_class_conf', table_name='detection_objects')
+    op.drop_index('ix_detection_objects_detection_id', table_name='detection_objects')
+    op.drop_table('detection_objects')
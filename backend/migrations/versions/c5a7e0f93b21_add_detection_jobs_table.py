@@ -0,0 +1,51 @@
+"""add detection_jobs table
+
+Revision ID: c5a7e0f93b21
+Revises: 8b4e6d2c1a57
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a7e0f93b21'
+down_revision = '8b4e6d2c1a57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'detection_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('model_name', sa.String(length=50), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=False),
+        sa.Column('result_format', sa.String(length=16), nullable=False),
+        sa.Column('preprocessing_json', sa.Text(), nullable=True),
+        sa.Column('image_path', sa.String(length=255), nullable=False),
+        sa.Column('result_json', sa.Text(), nullable=True),
+        sa.Column('result_path', sa.String(length=255), nullable=True),
+        sa.Column('processing_time', sa.Float(), nullable=True),
+        sa.Column('detection_id', sa.Integer(), nullable=True),
+        sa.Column('error', sa.String(length=255), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('worker', sa.String(length=64), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_detection_jobs_user_id', 'detection_jobs', ['user_id'], unique=False)
+    # worker 按状态和创建时间领取任务
+    op.create_index('ix_detection_jobs_status_created', 'detection_jobs', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_detection_jobs_status_created', table_name='detection_jobs')
+    op.drop_index('ix_detection_jobs_user_id', table_name='detection_jobs')
+    op.drop_table('detection_jobs')
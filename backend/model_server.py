@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""本机模型服务：统一持有所有模型和推理线程
+
+Web worker 配置 MODEL_SERVER_SOCKET 后，通过 Unix socket 发送检测请求，
+图像像素通过共享内存传递；模型只在本进程中加载一份，所有 worker 的请求
+在这里统一组批。
+"""
+
+import os
+import sys
+import signal
+import argparse
+import socketserver
+
+import numpy as np
+
+# 模型服务是每台主机唯一的组批点，默认启用批量推理
+os.environ.setdefault('BATCH_INFERENCE_ENABLED', 'true')
+
+from app import create_app
+from utils.cpu_planner import plan_from_env, apply_plan, current_settings
+from utils.model_client import send_message, recv_message, attach_shared_memory
+from utils.batch_scheduler import get_batch_stats
+from utils.detection_utils import (
+    YOLO_MODELS, get_model, run_inference_batch, extract_detections, get_readiness, get_model_stats
+)
+
+class ModelRequestHandler(socketserver.BaseRequestHandler):
+    """处理一个 web worker 线程的长连接"""
+
+    def setup(self):
+        self.shm = None
+
+    def finish(self):
+        if self.shm is not None:
+            self.shm.close()
+
+    def handle(self):
+        with self.server.app.app_context():
+            while True:
+                try:
+                    message = recv_message(self.request)
+                except (ConnectionError, OSError):
+                    return
+
+                try:
+                    response = self.dispatch(message)
+                except Exception as e:
+                    print(f"Error handling model server request: {e}")
+                    response = {"error": str(e)}
+                send_message(self.request, response)
+
+    def dispatch(self, message):
+        op = message.get('op')
+        if op == 'detect':
+            return self.detect(message)
+        if op == 'status':
+            return get_readiness()
+        if op == 'stats':
+            stats = get_batch_stats()
+            stats['enabled'] = self.server.app.config.get('BATCH_INFERENCE_ENABLED', False)
+            return {"models": get_model_stats(), "batching": stats}
+        if op == 'cpu':
+            return {"plan": self.server.cpu_plan, "process": current_settings()}
+        return {"error": f"Unknown operation: {op}"}
+
+    def _attach(self, name):
+        # 每个客户端线程复用同一块共享内存，只在名称变化（缓冲区扩容）时重新映射
+        if self.shm is None or self.shm.name != name:
+            if self.shm is not None:
+                self.shm.close()
+                self.shm = None
+            self.shm = attach_shared_memory(name)
+        return self.shm
+
+    def detect(self, message):
+        model_name = message['model']
+        if model_name not in YOLO_MODELS:
+            model_name = 'yolov8s'  # 与 get_model 的回退一致
+        model = get_model(model_name)
+
+        shm = self._attach(message['shm'])
+        images = [
+            np.ndarray(frame['shape'], dtype=frame['dtype'], buffer=shm.buf, offset=frame['offset'])
+            for frame in message['frames']
+        ]
+        try:
+            results = run_inference_batch(model_name, model, images, message['confidence'])
+            response = {
+                "model": model_name,
+                "names": results[0].names if results else model.names,
+                "results": [extract_detections(result).tolist() for result in results]
+            }
+        finally:
+            # 释放对共享内存的引用，缓冲区扩容时才能关闭旧的映射
+            del images
+        return response
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, app, cpu_plan=None):
+        self.app = app
+        self.cpu_plan = cpu_plan
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, ModelRequestHandler)
+        os.chmod(socket_path, 0o660)
+
+def main():
+    parser = argparse.ArgumentParser(description='本机模型服务')
+    parser.add_argument('--socket', default=os.environ.get('MODEL_SERVER_SOCKET', '/tmp/objectdetect-models.sock'),
+                        help='Unix socket 路径')
+    args = parser.parse_args()
+
+    # 本进程持有全部推理线程，按单个 worker 规划
+    cpu_plan = plan_from_env(workers=1)
+    apply_plan(cpu_plan, 0)
+
+    # 本进程就是模型服务，推理在进程内执行（create_app 会按配置预加载模型）
+    os.environ.pop('MODEL_SERVER_SOCKET', None)
+    app = create_app()
+
+    server = ModelServer(args.socket, app, cpu_plan)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Model server listening on {args.socket}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""生成 YOLOv8 的 INT8 量化模型并输出精度/延迟/内存对比报告
+
+用法：
+    python quantize_models.py --calibration-dir data/calibration --models yolov8n,yolov8s
+
+量化模型保存为 MODEL_FOLDER 下的 <模型>-int8.onnx，报告写入
+MODEL_FOLDER/int8_report.json。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from ultralytics import YOLO
+except ImportError:
+    print("Error: ultralytics package not found. Please install using: pip install ultralytics")
+    sys.exit(1)
+
+from utils.inference_backends import select_backend
+from utils.quantization import (
+    int8_model_name, int8_weights_name, list_calibration_images, quantize_onnx_model,
+    detection_agreement, resident_memory_bytes
+)
+from utils.model_registry import path_bytes
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 模型路径
+MODEL_DIR = Path(os.getenv('MODEL_FOLDER', 'models'))
+
+def export_fp32_onnx(model_name):
+    """确保存在 FP32 ONNX 模型（量化的输入）"""
+    onnx_path = MODEL_DIR / f"{model_name}.onnx"
+    if not onnx_path.exists():
+        weights = MODEL_DIR / f"{model_name}.pt"
+        logger.info(f"导出 {weights.name} 为 ONNX 格式...")
+        YOLO(str(weights) if weights.exists() else f"{model_name}.pt").export(format='onnx', dynamic=True)
+        if not onnx_path.exists():
+            # 自动下载的权重会导出到当前目录
+            Path(f"{model_name}.onnx").replace(onnx_path)
+    return onnx_path
+
+def _evaluate(model_path, image_paths, confidence, imgsz, queue):
+    """在独立进程中评估模型，常驻内存的测量不受其他模型影响"""
+    baseline = resident_memory_bytes()
+    model = YOLO(model_path, task='detect')
+    model(image_paths[0], imgsz=imgsz, conf=confidence, verbose=False)  # 预热
+
+    detections = []
+    latencies = []
+    for path in image_paths:
+        start_time = time.perf_counter()
+        result = model(path, imgsz=imgsz, conf=confidence, verbose=False)[0]
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        detections.append(result.boxes.data.cpu().numpy()[:, [0, 1, 2, 3, -2, -1]])
+
+    queue.put({
+        "detections": detections,
+        "latencies": latencies,
+        "resident_bytes": resident_memory_bytes() - baseline
+    })
+
+def evaluate(model_path, image_paths, confidence, imgsz):
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_evaluate, args=(str(model_path), image_paths, confidence, imgsz, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+def summarize(model_path, evaluation):
+    latencies = np.array(evaluation['latencies'])
+    return {
+        "path": str(model_path),
+        "file_bytes": path_bytes(str(model_path)) if os.path.exists(model_path) else None,
+        "resident_bytes": evaluation['resident_bytes'],
+        "latency_ms": {
+            "mean": round(float(latencies.mean()), 2),
+            "p50": round(float(np.percentile(latencies, 50)), 2),
+            "p95": round(float(np.percentile(latencies, 95)), 2)
+        }
+    }
+
+def quantize_models(model_names, calibration_dir, eval_dir, max_images, confidence, imgsz, report_path):
+    calibration_images = list_calibration_images(calibration_dir, max_images)
+    if not calibration_images:
+        logger.error(f"校准目录 {calibration_dir} 中没有图像")
+        return None
+    eval_images = list_calibration_images(eval_dir, max_images) if eval_dir else calibration_images
+
+    report = {}
+    if report_path.exists():
+        report = json.loads(report_path.read_text())
+
+    for model_name in model_names:
+        int8_path = MODEL_DIR / int8_weights_name(f"{model_name}.pt")
+        try:
+            fp32_onnx = export_fp32_onnx(model_name)
+            logger.info(f"使用 {len(calibration_images)} 张图像量化 {model_name}...")
+            quantize_onnx_model(str(fp32_onnx), str(int8_path), calibration_images, imgsz)
+        except Exception as e:
+            logger.error(f"量化模型 {model_name} 时出错: {str(e)}")
+            continue
+
+        # 与服务实际会加载的 FP32 模型对比
+        backend, fp32_path = select_backend(str(MODEL_DIR), f"{model_name}.pt")
+        logger.info(f"评估 {model_name} ({backend}) 与 {int8_path.name}，共 {len(eval_images)} 张图像...")
+        fp32 = evaluate(fp32_path, eval_images, confidence, imgsz)
+        int8 = evaluate(int8_path, eval_images, confidence, imgsz)
+
+        entry = {
+            "model": model_name,
+            "fp32_backend": backend,
+            "images": len(eval_images),
+            "calibration_images": len(calibration_images),
+            "confidence": confidence,
+            "imgsz": imgsz,
+            "fp32": summarize(fp32_path, fp32),
+            "int8": summarize(int8_path, int8),
+            "agreement": {
+                "iou_50": detection_agreement(zip(fp32['detections'], int8['detections']), 0.5),
+                "iou_75": detection_agreement(zip(fp32['detections'], int8['detections']), 0.75)
+            }
+        }
+        entry["speedup"] = round(entry['fp32']['latency_ms']['mean'] / entry['int8']['latency_ms']['mean'], 2)
+        report[int8_model_name(model_name)] = entry
+
+        logger.info(
+            f"{int8_model_name(model_name)}: AP50 一致性 {entry['agreement']['iou_50']['ap']}, "
+            f"延迟 {entry['fp32']['latency_ms']['mean']}ms -> {entry['int8']['latency_ms']['mean']}ms "
+            f"(x{entry['speedup']}), 内存 {entry['fp32']['resident_bytes'] // 2**20}MB -> "
+            f"{entry['int8']['resident_bytes'] // 2**20}MB"
+        )
+
+    report_path.write_text(json.dumps(report, indent=2))
+    logger.info(f"报告已写入 {report_path}")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="生成 INT8 量化模型并对比 FP32 模型")
+    parser.add_argument('--calibration-dir', required=True, help="校准图像目录")
+    parser.add_argument('--eval-dir', help="评估图像目录，默认使用校准图像")
+    parser.add_argument('--models', default='yolov8n,yolov8s', help="逗号分隔的模型名称")
+    parser.add_argument('--max-images', type=int, default=200, help="最多使用的图像数量")
+    parser.add_argument('--confidence', type=float, default=0.25)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--report', default=str(MODEL_DIR / 'int8_report.json'), help="报告路径")
+    args = parser.parse_args()
+
+    model_names = [name.strip() for name in args.models.split(',') if name.strip()]
+    quantize_models(model_names, args.calibration_dir, args.eval_dir, args.max_images,
+                    args.confidence, args.imgsz, Path(args.report))
+
+if __name__ == "__main__":
+    main()
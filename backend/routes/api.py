@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_babel import gettext as _
 
+from utils.detection_utils import get_readiness
+from utils.cpu_planner import get_cpu_plan, current_settings
+from utils.model_client import get_model_client, ModelServerError
+
 api_bp = Blueprint('api', __name__)
 
 @api_bp.route('/info', methods=['GET'])
@@ -66,4 +70,33 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "version": "1.0.0"
-    }), 200 
\ No newline at end of file
+    }), 200 
+
+@api_bp.route('/ready', methods=['GET'])
+def readiness_check():
+    """就绪检查：预加载的模型全部预热完成后才返回200"""
+    readiness = get_readiness()
+    return jsonify(readiness), 200 if readiness['ready'] else 503
+
+@api_bp.route('/cpu-plan', methods=['GET'])
+def cpu_plan():
+    """获取 worker 数和线程数的规划，以及当前 worker 实际生效的设置
+
+    使用模型服务时推理线程在模型服务中，同时返回模型服务的规划和设置。
+    """
+    client = get_model_client()
+    if client is None:
+        return jsonify({
+            "plan": get_cpu_plan(),
+            "process": current_settings()
+        }), 200
+    
+    try:
+        model_server = client.cpu_settings()
+    except ModelServerError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({
+        "plan": get_cpu_plan(),
+        "process": current_settings(torch_threads=False),
+        "model_server": model_server
+    }), 200
@@ -4,6 +4,7 @@ from datetime import timedelta
 
 from models import db, User
 from utils.auth_utils import validate_email, validate_password
+from utils.user_cache import invalidate_user
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -169,6 +170,7 @@ def update_current_user():
     
     try:
         db.session.commit()
+        invalidate_user(user.id)
         return jsonify({
             "message": "User updated successfully",
             "user": user.to_dict()
@@ -1,12 +1,44 @@
 import os
-from flask import Blueprint, request, jsonify, current_app, g, send_file
+import tarfile
+import tempfile
+import zipfile
+from flask import Blueprint, request, jsonify, current_app, g, send_file, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import json
+from datetime import datetime
 
 from models import db, User, Detection
 from utils.auth_utils import api_key_required
-from utils.image_utils import save_uploaded_file, save_image_from_url, preprocess_image
-from utils.detection_utils import detect_objects, get_available_models
+from utils.image_utils import (
+    read_uploaded_file, fetch_image_from_url, decode_image_reduced, get_target_dir,
+    persist_image_async, iter_archive_images, save_uploaded_file, save_image_from_url
+)
+from utils.preprocessing import compile_preprocessing
+from utils.tiling import normalize_tiling
+from utils.video import allowed_video, VideoFrameSampler, detect_video, format_frame
+from utils.detection_utils import (
+    detect_objects, detect_objects_batch, get_available_models, objects_from_array,
+    objects_from_columnar, format_detections, count_detections, get_model_stats, scale_detections,
+    YOLO_MODELS
+)
+from utils.comparison import compare_models, model_agreement
+from utils.history import (
+    get_history_page, get_history_offset_page, approximate_history_total, MAX_PER_PAGE
+)
+from utils.history_writer import get_history_writer
+from utils.detection_objects import (
+    save_detection_objects, delete_detection_objects, object_filters, search_detections
+)
+from utils.model_client import get_model_client, ModelServerError
+from utils.cascade import CASCADE_MODEL, cascade_stats, cascade_rules
+from utils.batch_scheduler import get_batch_stats
+from utils.result_renderer import (
+    render_result_image, remove_result_files, result_image_available,
+    save_result_image, schedule_result_image, copy_result_files
+)
+from utils.result_cache import get_result_cache, make_cache_key
+from utils.url_fetcher import get_url_fetcher
+from utils.job_queue import DetectionJob, submit_job, wait_for_job
 
 detection_bp = Blueprint('detection', __name__)
 
@@ -16,14 +48,50 @@ def get_models():
     models = get_available_models()
     return jsonify(models), 200
 
-@detection_bp.route('/detect', methods=['POST'])
-@api_key_required
-def detect():
-    """检测图像中的物体"""
-    # 获取当前用户
-    user = g.current_user
+@detection_bp.route('/models/stats', methods=['GET'])
+def get_model_registry_stats():
+    """获取模型注册表的加载、淘汰和内存统计"""
+    client = get_model_client()
+    if client is not None:
+        try:
+            return jsonify(client.stats()['models']), 200
+        except ModelServerError as e:
+            return jsonify({"error": str(e)}), 503
+    return jsonify(get_model_stats()), 200
+
+@detection_bp.route('/batching', methods=['GET'])
+def get_batching_stats():
+    """获取批量推理调度器的批次统计"""
+    client = get_model_client()
+    if client is not None:
+        try:
+            return jsonify(client.stats()['batching']), 200
+        except ModelServerError as e:
+            return jsonify({"error": str(e)}), 503
+    stats = get_batch_stats()
+    stats['enabled'] = current_app.config.get('BATCH_INFERENCE_ENABLED', False)
+    return jsonify(stats), 200
+
+@detection_bp.route('/cascade/stats', methods=['GET'])
+def get_cascade_stats():
+    """获取级联模型（auto）各级的运行次数和升级率"""
+    stats = cascade_stats.stats()
+    stats['rules'] = cascade_rules()
+    return jsonify(stats), 200
+
+@detection_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """获取检测结果缓存的命中统计"""
+    cache = get_result_cache()
+    if cache is None:
+        return jsonify({"enabled": False}), 200
     
-    # 从请求中获取参数
+    stats = cache.stats()
+    stats['enabled'] = True
+    return jsonify(stats), 200
+
+def parse_detection_options():
+    """解析检测请求的公共参数，返回 (参数, 错误响应)"""
     model_name = request.form.get('model', current_app.config['DEFAULT_MODEL'])
     
     try:
@@ -39,39 +107,175 @@ def detect():
         except json.JSONDecodeError:
             pass
     
-    # 获取图像文件
-    image_path = None
+    # 结果格式：objects（逐个物体）或 columnar（平行数组，适合密集场景）
+    result_format = request.form.get('format', 'objects')
+    if result_format not in ('objects', 'columnar'):
+        return None, (jsonify({"error": "Invalid result format"}), 400)
+    
+    # 结果图像绘制方式：lazy（首次访问时绘制）或 sync（请求内绘制）
+    render = request.form.get('render', current_app.config['RESULT_RENDER_MODE'])
+    if render not in ('lazy', 'sync'):
+        return None, (jsonify({"error": "Invalid render mode"}), 400)
+    
+    try:
+        pipeline = compile_preprocessing(preprocessing)
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    
+    # 解码方式：reduced（大图按模型输入尺寸缩小解码）或 full（原尺寸解码）
+    decode = request.form.get('decode', current_app.config['DECODE_MODE'])
+    if decode not in ('reduced', 'full'):
+        return None, (jsonify({"error": "Invalid decode mode"}), 400)
+    # 缩小解码只用于推理：有预处理时（例如 resize、模糊核大小）按原尺寸解码，保证预处理结果与原来一致
+    decode_size = current_app.config['MODEL_INPUT_SIZE'] if decode == 'reduced' and pipeline.is_identity else 0
+    
+    # 是否保存原图（后台写盘，不阻塞检测）
+    save_image = request.form.get(
+        'save_image', str(current_app.config['SAVE_UPLOADED_IMAGES'])
+    ).lower() == 'true'
+    
+    return {
+        "model_name": model_name,
+        "confidence": confidence,
+        "result_format": result_format,
+        "render": render,
+        "pipeline": pipeline,
+        "decode_size": decode_size,
+        "save_image": save_image
+    }, None
+
+def parse_tiling_options():
+    """解析分块推理参数，未启用时返回 (None, None)"""
+    if request.form.get('tile', 'false').lower() != 'true':
+        return None, None
+    
+    try:
+        tiling = normalize_tiling(
+            request.form.get('tile_size', current_app.config['TILE_SIZE']),
+            request.form.get('tile_overlap', current_app.config['TILE_OVERLAP']),
+            request.form.get('tile_batch_size', current_app.config['TILE_BATCH_SIZE'])
+        )
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    return tiling, None
+
+@detection_bp.route('/detect', methods=['POST'])
+@api_key_required
+def detect():
+    """检测图像中的物体"""
+    # 获取当前用户
+    user = g.current_user
+    
+    # 从请求中获取参数
+    options, error = parse_detection_options()
+    if error:
+        return error
+    
+    # 分块推理参数（适合无人机航拍、扫描件等超大图像中的小物体）
+    tiling, error = parse_tiling_options()
+    if error:
+        return error
+    
+    model_name = options['model_name']
+    confidence = options['confidence']
+    result_format = options['result_format']
+    render = options['render']
+    pipeline = options['pipeline']
+    save_image = options['save_image']
+    # 分块推理需要全分辨率图像；立即绘制的结果图像也按原尺寸保存
+    # （懒绘制时从保存的原图绘制，可以缩小解码）
+    decode_size = options['decode_size'] if not tiling and render == 'lazy' and save_image else 0
+    
+    # 获取图像数据，只解码一次
+    image_data = None
+    filename = None
     
     if 'image' in request.files:
         # 从文件上传
         file = request.files['image']
-        image_path = save_uploaded_file(file, subfolder='images')
+        image_data = read_uploaded_file(file)
+        filename = file.filename
     elif request.form.get('image_url'):
         # 从URL加载
         image_url = request.form.get('image_url')
-        image_path = save_image_from_url(image_url, subfolder='images')
+        image_data, image_format = fetch_image_from_url(image_url)
+        filename = f"image.{image_format}"
     
-    if not image_path:
+    if not image_data:
         return jsonify({"error": "No valid image provided"}), 400
     
-    # 应用预处理
-    processed_image = preprocess_image(image_path, preprocessing)
-    if processed_image:
-        image_to_detect = processed_image
+    # 查询检测结果缓存（按图像内容哈希、检测参数和用户）
+    cache = get_result_cache()
+    cache_key = None
+    cached = None
+    if cache is not None:
+        cache_key = make_cache_key(
+            image_data, model_name, confidence, pipeline.key, result_format, tiling, decode_size,
+            user.id
+        )
+        cached, cache_tier = cache.get(cache_key)
+        # 缓存的结果图像已被删除时视为未命中
+        if cached and cached['result_path'] and not result_image_available(cached['result_path']):
+            cache.discard(cache_key)
+            cached = None
+    
+    if cached:
+        results = cached['results']
+        processing_time = cached['processing_time']
+        result_path = cached['result_path']
+        
+        image_path = None
+        if save_image:
+            image_path = persist_image_async(image_data, filename, subfolder='images')
+        
+        # 每条历史记录持有自己的结果文件，删除记录时不会删掉缓存和其他记录使用的文件
+        if result_path and user.preferences.get('saveHistory', True):
+            try:
+                result_path = copy_result_files(result_path, image_path)
+            except OSError as e:
+                print(f"Error copying cached result image: {e}")
+                result_path = None
     else:
-        image_to_detect = image_path
+        image, scale = decode_image_reduced(image_data, decode_size)
+        if image is None:
+            return jsonify({"error": "No valid image provided"}), 400
         
-    # 执行检测
-    results, processing_time, result_path = detect_objects(
-        image_to_detect, 
-        model_name=model_name, 
-        confidence=confidence
-    )
-    
-    if results is None:
-        return jsonify({"error": "Detection failed"}), 500
+        image_path = None
+        if save_image:
+            image_path = persist_image_async(image_data, filename, subfolder='images')
+        
+        # 应用预处理
+        image = pipeline(image)
+            
+        # 执行检测
+        stages = []
+        results, processing_time, result_path = detect_objects(
+            image, 
+            model_name=model_name, 
+            confidence=confidence,
+            result_format=result_format,
+            render=render,
+            source_path=image_path,
+            preprocessing=pipeline.spec,
+            tiling=tiling,
+            stages=stages,
+            scale=scale
+        )
+        
+        if results is None:
+            return jsonify({"error": "Detection failed"}), 500
+        
+        if cache is not None:
+            cache.put(cache_key, {
+                "results": results,
+                "processing_time": processing_time,
+                "result_path": result_path,
+                "stages": stages
+            })
     
     # 保存检测历史记录
+    detection_id = None
+    history_pending = False
     if user and user.preferences.get('saveHistory', True):
         try:
             detection = Detection(
@@ -81,20 +285,30 @@ def detect():
                 image_path=image_path,
                 result_path=result_path,
                 processing_time=processing_time,
-                preprocessing=preprocessing
+                preprocessing=pipeline.spec
             )
-            detection.results = results
+            # 历史记录统一保存逐个物体的格式
+            if result_format == 'columnar':
+                detection.results = objects_from_columnar(results)
+            else:
+                detection.results = results
             
-            db.session.add(detection)
-            db.session.commit()
-            
-            detection_id = detection.id
+            # 启用延迟写入时交给后台批量插入，记录 id 在写入后才分配
+            writer = get_history_writer()
+            if writer is not None and writer.submit(detection):
+                history_pending = True
+            else:
+                db.session.add(detection)
+                db.session.flush()
+                # 物体行与检测记录在同一事务中写入
+                save_detection_objects([detection])
+                db.session.commit()
+                
+                detection_id = detection.id
         except Exception as e:
             db.session.rollback()
             print(f"Error saving detection history: {e}")
             detection_id = None
-    else:
-        detection_id = None
     
     # 构造响应
     response = {
@@ -103,15 +317,378 @@ def detect():
         "model": model_name,
         "confidence_threshold": confidence,
         "processing_time": processing_time,
-        "objects_detected": len(results),
+        "objects_detected": count_detections(results),
+        "result_format": result_format,
+        "cache": "hit" if cached else "miss",
         "results": results
     }
     
+    if history_pending:
+        response["history"] = "pending"
+    
+    if tiling:
+        response["tiling"] = tiling
+    
+    # 级联模型记录实际运行的各级模型
+    if model_name == CASCADE_MODEL:
+        response["cascade"] = cached.get('stages', []) if cached else stages
+    
     if result_path:
         response["result_image"] = os.path.basename(result_path)
     
     return jsonify(response), 200
 
+@detection_bp.route('/detect/compare', methods=['POST'])
+@api_key_required
+def compare_detection_models():
+    """用多个模型检测同一张图像，返回各模型的结果、耗时和两两之间的一致性"""
+    options, error = parse_detection_options()
+    if error:
+        return error
+    
+    # models 可以是逗号分隔的字符串，也可以重复传多个字段
+    model_names = []
+    for value in request.form.getlist('models'):
+        for model_name in value.split(','):
+            model_name = model_name.strip()
+            if model_name and model_name not in model_names:
+                model_names.append(model_name)
+    
+    unknown = [name for name in model_names if name != CASCADE_MODEL and name not in YOLO_MODELS]
+    if unknown:
+        return jsonify({"error": f"Unknown models: {', '.join(unknown)}"}), 400
+    max_models = current_app.config['COMPARE_MAX_MODELS']
+    if not 2 <= len(model_names) <= max_models:
+        return jsonify({"error": f"Provide between 2 and {max_models} models"}), 400
+    
+    image_data = None
+    if 'image' in request.files:
+        image_data = read_uploaded_file(request.files['image'])
+    elif request.form.get('image_url'):
+        image_data, _ = fetch_image_from_url(request.form.get('image_url'))
+    
+    if not image_data:
+        return jsonify({"error": "No valid image provided"}), 400
+    
+    # 只解码、预处理和 letterbox 一次，所有模型共享同一份输入
+    image, scale = decode_image_reduced(image_data, options['decode_size'])
+    if image is None:
+        return jsonify({"error": "No valid image provided"}), 400
+    image = options['pipeline'](image)
+    
+    outputs, total_time = compare_models(
+        image, model_names, options['confidence'], current_app.config['MODEL_INPUT_SIZE']
+    )
+    
+    models = {}
+    detections = {}
+    for model_name, output in outputs.items():
+        if isinstance(output, Exception):
+            models[model_name] = {"success": False, "error": "Detection failed"}
+            continue
+        data, names, processing_time = output
+        data = scale_detections(data, scale)
+        detections[model_name] = data
+        models[model_name] = {
+            "success": True,
+            "processing_time": processing_time,
+            "objects_detected": len(data),
+            "results": format_detections(data, names, options['result_format'])
+        }
+    
+    if not detections:
+        return jsonify({"error": "Detection failed"}), 500
+    
+    return jsonify({
+        "success": True,
+        "confidence_threshold": options['confidence'],
+        "result_format": options['result_format'],
+        "total_time": total_time,
+        "models": models,
+        "agreement": model_agreement(detections)
+    }), 200
+
+@detection_bp.route('/detect/batch', methods=['POST'])
+@api_key_required
+def detect_batch():
+    """批量检测：接收多张图像或一个 zip/tar 压缩包，每完成一张返回一行 NDJSON"""
+    user = g.current_user
+    
+    options, error = parse_detection_options()
+    if error:
+        return error
+    
+    model_name = options['model_name']
+    confidence = options['confidence']
+    pipeline = options['pipeline']
+    
+    batch_size = request.form.get('batch_size', current_app.config['BATCH_MAX_SIZE'], type=int) or 1
+    batch_size = max(1, min(batch_size, 64))
+    max_images = current_app.config['BATCH_MAX_IMAGES']
+    
+    files = request.files.getlist('images')
+    archive = request.files.get('archive')
+    image_urls = [url for url in request.form.getlist('image_urls') if url]
+    if not files and not archive and not image_urls:
+        return jsonify({"error": "No valid image provided"}), 400
+    
+    save_history = bool(user and user.preferences.get('saveHistory', True))
+    
+    def iter_images():
+        for file in files:
+            yield file.filename, read_uploaded_file(file)
+        if archive:
+            yield from iter_archive_images(archive, max_image_size=current_app.config['MAX_CONTENT_LENGTH'])
+        # URL 并发预取，处理当前批次时后面的图像已在下载
+        for url, image_data, image_format, error in get_url_fetcher().prefetch(image_urls[:max_images]):
+            if error:
+                print(f"Error downloading image from URL: {error}")
+            yield url, image_data
+    
+    def process(chunk, summary, detections):
+        """解码并推理一个批次，逐张生成结果行"""
+        decoded = []
+        for index, filename, image_data in chunk:
+            image, scale = decode_image_reduced(image_data, options['decode_size'])
+            if image is None:
+                summary['failed'] += 1
+                yield {"index": index, "filename": filename, "success": False, "error": "Invalid image"}
+                continue
+            
+            image_path = None
+            if options['save_image']:
+                image_path = persist_image_async(image_data, filename, subfolder='images')
+            decoded.append((index, filename, image_path, pipeline(image), scale))
+        
+        if not decoded:
+            return
+        
+        try:
+            outputs, processing_time = detect_objects_batch(
+                [item[3] for item in decoded], model_name=model_name, confidence=confidence
+            )
+        except Exception as e:
+            print(f"Error in batch detection: {e}")
+            for index, filename, image_path, image, scale in decoded:
+                summary['failed'] += 1
+                yield {"index": index, "filename": filename, "success": False, "error": "Detection failed"}
+            return
+        
+        per_image_time = processing_time / len(decoded)
+        for (index, filename, image_path, image, scale), (data, names) in zip(decoded, outputs):
+            # 结果和 lazy 绘制使用原图坐标，同步绘制在解码后的图像上进行
+            original = scale_detections(data, scale)
+            if options['render'] == 'lazy' and image_path:
+                result_path = schedule_result_image(image_path, original, names, pipeline.spec)
+            else:
+                result_path = save_result_image(image, data, names)
+            
+            results = format_detections(original, names, options['result_format'])
+            
+            if save_history:
+                detection = Detection(
+                    user_id=user.id,
+                    model_name=model_name,
+                    confidence_threshold=confidence,
+                    image_path=image_path,
+                    result_path=result_path,
+                    processing_time=per_image_time,
+                    preprocessing=pipeline.spec
+                )
+                detection.results = objects_from_array(original, names)
+                detections.append(detection)
+            
+            summary['succeeded'] += 1
+            yield {
+                "index": index,
+                "filename": filename,
+                "success": True,
+                "processing_time": per_image_time,
+                "objects_detected": len(data),
+                "result_format": options['result_format'],
+                "results": results,
+                "result_image": os.path.basename(result_path)
+            }
+    
+    def generate():
+        summary = {"succeeded": 0, "failed": 0}
+        detections = []
+        chunk = []
+        
+        try:
+            for index, (filename, image_data) in enumerate(iter_images()):
+                if index >= max_images:
+                    yield json.dumps({"error": f"Too many images, only the first {max_images} were processed"}) + '\n'
+                    break
+                chunk.append((index, filename, image_data))
+                if len(chunk) >= batch_size:
+                    for line in process(chunk, summary, detections):
+                        yield json.dumps(line) + '\n'
+                    chunk = []
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            yield json.dumps({"error": f"Invalid archive: {e}"}) + '\n'
+        
+        if chunk:
+            for line in process(chunk, summary, detections):
+                yield json.dumps(line) + '\n'
+        
+        # 所有图像处理完后一次性批量写入历史记录
+        history_saved = 0
+        if detections:
+            try:
+                db.session.add_all(detections)
+                db.session.flush()
+                save_detection_objects(detections)
+                db.session.commit()
+                history_saved = len(detections)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error saving batch detection history: {e}")
+        
+        yield json.dumps({
+            "done": True,
+            "model": model_name,
+            "confidence_threshold": confidence,
+            "succeeded": summary['succeeded'],
+            "failed": summary['failed'],
+            "history_saved": history_saved
+        }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@detection_bp.route('/detect/video', methods=['POST'])
+@api_key_required
+def detect_video_file():
+    """视频检测：流式解码并采样帧，按帧顺序每帧返回一行 NDJSON
+
+    只有采样帧（每 sample_every 帧，或 sampling=scene 时按场景变化）送入模型，
+    其余帧由跟踪框插值得到（sampled=false）。
+    """
+    options, error = parse_detection_options()
+    if error:
+        return error
+    
+    model_name = options['model_name']
+    confidence = options['confidence']
+    pipeline = options['pipeline']
+    
+    sampling = request.form.get('sampling', 'interval')
+    if sampling not in ('interval', 'scene'):
+        return jsonify({"error": "Invalid sampling mode"}), 400
+    
+    sample_every = request.form.get('sample_every', current_app.config['VIDEO_SAMPLE_EVERY'], type=int) or 1
+    scene_threshold = request.form.get('scene_threshold', current_app.config['VIDEO_SCENE_THRESHOLD'], type=float)
+    batch_size = request.form.get('batch_size', current_app.config['BATCH_MAX_SIZE'], type=int) or 1
+    batch_size = max(1, min(batch_size, 64))
+    
+    file = request.files.get('video')
+    if not file or not allowed_video(file.filename):
+        return jsonify({"error": "No valid video provided"}), 400
+    
+    # OpenCV 只能从文件解码视频，上传内容先落盘到临时文件，处理完即删除
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    with tempfile.NamedTemporaryFile(dir=get_target_dir('videos'), suffix=f".{extension}", delete=False) as tmp:
+        file.save(tmp)
+        video_path = tmp.name
+    
+    sampler = VideoFrameSampler(
+        video_path,
+        sample_every=sample_every,
+        sampling=sampling,
+        scene_threshold=scene_threshold,
+        max_frames=current_app.config['VIDEO_MAX_FRAMES']
+    )
+    
+    def generate():
+        stats = {}
+        try:
+            for frame in detect_video(sampler, model_name, confidence, batch_size, pipeline, stats):
+                timestamp = frame['frame'] / sampler.fps if sampler.fps else None
+                yield json.dumps({
+                    "frame": frame['frame'],
+                    "time": round(timestamp, 3) if timestamp is not None else None,
+                    "sampled": frame['sampled'],
+                    "objects_detected": len(frame['data']),
+                    "results": format_frame(frame['data'], frame['track_ids'], frame['names'], options['result_format'])
+                }) + '\n'
+        except Exception as e:
+            print(f"Error in video detection: {e}")
+            yield json.dumps({"error": "Video detection failed"}) + '\n'
+        finally:
+            try:
+                os.remove(video_path)
+            except OSError:
+                pass
+        
+        summary = {
+            "done": True,
+            "model": model_name,
+            "confidence_threshold": confidence,
+            "fps": sampler.fps,
+            "frames": stats.get('frames', 0),
+            "sampled_frames": stats.get('sampled_frames', 0),
+            "processing_time": stats.get('processing_time', 0)
+        }
+        if sampler.truncated:
+            summary["warning"] = f"Video truncated to {current_app.config['VIDEO_MAX_FRAMES']} frames"
+        yield json.dumps(summary) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@detection_bp.route('/jobs', methods=['POST'])
+@api_key_required
+def submit_detection_job():
+    """提交异步检测任务，立即返回任务ID，由后台 worker 进程执行"""
+    user = g.current_user
+    
+    options, error = parse_detection_options()
+    if error:
+        return error
+    
+    # 任务需要在重启后仍可执行，原图同步保存到磁盘
+    image_path = None
+    if 'image' in request.files:
+        image_path = save_uploaded_file(request.files['image'], subfolder='images')
+    elif request.form.get('image_url'):
+        image_path = save_image_from_url(request.form.get('image_url'), subfolder='images')
+    
+    if not image_path:
+        return jsonify({"error": "No valid image provided"}), 400
+    
+    try:
+        job = submit_job(
+            user.id if user else None,
+            image_path,
+            options['model_name'],
+            options['confidence'],
+            options['pipeline'].spec,
+            options['result_format']
+        )
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+    
+    response = job.to_dict()
+    response["status_url"] = f"/api/detection/jobs/{job.id}"
+    return jsonify(response), 202
+
+@detection_bp.route('/jobs/<job_id>', methods=['GET'])
+@api_key_required
+def get_detection_job(job_id):
+    """查询异步检测任务状态，wait 参数（秒）用于长轮询等待任务完成"""
+    user = g.current_user
+    
+    job = DetectionJob.query.get(job_id)
+    if not job or (user and job.user_id != user.id):
+        return jsonify({"error": "Job not found"}), 404
+    
+    wait = request.args.get('wait', 0, type=float)
+    wait = max(0.0, min(wait, current_app.config['JOB_MAX_WAIT_SECONDS']))
+    if wait and not job.finished:
+        job = wait_for_job(job_id, wait)
+    
+    return jsonify(job.to_dict()), 200
+
 @detection_bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_history():
@@ -122,30 +699,99 @@ def get_history():
     if not user:
         return jsonify({"error": "User not found"}), 404
     
-    # 分页参数
-    page = request.args.get('page', 1, type=int)
+    # 游标分页参数：cursor 为上一页返回的 next_cursor
     per_page = request.args.get('per_page', 10, type=int)
+    cursor = request.args.get('cursor')
     
-    # 查询历史记录
-    query = Detection.query.filter_by(user_id=user.id).order_by(Detection.created_at.desc())
+    # 已弃用的页码分页：没有 cursor 但指定了 page 时仍按原来的格式返回，
+    # 同时返回 next_cursor 方便客户端改用游标
+    page = request.args.get('page', type=int)
+    if page is not None and not cursor:
+        detections, total, next_cursor = get_history_offset_page(user.id, page, per_page)
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
+        return jsonify({
+            "total": total,
+            "page": max(1, page),
+            "per_page": per_page,
+            "pages": (total + per_page - 1) // per_page,
+            "items": [detection.to_dict() for detection in detections],
+            "next_cursor": next_cursor,
+            "deprecated": "page is deprecated, use cursor"
+        }), 200
     
-    # 获取总数
-    total = query.count()
-    
-    # 分页
-    detections = query.paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        detections, next_cursor = get_history_page(user.id, per_page, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     # 构造响应
     response = {
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "pages": (total + per_page - 1) // per_page,
-        "items": [detection.to_dict() for detection in detections.items]
+        "per_page": max(1, min(per_page, MAX_PER_PAGE)),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+        "items": [detection.to_dict() for detection in detections]
     }
     
+    # 可选的近似总数，超过上限时只返回下限
+    if request.args.get('include_total', 'false').lower() == 'true':
+        total, exact = approximate_history_total(user.id)
+        response["total"] = total
+        response["total_exact"] = exact
+    
     return jsonify(response), 200
 
+def parse_search_datetime(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+@detection_bp.route('/history/search', methods=['GET'])
+@jwt_required()
+def search_history():
+    """按物体类别、置信度范围、框面积和日期检索检测历史"""
+    user_id = get_jwt_identity()
+    
+    # class 可以逗号分隔多个类别名称
+    class_names = [name.strip() for name in request.args.get('class', '').split(',') if name.strip()]
+    try:
+        class_ids = [int(value) for value in request.args.get('class_id', '').split(',') if value.strip()]
+        since = parse_search_datetime(request.args.get('since'))
+        until = parse_search_datetime(request.args.get('until'))
+    except ValueError:
+        return jsonify({"error": "Invalid search parameters"}), 400
+    
+    conditions = object_filters(
+        user_id,
+        class_names=class_names,
+        class_ids=class_ids,
+        min_confidence=request.args.get('min_confidence', type=float),
+        max_confidence=request.args.get('max_confidence', type=float),
+        min_area=request.args.get('min_area', type=float),
+        max_area=request.args.get('max_area', type=float),
+        since=since,
+        until=until
+    )
+    
+    per_page = request.args.get('per_page', 20, type=int)
+    try:
+        matches, next_cursor = search_detections(conditions, per_page, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "per_page": max(1, min(per_page, MAX_PER_PAGE)),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+        "items": [
+            {
+                "detection_id": detection_id,
+                "created_at": created_at.isoformat(),
+                "objects": objects
+            }
+            for detection_id, created_at, objects in matches
+        ]
+    }), 200
+
 @detection_bp.route('/history/<int:detection_id>', methods=['GET'])
 @jwt_required()
 def get_detection(detection_id):
@@ -175,9 +821,10 @@ def delete_detection(detection_id):
         if detection.image_path and os.path.exists(detection.image_path):
             os.remove(detection.image_path)
             
-        if detection.result_path and os.path.exists(detection.result_path):
-            os.remove(detection.result_path)
+        if detection.result_path:
+            remove_result_files(detection.result_path)
         
+        delete_detection_objects(detection.user_id, detection.id)
         db.session.delete(detection)
         db.session.commit()
         
@@ -201,10 +848,11 @@ def clear_history():
             if detection.image_path and os.path.exists(detection.image_path):
                 os.remove(detection.image_path)
                 
-            if detection.result_path and os.path.exists(detection.result_path):
-                os.remove(detection.result_path)
+            if detection.result_path:
+                remove_result_files(detection.result_path)
         
         # 从数据库中删除记录
+        delete_detection_objects(user_id)
         Detection.query.filter_by(user_id=user_id).delete()
         
         db.session.commit()
@@ -217,9 +865,10 @@ def clear_history():
 @detection_bp.route('/results/<filename>', methods=['GET'])
 def get_result_image(filename):
     """获取检测结果图像"""
-    result_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'results', filename)
+    # 懒绘制的结果图像在首次访问时生成并缓存
+    result_path = render_result_image(filename)
     
-    if not os.path.exists(result_path):
+    if not result_path:
         return jsonify({"error": "Image not found"}), 404
     
     return send_file(result_path, mimetype='image/jpeg') 
\ No newline at end of file
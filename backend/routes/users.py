@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from models import db, User, ApiKey
+from utils.api_key_cache import get_api_key_cache
+from utils.user_cache import invalidate_user
 
 users_bp = Blueprint('users', __name__)
 
@@ -32,6 +34,7 @@ def update_preferences():
     try:
         user.update_preferences(data)
         db.session.commit()
+        invalidate_user(user.id)
         return jsonify({
             "message": "Preferences updated successfully",
             "preferences": user.preferences
@@ -95,6 +98,8 @@ def delete_api_key(key_id):
     try:
         db.session.delete(api_key)
         db.session.commit()
+        # 已删除的密钥立即失效
+        get_api_key_cache().invalidate(api_key.key)
         
         return jsonify({
             "message": "API key deleted successfully"
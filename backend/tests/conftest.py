@@ -0,0 +1,13 @@
+import json
+
+import pytest
+
+@pytest.fixture
+def auth_headers(client):
+    # 创建测试用户并返回带认证令牌的请求头（client 由各测试模块提供）
+    response = client.post('/api/auth/register', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'Password123'
+    })
+    return {'Authorization': f"Bearer {json.loads(response.data)['access_token']}"}
@@ -0,0 +1,96 @@
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import utils.api_key_cache
+import utils.user_cache
+from app import create_app
+from models import db, ApiKey
+from utils.api_key_cache import ApiKeyCache
+
+@pytest.fixture
+def app(monkeypatch):
+    # 每个测试使用新的缓存和使用记录
+    monkeypatch.setattr(utils.api_key_cache, '_cache', None)
+    monkeypatch.setattr(utils.api_key_cache, '_recorder', None)
+    monkeypatch.setattr(utils.user_cache, '_cache', None)
+    app = create_app()
+    app.config.update({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'API_KEY_USAGE_FLUSH_INTERVAL': 3600
+    })
+    
+    with app.app_context():
+        db.create_all()
+        yield app
+        if utils.api_key_cache._recorder is not None:
+            utils.api_key_cache._recorder.flush()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def create_key(client):
+    response = client.post('/api/auth/register', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'Password123'
+    })
+    token = json.loads(response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    api_key = json.loads(client.post('/api/users/api-keys', headers=headers, json={'name': 'test'}).data)['api_key']
+    return headers, api_key
+
+def test_api_key_cache_expires_and_evicts():
+    cache = ApiKeyCache(ttl=0.05, max_entries=2)
+    key = SimpleNamespace(id=1, user_id=7, expires_at=None)
+    expired_key = SimpleNamespace(id=2, user_id=7, expires_at=datetime.utcnow() - timedelta(seconds=1))
+
+    cache.put('a', key)
+    assert cache.get('a')['user_id'] == 7
+    # 密钥本身已到期时不使用缓存
+    cache.put('b', expired_key)
+    assert cache.get('b') is None
+
+    cache.put('b', key)
+    cache.put('c', key)
+    assert cache.get('a') is None
+    time.sleep(0.06)
+    assert cache.get('c') is None
+    assert cache.stats()['hits'] == 1
+
+def test_cached_key_skips_lookup_and_is_invalidated_on_delete(client):
+    headers, api_key = create_key(client)
+    key_headers = {'Authorization': f"Bearer {api_key['key']}"}
+
+    assert client.get('/api/detection/jobs/missing', headers=key_headers).status_code == 404
+    
+    # 第二次请求命中缓存，不再查询密钥表
+    assert client.get('/api/detection/jobs/missing', headers=key_headers).status_code == 404
+    assert utils.api_key_cache._cache.stats()['hits'] == 1
+    
+    response = client.delete(f"/api/users/api-keys/{api_key['id']}", headers=headers)
+    assert response.status_code == 200
+    assert client.get('/api/detection/jobs/missing', headers=key_headers).status_code == 401
+
+def test_usage_is_flushed_in_bulk(app, client):
+    _, api_key = create_key(client)
+    key_headers = {'Authorization': f"Bearer {api_key['key']}"}
+    
+    for _ in range(3):
+        client.get('/api/detection/jobs/missing', headers=key_headers)
+    
+    key_obj = db.session.get(ApiKey, api_key['id'])
+    assert not key_obj.usage_count
+    
+    assert utils.api_key_cache._recorder.flush() == 1
+    db.session.expire_all()
+    key_obj = db.session.get(ApiKey, api_key['id'])
+    assert key_obj.usage_count == 3
+    assert key_obj.last_used is not None
+    assert utils.api_key_cache._recorder.flush() == 0
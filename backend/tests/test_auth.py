@@ -1,10 +1,16 @@
 import pytest
 import json
+import utils.api_key_cache
+import utils.user_cache
 from app import create_app
 from models import db, User
 
 @pytest.fixture
-def app():
+def app(monkeypatch):
+    # 每个测试使用新的用户快照和密钥缓存
+    monkeypatch.setattr(utils.user_cache, '_cache', None)
+    monkeypatch.setattr(utils.api_key_cache, '_cache', None)
+    monkeypatch.setattr(utils.api_key_cache, '_recorder', None)
     app = create_app()
     app.config.update({
         'TESTING': True,
@@ -14,6 +20,8 @@ def app():
     with app.app_context():
         db.create_all()
         yield app
+        if utils.api_key_cache._recorder is not None:
+            utils.api_key_cache._recorder.flush()
         db.drop_all()
 
 @pytest.fixture
@@ -111,4 +119,33 @@ def test_update_current_user(client):
     assert response.status_code == 200
     data = json.loads(response.data)
     assert data['user']['username'] == 'newname'
-    assert data['user']['email'] == 'new@example.com' 
\ No newline at end of file
+    assert data['user']['email'] == 'new@example.com' 
+
+
+def test_credential_dispatch_by_token_format(client, auth_headers):
+    # JWT 和 API 密钥都能访问检测接口
+    assert client.get('/api/detection/jobs/missing', headers=auth_headers).status_code == 404
+    api_key = json.loads(client.post('/api/users/api-keys', headers=auth_headers, json={'name': 'test'}).data)['api_key']
+    key_headers = {'Authorization': f"Bearer {api_key['key']}"}
+    assert client.get('/api/detection/jobs/missing', headers=key_headers).status_code == 404
+    assert client.get(f"/api/detection/jobs/missing?api_key={api_key['key']}").status_code == 404
+    
+    # 格式像 JWT 的无效令牌不会再尝试 API 密钥
+    response = client.get('/api/detection/jobs/missing', headers={'Authorization': 'Bearer a.b.c'})
+    assert response.status_code in (401, 422)
+    assert client.get('/api/detection/jobs/missing', headers={'Authorization': 'Bearer unknown'}).status_code == 401
+    assert client.get('/api/detection/jobs/missing').status_code == 401
+
+def test_user_snapshot_invalidated_on_update(client, auth_headers):
+    from utils.user_cache import get_user_cache, get_user_snapshot
+    
+    client.get('/api/detection/jobs/missing', headers=auth_headers)
+    user_id = json.loads(client.get('/api/auth/me', headers=auth_headers).data)['id']
+    assert get_user_cache().get(user_id).preferences.get('saveHistory', True)
+    
+    client.put('/api/users/preferences', headers=auth_headers, json={'saveHistory': False})
+    assert get_user_cache().get(user_id) is None
+    assert get_user_snapshot(user_id).preferences['saveHistory'] is False
+    
+    client.put('/api/auth/me', headers=auth_headers, json={'preferences': {'saveHistory': True}})
+    assert get_user_snapshot(user_id).preferences['saveHistory'] is True
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pytest
+
+from utils.inference_backends import select_backend, parse_backend_overrides, runtime_available
+
+MODEL_FOLDER = os.environ.get('MODEL_FOLDER', 'models')
+
+# 导出模型与 PyTorch 模型的容差：框的 IoU 下限和置信度差上限
+MIN_IOU = 0.9
+MAX_CONFIDENCE_DIFF = 0.05
+
+def test_select_backend_prefers_exported_model(tmp_path, monkeypatch):
+    monkeypatch.setattr('utils.inference_backends.runtime_available', lambda backend: True)
+    (tmp_path / 'yolov8s.pt').write_bytes(b'')
+
+    assert select_backend(str(tmp_path), 'yolov8s.pt') == ('torch', str(tmp_path / 'yolov8s.pt'))
+
+    (tmp_path / 'yolov8s.onnx').write_bytes(b'')
+    assert select_backend(str(tmp_path), 'yolov8s.pt') == ('onnx', str(tmp_path / 'yolov8s.onnx'))
+    assert select_backend(str(tmp_path), 'yolov8s.pt', 'torch')[0] == 'torch'
+
+    # 运行时未安装时回退到 PyTorch
+    monkeypatch.setattr('utils.inference_backends.runtime_available', lambda backend: backend == 'torch')
+    assert select_backend(str(tmp_path), 'yolov8s.pt', 'onnx')[0] == 'torch'
+
+def test_parse_backend_overrides():
+    assert parse_backend_overrides('yolov8x:ONNX, yolov8n:torch') == {'yolov8x': 'onnx', 'yolov8n': 'torch'}
+    assert parse_backend_overrides('') == {}
+
+def box_iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / (area + areas - inter + 1e-9)
+
+@pytest.mark.parametrize('model_name', ['yolov8n', 'yolov8s'])
+def test_onnx_matches_torch(model_name):
+    ultralytics = pytest.importorskip('ultralytics')
+    if not runtime_available('onnx'):
+        pytest.skip('onnxruntime not installed')
+    onnx_path = os.path.join(MODEL_FOLDER, f'{model_name}.onnx')
+    if not os.path.exists(onnx_path):
+        pytest.skip(f'{onnx_path} not exported, run download_models.py first')
+
+    from ultralytics import YOLO
+    torch_model = YOLO(os.path.join(MODEL_FOLDER, f'{model_name}.pt'))
+    onnx_model = YOLO(onnx_path, task='detect')
+
+    for image in ultralytics.utils.ASSETS.glob('*.jpg'):
+        expected = torch_model.predict(str(image), conf=0.25, verbose=False)[0].boxes
+        actual = onnx_model.predict(str(image), conf=0.25, verbose=False)[0].boxes
+        expected_xyxy = expected.xyxy.cpu().numpy()
+        actual_xyxy = actual.xyxy.cpu().numpy()
+
+        # 阈值附近的框可能只出现在一侧，只比较置信度明显高于阈值的框
+        for i in np.where(expected.conf.cpu().numpy() > 0.25 + MAX_CONFIDENCE_DIFF)[0]:
+            ious = box_iou(expected_xyxy[i], actual_xyxy)
+            ious[actual.cls.cpu().numpy() != expected.cls[i].item()] = 0
+            assert len(ious) and ious.max() >= MIN_IOU, f'{image.name}: box {i} missing from ONNX output'
+            j = int(ious.argmax())
+            assert abs(float(actual.conf[j]) - float(expected.conf[i])) <= MAX_CONFIDENCE_DIFF
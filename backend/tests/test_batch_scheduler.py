@@ -0,0 +1,61 @@
+import threading
+from types import SimpleNamespace
+
+from utils.batch_scheduler import BatchScheduler
+
+class FakeModel:
+    """记录每次调用批次大小的模拟模型"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, images, conf=0.25, **kwargs):
+        self.calls.append(len(images))
+        return [SimpleNamespace(boxes=None, image=image) for image in images]
+
+def test_batch_scheduler_groups_concurrent_requests():
+    scheduler = BatchScheduler(max_batch_size=4, max_wait_ms=200)
+    model = FakeModel()
+    results = {}
+
+    def worker(i):
+        results[i] = scheduler.infer('fake', model, f"image-{i}", 0.25, timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 每个请求拿回的是自己的结果
+    assert all(results[i].image == f"image-{i}" for i in range(4))
+    assert sum(model.calls) == 4
+    assert max(model.calls) > 1
+
+    stats = scheduler.stats()
+    assert stats['models']['fake']['requests'] == 4
+    assert stats['models']['fake']['batches'] == len(model.calls)
+
+def test_batch_scheduler_respects_max_batch_size():
+    scheduler = BatchScheduler(max_batch_size=2, max_wait_ms=200)
+    model = FakeModel()
+
+    futures = [scheduler.submit('fake', model, i, 0.25) for i in range(5)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert max(model.calls) <= 2
+    assert sum(model.calls) == 5
+
+def test_batch_scheduler_released_model_runs_without_queue():
+    scheduler = BatchScheduler(max_batch_size=4, max_wait_ms=10)
+    model = FakeModel()
+
+    scheduler.infer('fake', model, 'before', 0.25, timeout=5)
+    scheduler.release(model)
+
+    # 淘汰后仍持有模型的请求照常返回结果，但不会重新创建队列和线程
+    result = scheduler.infer('fake', model, 'after', 0.25, timeout=5)
+    assert result.image == 'after'
+    assert scheduler.stats()['models']['fake']['requests'] == 2
+    assert not scheduler._queues
@@ -0,0 +1,50 @@
+import numpy as np
+
+from utils.cascade import run_cascade, uncertainty_signals, CascadeStats
+
+RULES = {
+    "stages": ['yolov8n', 'yolov8m'],
+    "low_confidence": 0.5,
+    "max_low_confidence_ratio": 0.3,
+    "escalate_on_empty": True,
+    "crowded_objects": 3
+}
+
+def boxes(*confidences):
+    return np.array([[0, 0, 10, 10, conf, 0] for conf in confidences], dtype=np.float32).reshape(-1, 6)
+
+def test_uncertainty_signals():
+    assert uncertainty_signals(boxes(0.9, 0.8), RULES) == []
+    assert uncertainty_signals(boxes(), RULES) == ['no_detections']
+    assert uncertainty_signals(boxes(0.9, 0.3), RULES) == ['low_confidence']
+    assert uncertainty_signals(boxes(0.9, 0.9, 0.9), RULES) == ['crowded']
+    assert uncertainty_signals(boxes(), dict(RULES, escalate_on_empty=False)) == []
+
+def test_cascade_escalates_only_uncertain_images(monkeypatch):
+    stats = CascadeStats()
+    monkeypatch.setattr('utils.cascade.cascade_stats', stats)
+    calls = []
+    first_stage = {'easy': boxes(0.9), 'hard': boxes(0.2, 0.3)}
+
+    def infer(model_name, images):
+        calls.append((model_name, list(images)))
+        if model_name == 'yolov8n':
+            detections = [first_stage[image] for image in images]
+        else:
+            detections = [boxes(0.95, 0.9) for image in images]
+        return detections, {0: 'person'}, 0.1
+
+    results, names, processing_time, stages = run_cascade(['easy', 'hard', 'easy'], infer, RULES)
+
+    # 第二级只处理不确定的图像
+    assert calls == [('yolov8n', ['easy', 'hard', 'easy']), ('yolov8m', ['hard'])]
+    assert len(results[1]) == 2 and results[1][0, 4] == np.float32(0.95)
+    assert [stage['model'] for stage in stages[1]] == ['yolov8n', 'yolov8m']
+    assert stages[1][0]['signals'] == ['low_confidence']
+    assert [stage['model'] for stage in stages[0]] == ['yolov8n']
+
+    summary = stats.stats()
+    assert summary['images'] == 3
+    assert summary['stages']['yolov8n']['escalation_rate'] == round(1 / 3, 4)
+    assert summary['final_stage'] == {'yolov8n': 2, 'yolov8m': 1}
+    assert summary['runs_per_image'] == round(4 / 3, 4)
@@ -0,0 +1,65 @@
+import threading
+
+import numpy as np
+import pytest
+from flask import Flask
+
+import utils.comparison
+from utils.comparison import match_boxes, model_agreement, compare_models
+
+def test_match_boxes_one_to_one_and_class_aware():
+    data_a = np.array([
+        [0, 0, 100, 100, 0.9, 0],
+        [200, 200, 300, 300, 0.8, 1]
+    ], dtype=np.float32)
+    data_b = np.array([
+        [0, 0, 100, 100, 0.7, 0],
+        [5, 5, 100, 100, 0.6, 0],       # 与同一个框重叠，只能匹配一次
+        [200, 200, 300, 300, 0.5, 2]    # 位置相同但类别不同
+    ], dtype=np.float32)
+
+    assert match_boxes(data_a, data_b) == pytest.approx([1.0])
+
+def test_model_agreement():
+    box = np.array([[0, 0, 100, 100, 0.9, 0]], dtype=np.float32)
+    empty = np.zeros((0, 6), dtype=np.float32)
+    pairs = model_agreement({'yolov8n': box, 'yolov8s': np.concatenate([box, box + 300]), 'yolov8m': empty})
+
+    assert [pair['models'] for pair in pairs] == [['yolov8n', 'yolov8s'], ['yolov8n', 'yolov8m'], ['yolov8s', 'yolov8m']]
+    assert pairs[0]['matched'] == 1
+    assert pairs[0]['agreement'] == pytest.approx(2 / 3, abs=1e-4)
+    assert pairs[0]['mean_iou'] == 1.0
+    assert pairs[1]['agreement'] == 0
+    assert model_agreement({'yolov8n': empty, 'yolov8s': empty})[0]['agreement'] == 1.0
+
+def test_compare_models_shares_letterboxed_input(monkeypatch):
+    app = Flask(__name__)
+    app.config['COMPARE_MAX_WORKERS'] = 3
+    monkeypatch.setattr(utils.comparison, '_executor', None)
+    inputs = []
+    threads = set()
+
+    def fake_infer(model_name, images, confidence, batch=True):
+        inputs.append(images[0])
+        threads.add(threading.current_thread().name)
+        if model_name == 'yolov8m':
+            raise RuntimeError("model failed")
+        # letterbox 图像上的框：1280x640 缩小一半后上下各填充 160 像素
+        return [np.array([[100, 200, 300, 400, 0.9, 0]], dtype=np.float32)], {0: 'person'}, 0.01
+
+    monkeypatch.setattr(utils.comparison, 'infer_detections', fake_infer)
+    image = np.zeros((640, 1280, 3), dtype=np.uint8)
+
+    with app.app_context():
+        outputs, total_time = compare_models(image, ['yolov8n', 'yolov8s', 'yolov8m'], 0.25, 640)
+
+    # 所有模型共享同一份 letterbox 输入
+    assert len(inputs) == 3
+    assert all(item is inputs[0] for item in inputs)
+    assert inputs[0].shape == (640, 640, 3)
+    assert all(name.startswith('compare') for name in threads)
+
+    data, names, _ = outputs['yolov8n']
+    assert data[0, :4].tolist() == [200, 80, 600, 480]
+    assert names == {0: 'person'}
+    assert isinstance(outputs['yolov8m'], RuntimeError)
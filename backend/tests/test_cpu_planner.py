@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from utils import cpu_planner
+from utils.cpu_planner import cgroup_cpu_quota, physical_cores, make_plan
+
+def test_cgroup_cpu_quota(tmp_path):
+    assert cgroup_cpu_quota(str(tmp_path)) is None
+
+    (tmp_path / 'cpu.max').write_text('max 100000\n')
+    assert cgroup_cpu_quota(str(tmp_path)) is None
+
+    (tmp_path / 'cpu.max').write_text('250000 100000\n')
+    assert cgroup_cpu_quota(str(tmp_path)) == 2.5
+
+def test_physical_cores_groups_siblings(tmp_path):
+    # 2 个物理核心，每个核心 2 个超线程
+    for cpu, core in enumerate([0, 1, 0, 1]):
+        topology = tmp_path / f'cpu{cpu}' / 'topology'
+        topology.mkdir(parents=True)
+        (topology / 'physical_package_id').write_text('0')
+        (topology / 'core_id').write_text(str(core))
+
+    assert physical_cores([0, 1, 2, 3], str(tmp_path)) == [[0, 2], [1, 3]]
+    # 没有拓扑信息时每个 CPU 单独一组
+    assert physical_cores([7], str(tmp_path)) == [[7]]
+
+@pytest.fixture
+def host(monkeypatch):
+    """模拟 16 个逻辑 CPU（8 个物理核心）的主机"""
+    def configure(quota=None):
+        monkeypatch.setattr(cpu_planner, 'available_cpus', lambda: list(range(16)))
+        monkeypatch.setattr(cpu_planner, 'cgroup_cpu_quota', lambda: quota)
+        monkeypatch.setattr(cpu_planner, 'physical_cores', lambda cpus: [[i, i + 8] for i in range(8)])
+    return configure
+
+def test_plan_does_not_oversubscribe(host):
+    host()
+    plan = make_plan()
+    assert plan['effective_cores'] == 8
+    assert plan['workers'] * plan['torch_intra_op_threads'] <= 8
+
+    plan = make_plan(workers=4)
+    assert plan['torch_intra_op_threads'] == 2
+    assert plan['source'] == 'config'
+
+def test_plan_respects_cgroup_quota(host):
+    host(quota=2.5)
+    plan = make_plan()
+    assert plan['effective_cores'] == 2
+    assert plan['workers'] == 1
+    assert plan['torch_intra_op_threads'] == 2
+
+def test_plan_keeps_request_concurrency(host):
+    # 配额较小时只有一个 worker，但仍有多个请求处理线程
+    host(quota=4)
+    plan = make_plan()
+    assert plan['workers'] == 1
+    assert plan['http_threads'] == cpu_planner.DEFAULT_HTTP_THREADS
+    assert make_plan(http_threads=8)['http_threads'] == 8
+
+def test_plan_pins_workers_to_core_sets(host):
+    host()
+    plan = make_plan(threads_per_worker=2, pin=True)
+    assert plan['workers'] == 4
+    assert plan['worker_cpu_sets'][0] == [0, 1, 8, 9]
+    assert plan['worker_cpu_sets'][3] == [6, 7, 14, 15]
+
+def test_plan_uses_benchmark_result(host, tmp_path):
+    host()
+    path = tmp_path / 'benchmark.json'
+    path.write_text(json.dumps({"effective_cores": 8, "best": {"workers": 8, "threads": 1, "pin": False}}))
+
+    plan = make_plan(benchmark_path=str(path))
+    assert (plan['source'], plan['workers'], plan['torch_intra_op_threads']) == ('benchmark', 8, 1)
+
+    # 在核心数不同的主机上测得的结果不适用
+    path.write_text(json.dumps({"effective_cores": 4, "best": {"workers": 4, "threads": 1}}))
+    assert make_plan(benchmark_path=str(path))['source'] == 'auto'
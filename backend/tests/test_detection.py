@@ -56,6 +56,14 @@ def test_get_models(client):
     assert 'name' in data[0]
     assert 'description' in data[0]
 
+def test_get_model_stats(client):
+    # 测试获取模型注册表统计（未配置模型服务）
+    response = client.get('/api/detection/models/stats')
+    
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert 'models' in data
+
 def test_detect_without_auth(client):
     # 测试未认证时的检测请求
     response = client.post('/api/detection/detect')
@@ -131,4 +139,178 @@ def test_detect_mock(client, auth_token, monkeypatch):
         )
     
     # 这里仅验证API响应结构，不验证实际检测结果
-    assert response.status_code == 200 
\ No newline at end of file
+    assert response.status_code == 200 
+
+
+def test_detect_reduced_decode_only_for_inference(client, auth_token, monkeypatch):
+    import cv2
+    import numpy as np
+    import routes.detection
+    
+    shapes = []
+    
+    def mock_detect_objects(image, **kwargs):
+        shapes.append(image.shape[:2])
+        return [], 0.1, None
+    
+    monkeypatch.setattr(routes.detection, 'detect_objects', mock_detect_objects)
+    image = cv2.imencode('.jpg', np.zeros((960, 1280, 3), dtype=np.uint8))[1].tobytes()
+    
+    def detect(**form):
+        form['image'] = (io.BytesIO(image), 'test.jpg')
+        response = client.post(
+            '/api/detection/detect',
+            headers={'Authorization': f'Bearer {auth_token}'},
+            data=form,
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 200
+    
+    # 懒绘制时从保存的原图绘制结果，推理可以使用缩小解码的图像
+    detect(render='lazy', save_image='true')
+    # 立即绘制或有预处理时按原尺寸解码
+    detect(render='sync', save_image='true')
+    detect(render='lazy', save_image='true', preprocessing=json.dumps({'gaussian_blur': {'kernel_size': 5}}))
+    
+    assert shapes[0][1] < 1280
+    assert shapes[1:] == [(960, 1280), (960, 1280)]
+
+
+def test_objects_from_array():
+    import numpy as np
+    from utils.detection_utils import objects_from_array
+
+    data = np.array([
+        [10.123, 20.456, 110.789, 220.001, 0.91234, 0],
+        [5, 5, 15, 25, 0.5, 2]
+    ], dtype=np.float32)
+    names = {0: 'person', 2: 'car'}
+
+    objects = objects_from_array(data, names)
+
+    assert len(objects) == 2
+    assert objects[0]['class_name'] == 'person'
+    assert objects[0]['confidence'] == 0.9123
+    assert objects[0]['bbox']['x1'] == 10.12
+    assert objects[0]['bbox']['width'] == 100.67
+    assert objects[1]['id'] == 1
+    assert objects[1]['class_id'] == 2
+    assert objects_from_array(np.zeros((0, 6), dtype=np.float32), names) == []
+
+def test_columnar_results_round_trip():
+    import numpy as np
+    from utils.detection_utils import (
+        objects_from_array, columnar_from_array, objects_from_columnar, count_detections
+    )
+
+    data = np.array([
+        [10, 20, 110, 220, 0.9, 0],
+        [5, 5, 15, 25, 0.5, 2],
+        [30, 40, 50, 60, 0.75, 0]
+    ], dtype=np.float32)
+    names = {0: 'person', 2: 'car'}
+
+    columnar = columnar_from_array(data, names)
+
+    assert columnar['class_id'] == [0, 2, 0]
+    assert columnar['xyxy'][1] == [5.0, 5.0, 15.0, 25.0]
+    assert columnar['class_names'] == {'0': 'person', '2': 'car'}
+    assert count_detections(columnar) == 3
+    assert objects_from_columnar(columnar) == objects_from_array(data, names)
+
+def test_warmup_model_uses_each_size():
+    from utils.detection_utils import warmup_model
+
+    calls = []
+
+    def model(image, **kwargs):
+        calls.append((image.shape, kwargs['imgsz']))
+
+    timings = warmup_model(model, [(640, 640), (1280, 736)])
+
+    assert calls == [((640, 640, 3), (640, 640)), ((736, 1280, 3), (736, 1280))]
+    assert list(timings) == ['640x640', '1280x736']
+
+def test_detect_batch_streams_ndjson(client, auth_token, monkeypatch):
+    import cv2
+    import numpy as np
+    import routes.detection
+
+    def mock_detect_objects_batch(images, model_name='yolov8s', confidence=0.25):
+        data = np.array([[10, 10, 50, 50, 0.9, 0]], dtype=np.float32)
+        return [(data, {0: 'person'}) for _ in images], 0.2
+
+    monkeypatch.setattr(routes.detection, 'detect_objects_batch', mock_detect_objects_batch)
+
+    ok, buffer = cv2.imencode('.jpg', np.zeros((64, 64, 3), dtype=np.uint8))
+    image_bytes = buffer.tobytes()
+
+    response = client.post(
+        '/api/detection/detect/batch',
+        headers={'Authorization': f'Bearer {auth_token}'},
+        data={
+            'model': 'yolov8n',
+            'images': [
+                (io.BytesIO(image_bytes), 'a.jpg'),
+                (io.BytesIO(b'fake image data'), 'b.jpg'),
+                (io.BytesIO(image_bytes), 'c.jpg')
+            ]
+        },
+        content_type='multipart/form-data'
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+    results = {line['filename']: line for line in lines if 'filename' in line}
+    assert results['a.jpg']['success'] is True
+    assert results['a.jpg']['objects_detected'] == 1
+    assert results['b.jpg']['success'] is False
+
+    summary = lines[-1]
+    assert summary['done'] is True
+    assert summary['succeeded'] == 2
+    assert summary['failed'] == 1
+    assert summary['history_saved'] == 2
+
+def test_detection_job_lifecycle(app, client, auth_token, monkeypatch):
+    import cv2
+    import numpy as np
+    import utils.detection_utils
+    from utils.job_queue import claim_next_job, run_job
+
+    def mock_detect_objects(image, **kwargs):
+        bbox = {'x1': 1, 'y1': 2, 'x2': 11, 'y2': 22, 'width': 10, 'height': 20}
+        return [{'id': 0, 'class_id': 0, 'class_name': 'person', 'confidence': 0.9, 'bbox': bbox}], 0.5, None
+
+    monkeypatch.setattr(utils.detection_utils, 'detect_objects', mock_detect_objects)
+
+    ok, buffer = cv2.imencode('.jpg', np.zeros((32, 32, 3), dtype=np.uint8))
+    response = client.post(
+        '/api/detection/jobs',
+        headers={'Authorization': f'Bearer {auth_token}'},
+        data={'model': 'yolov8n', 'image': (io.BytesIO(buffer.tobytes()), 'job.jpg')},
+        content_type='multipart/form-data'
+    )
+
+    assert response.status_code == 202
+    job_id = json.loads(response.data)['job_id']
+
+    response = client.get(f'/api/detection/jobs/{job_id}', headers={'Authorization': f'Bearer {auth_token}'})
+    assert json.loads(response.data)['status'] == 'queued'
+
+    # 模拟后台 worker 领取并执行任务
+    job = claim_next_job('test-worker')
+    assert job.id == job_id
+    assert claim_next_job('test-worker') is None
+    run_job(job)
+
+    response = client.get(
+        f'/api/detection/jobs/{job_id}?wait=1',
+        headers={'Authorization': f'Bearer {auth_token}'}
+    )
+    data = json.loads(response.data)
+    assert data['status'] == 'succeeded'
+    assert data['objects_detected'] == 1
+    assert data['detection_id'] is not None
@@ -0,0 +1,94 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import utils.user_cache
+from app import create_app
+from models import db, User, Detection
+from utils.detection_objects import DetectionObject, save_detection_objects, backfill_detection_objects
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(utils.user_cache, '_cache', None)
+    app = create_app()
+    app.config.update({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'
+    })
+    
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def make_object(class_id, class_name, confidence, size):
+    return {
+        'class_id': class_id,
+        'class_name': class_name,
+        'confidence': confidence,
+        'bbox': {'x1': 0, 'y1': 0, 'x2': size, 'y2': size, 'width': size, 'height': size}
+    }
+
+def add_detection(user_id, objects, day, index_objects=True):
+    detection = Detection(user_id=user_id, model_name='yolov8n', created_at=datetime(2024, 1, 1) + timedelta(days=day))
+    detection.results = objects
+    db.session.add(detection)
+    db.session.flush()
+    if index_objects:
+        save_detection_objects([detection])
+    db.session.commit()
+    return detection.id
+
+def test_search_filters_in_sql(client, auth_headers):
+    user = User.query.filter_by(username='testuser').first()
+    truck_big = add_detection(user.id, [make_object(7, 'truck', 0.9, 100), make_object(0, 'person', 0.95, 10)], 0)
+    truck_low = add_detection(user.id, [make_object(7, 'truck', 0.5, 100)], 1)
+    person = add_detection(user.id, [make_object(0, 'person', 0.9, 50)], 2)
+    truck_small = add_detection(user.id, [make_object(7, 'truck', 0.85, 5)], 3)
+    
+    data = json.loads(client.get(
+        '/api/detection/history/search?class=truck&min_confidence=0.8', headers=auth_headers
+    ).data)
+    assert [item['detection_id'] for item in data['items']] == [truck_small, truck_big]
+    # 只返回满足条件的物体
+    assert [obj['class_name'] for obj in data['items'][1]['objects']] == ['truck']
+    
+    data = json.loads(client.get(
+        '/api/detection/history/search?class=truck&min_confidence=0.8&min_area=1000', headers=auth_headers
+    ).data)
+    assert [item['detection_id'] for item in data['items']] == [truck_big]
+    
+    data = json.loads(client.get(
+        '/api/detection/history/search?class_id=0,7&since=2024-01-02&until=2024-01-03T12:00:00', headers=auth_headers
+    ).data)
+    assert [item['detection_id'] for item in data['items']] == [person, truck_low]
+    
+    # 游标分页
+    first = json.loads(client.get('/api/detection/history/search?per_page=3', headers=auth_headers).data)
+    second = json.loads(client.get(
+        f"/api/detection/history/search?per_page=3&cursor={first['next_cursor']}", headers=auth_headers
+    ).data)
+    assert [item['detection_id'] for item in first['items'] + second['items']] == [truck_small, person, truck_low, truck_big]
+    assert second['next_cursor'] is None
+    
+    assert client.get('/api/detection/history/search?since=yesterday', headers=auth_headers).status_code == 400
+
+def test_backfill_in_chunks_and_delete(client, auth_headers):
+    user = User.query.filter_by(username='testuser').first()
+    ids = [add_detection(user.id, [make_object(7, 'truck', 0.9, 10)] * 2, day, index_objects=(day == 0)) for day in range(5)]
+    
+    chunks = list(backfill_detection_objects(chunk_size=2))
+    # 第一条记录已有物体行，被跳过
+    assert chunks == [(ids[1], 1, 2), (ids[3], 2, 4), (ids[4], 1, 2)]
+    assert DetectionObject.query.count() == 10
+    assert list(backfill_detection_objects(chunk_size=2, start_id=ids[4])) == []
+    
+    client.delete(f'/api/detection/history/{ids[0]}', headers=auth_headers)
+    assert DetectionObject.query.count() == 8
+    client.delete('/api/detection/history/clear', headers=auth_headers)
+    assert DetectionObject.query.count() == 0
@@ -0,0 +1,93 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect
+
+import utils.user_cache
+from app import create_app
+from models import db, User, Detection
+from utils.history import encode_cursor, decode_cursor, approximate_history_total
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(utils.user_cache, '_cache', None)
+    app = create_app()
+    app.config.update({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'
+    })
+    
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def add_detections(user_id, count):
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        # 每两条记录的创建时间相同，由 id 决定顺序
+        db.session.add(Detection(user_id=user_id, model_name='yolov8n', created_at=start + timedelta(minutes=i // 2)))
+    db.session.commit()
+
+def test_history_cursor_pagination(client, auth_headers):
+    user = User.query.filter_by(username='testuser').first()
+    add_detections(user.id, 25)
+    
+    ids = []
+    cursor = None
+    pages = 0
+    while True:
+        url = '/api/detection/history?per_page=10' + (f'&cursor={cursor}' if cursor else '')
+        data = json.loads(client.get(url, headers=auth_headers).data)
+        ids.extend(item['id'] for item in data['items'])
+        pages += 1
+        cursor = data['next_cursor']
+        assert data['has_more'] == (cursor is not None)
+        if not cursor:
+            break
+    
+    assert pages == 3
+    # 按 (created_at, id) 倒序，没有重复也没有遗漏
+    assert ids == sorted(ids, reverse=True)
+    assert len(set(ids)) == 25
+
+def test_history_deprecated_page_parameter(client, auth_headers):
+    user = User.query.filter_by(username='testuser').first()
+    add_detections(user.id, 25)
+    
+    data = json.loads(client.get('/api/detection/history?page=2&per_page=10', headers=auth_headers).data)
+    assert (data['total'], data['page'], data['pages']) == (25, 2, 3)
+    assert len(data['items']) == 10
+    assert 'deprecated' in data
+    
+    # 返回的游标从下一页（第 3 页）开始
+    rest = json.loads(client.get(
+        f"/api/detection/history?per_page=10&cursor={data['next_cursor']}", headers=auth_headers
+    ).data)
+    third = json.loads(client.get('/api/detection/history?page=3&per_page=10', headers=auth_headers).data)
+    assert [item['id'] for item in rest['items']] == [item['id'] for item in third['items']]
+    assert third['next_cursor'] is None
+
+def test_history_total_and_invalid_cursor(client, auth_headers):
+    user = User.query.filter_by(username='testuser').first()
+    add_detections(user.id, 5)
+    
+    data = json.loads(client.get('/api/detection/history?include_total=true', headers=auth_headers).data)
+    assert data['total'] == 5
+    assert data['total_exact'] is True
+    assert 'total' not in json.loads(client.get('/api/detection/history', headers=auth_headers).data)
+    assert approximate_history_total(user.id, limit=3) == (3, False)
+    
+    assert client.get('/api/detection/history?cursor=bogus', headers=auth_headers).status_code == 400
+
+def test_cursor_round_trip_and_index(app):
+    created_at = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+    
+    indexes = {index['name']: index['column_names'] for index in inspect(db.engine).get_indexes(Detection.__tablename__)}
+    assert indexes['ix_detection_user_created_id'] == ['user_id', 'created_at', 'id']
@@ -0,0 +1,136 @@
+import io
+import json
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import routes.detection
+import utils.history_writer
+import utils.user_cache
+from app import create_app
+from models import db, User, Detection
+from utils.detection_objects import DetectionObject
+from utils.history_writer import HistoryWriter
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(utils.user_cache, '_cache', None)
+    monkeypatch.setattr(utils.history_writer, '_writer', None)
+    app = create_app()
+    app.config.update({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'UPLOAD_FOLDER': '/tmp/test_uploads',
+        'DETECTION_CACHE_ENABLED': False,
+        'HISTORY_WRITE_BEHIND': True,
+        'HISTORY_FLUSH_SIZE': 2,
+        'HISTORY_FLUSH_INTERVAL': 60
+    })
+    
+    with app.app_context():
+        db.create_all()
+        yield app
+        if utils.history_writer._writer is not None:
+            utils.history_writer._writer.close()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def make_detection(user_id):
+    detection = Detection(user_id=user_id, model_name='yolov8n')
+    detection.results = [{
+        'class_id': 0, 'class_name': 'person', 'confidence': 0.9,
+        'bbox': {'x1': 0, 'y1': 0, 'x2': 10, 'y2': 10, 'width': 10, 'height': 10}
+    }]
+    return detection
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_writer_flushes_on_size_and_close(app):
+    writer = HistoryWriter(app, flush_size=2, flush_interval=60, max_pending=3)
+    
+    assert writer.submit(make_detection(1))
+    time.sleep(0.05)
+    assert Detection.query.count() == 0
+    
+    # 达到 flush_size 时唤醒后台线程批量写入
+    assert writer.submit(make_detection(1))
+    assert wait_for(lambda: writer.stats()['written'] == 2)
+    assert writer.stats()['flushes'] == 1
+    
+    for _ in range(3):
+        writer._pending.append(make_detection(1))
+    # 队列已满时由调用方同步写入
+    assert not writer.submit(make_detection(1))
+    
+    assert writer.close() == 3
+    db.session.expire_all()
+    assert Detection.query.count() == 5
+    assert DetectionObject.query.count() == 5
+    assert not writer.submit(make_detection(1))
+
+def test_writer_retries_failed_rows(app, monkeypatch):
+    writer = HistoryWriter(app, flush_size=10, flush_interval=60, max_retries=2)
+    calls = []
+    save_objects = utils.history_writer.save_detection_objects
+    
+    def flaky_save(detections):
+        calls.append(len(detections))
+        if len(calls) == 1:
+            raise RuntimeError('database unavailable')
+        return save_objects(detections)
+    
+    monkeypatch.setattr(utils.history_writer, 'save_detection_objects', flaky_save)
+    # 缺少 bbox 的记录每次写入都会失败
+    broken = make_detection(1)
+    broken.results = [{'class_id': 0, 'class_name': 'person', 'confidence': 0.9}]
+    for detection in (make_detection(1), broken, make_detection(1)):
+        writer._pending.append(detection)
+    
+    # 整批失败后逐条写入，只有坏记录放回队列
+    assert writer.flush() == 2
+    assert writer.stats()['pending'] == 1
+    assert Detection.query.count() == 2
+    
+    # 超过重试次数后丢弃
+    assert writer.close() == 0
+    assert writer.stats() == {"pending": 0, "flushes": 1, "written": 2, "failed": 1}
+    assert Detection.query.count() == 2
+    assert DetectionObject.query.count() == 2
+
+def test_detect_marks_history_pending(app, client, monkeypatch):
+    def mock_detect_objects(*args, **kwargs):
+        return [], 0.1, None
+    
+    monkeypatch.setattr(routes.detection, 'detect_objects', mock_detect_objects)
+    response = client.post('/api/auth/register', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'Password123'
+    })
+    headers = {'Authorization': f"Bearer {json.loads(response.data)['access_token']}"}
+    image = cv2.imencode('.jpg', np.zeros((32, 32, 3), dtype=np.uint8))[1].tobytes()
+    
+    response = client.post(
+        '/api/detection/detect',
+        headers=headers,
+        data={'save_image': 'false', 'image': (io.BytesIO(image), 'test.jpg')},
+        content_type='multipart/form-data'
+    )
+    data = json.loads(response.data)
+    
+    assert response.status_code == 200
+    assert data['detection_id'] is None
+    assert data['history'] == 'pending'
+    
+    utils.history_writer.close_history_writer()
+    user = User.query.filter_by(username='testuser').first()
+    assert Detection.query.filter_by(user_id=user.id).count() == 1
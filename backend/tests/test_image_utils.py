@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+
+from utils.image_utils import decode_image, decode_image_reduced, apply_preprocessing, _write_file
+
+def make_jpeg(width=64, height=48):
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    img[:, : width // 2] = (255, 0, 0)
+    ok, buffer = cv2.imencode('.jpg', img)
+    assert ok
+    return buffer.tobytes()
+
+def test_decode_image_from_bytes():
+    img = decode_image(make_jpeg())
+
+    assert img is not None
+    assert img.shape == (48, 64, 3)
+    assert img.dtype == np.uint8
+
+def test_decode_image_invalid_data():
+    assert decode_image(b'fake image data') is None
+    assert decode_image(None) is None
+
+def test_apply_preprocessing_in_memory():
+    img = decode_image(make_jpeg())
+
+    # 没有预处理选项时直接返回原数组
+    assert apply_preprocessing(img, {}) is img
+
+    resized = apply_preprocessing(img, {'resize': {'width': 32, 'height': 24}})
+    assert resized.shape == (24, 32, 3)
+
+def test_compile_preprocessing_reuses_pipeline():
+    from utils.preprocessing import compile_preprocessing
+
+    first = compile_preprocessing({'sharpen': True, 'contrast': {'alpha': 1.5, 'beta': 10}})
+    second = compile_preprocessing({'contrast': {'beta': 10, 'alpha': 1.5}, 'sharpen': True})
+
+    assert first is second
+    assert compile_preprocessing({}).is_identity
+    assert compile_preprocessing({'contrast': {'alpha': 1.0, 'beta': 0}}).is_identity
+
+def test_compile_preprocessing_rejects_invalid_options():
+    import pytest
+    from utils.preprocessing import compile_preprocessing
+
+    with pytest.raises(ValueError):
+        compile_preprocessing({'gaussian_blur': {'kernel_size': 4}})
+    with pytest.raises(ValueError):
+        compile_preprocessing({'resize': {'width': 'big', 'height': 10}})
+    with pytest.raises(ValueError):
+        compile_preprocessing({'unknown': True})
+
+def test_pipeline_matches_sequential_opencv_calls():
+    from utils.preprocessing import compile_preprocessing
+
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, size=(40, 50, 3), dtype=np.uint8)
+    spec = {
+        'resize': {'width': 30, 'height': 20},
+        'gaussian_blur': {'kernel_size': 3},
+        'sharpen': True,
+        'contrast': {'alpha': 1.3, 'beta': -20}
+    }
+
+    expected = cv2.resize(img, (30, 20))
+    expected = cv2.GaussianBlur(expected, (3, 3), 0)
+    expected = cv2.filter2D(expected, -1, np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]]))
+    expected = cv2.convertScaleAbs(expected, alpha=1.3, beta=-20)
+
+    pipeline = compile_preprocessing(spec)
+    first = pipeline(img)
+    second = pipeline(img)
+
+    assert np.array_equal(first, expected)
+    # 复用中间缓冲区不能影响已经返回的结果
+    assert first is not second
+    assert np.array_equal(first, second)
+
+def test_decode_image_reduced_large_jpeg():
+    from utils.detection_utils import scale_detections
+
+    img, scale = decode_image_reduced(make_jpeg(2600, 1900), 640)
+    # 长边 2600 缩小 4 倍后为 650，仍不小于模型输入尺寸
+    assert img.shape == (475, 650, 3)
+    assert scale == (4.0, 4.0)
+
+    data = np.array([[10, 20, 30, 40, 0.9, 1]], dtype=np.float32)
+    mapped = scale_detections(data, scale)
+    assert mapped[0, :4].tolist() == [40, 80, 120, 160]
+    assert mapped[0, 4:].tolist() == data[0, 4:].tolist()
+
+def test_decode_image_reduced_keeps_small_and_png_images():
+    img, scale = decode_image_reduced(make_jpeg(), 640)
+    assert img.shape == (48, 64, 3)
+    assert scale == (1.0, 1.0)
+
+    png = cv2.imencode('.png', np.zeros((1400, 1400, 3), dtype=np.uint8))[1].tobytes()
+    img, scale = decode_image_reduced(png, 640)
+    assert img.shape == (1400, 1400, 3)
+    assert scale == (1.0, 1.0)
+
+    assert decode_image_reduced(b'fake image data', 640)[0] is None
+
+def test_write_file_replaces_atomically(tmp_path):
+    path = tmp_path / 'image.jpg'
+    _write_file(str(path), make_jpeg())
+
+    # 只留下完整的目标文件，没有残留的临时文件
+    assert [p.name for p in tmp_path.iterdir()] == ['image.jpg']
+    assert decode_image(path.read_bytes()).shape == (48, 64, 3)
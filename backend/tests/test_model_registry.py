@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+from utils.model_registry import ModelRegistry
+
+SIZES = {'small': 100, 'medium': 300, 'large': 500}
+
+def make_registry(budget, pinned=None):
+    loaded = []
+
+    def loader(name):
+        loaded.append(name)
+        return SimpleNamespace(name=name)
+
+    registry = ModelRegistry(loader, memory_budget=budget, pinned=pinned,
+                             size_of=lambda model: SIZES[model.name])
+    return registry, loaded
+
+def test_registry_caches_models():
+    registry, loaded = make_registry(0)
+
+    first = registry.get('small')
+    second = registry.get('small')
+
+    assert first is second
+    assert loaded == ['small']
+    stats = registry.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['hit_ratio'] == 0.5
+
+def test_registry_evicts_least_recently_used():
+    registry, loaded = make_registry(800)
+    evicted = []
+    registry.on_evict(lambda name, model: evicted.append(name))
+
+    registry.get('small')
+    registry.get('medium')
+    registry.get('small')
+    registry.get('large')
+
+    # medium 是最久未使用的模型
+    assert evicted == ['medium']
+    assert 'medium' not in registry
+    assert registry.resident_bytes == 600
+    assert registry.stats()['evictions'] == 1
+
+def test_registry_keeps_pinned_models():
+    registry, loaded = make_registry(600, pinned=['small'])
+
+    registry.get('small')
+    registry.get('medium')
+    registry.get('large')
+
+    assert 'small' in registry
+    assert 'medium' not in registry
+    assert registry.stats()['models']['small']['pinned'] is True
@@ -0,0 +1,91 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from flask import Flask
+
+import model_server
+from utils.model_client import ModelServerClient, ModelServerError
+
+class FakeTensor:
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+class FakeBoxes:
+    def __init__(self, array):
+        self.data = FakeTensor(array)
+
+    def __len__(self):
+        return len(self.data.array)
+
+class FakeModel:
+    """把每张图像的像素和作为置信度返回的模拟模型"""
+    names = {0: 'person', 1: 'car'}
+
+    def __call__(self, images, conf=0.25, **kwargs):
+        return [
+            SimpleNamespace(
+                names=self.names,
+                boxes=FakeBoxes(np.array(
+                    [[0, 0, image.shape[1], image.shape[0], float(image.sum()), 1]], dtype=np.float32
+                ))
+            )
+            for image in images
+        ]
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_server, 'get_model', lambda name: FakeModel())
+    app = Flask(__name__)
+    app.config['BATCH_INFERENCE_ENABLED'] = False
+
+    socket_path = str(tmp_path / 'models.sock')
+    server = model_server.ModelServer(socket_path, app)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    client = ModelServerClient(socket_path, timeout=5)
+    yield client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+def test_model_server_detects_from_shared_memory(client):
+    images = [np.full((4, 6, 3), 1, dtype=np.uint8), np.full((2, 3, 3), 2, dtype=np.uint8)]
+
+    results, names, model = client.detect('yolov8n', images, 0.25)
+
+    assert model == 'yolov8n'
+    assert names == {0: 'person', 1: 'car'}
+    # 服务端读到的像素与客户端写入共享内存的一致
+    assert results[0].tolist() == [[0, 0, 6, 4, 72, 1]]
+    assert results[1].tolist() == [[0, 0, 3, 2, 36, 1]]
+
+def test_model_server_grows_buffer_and_falls_back_model(client, monkeypatch):
+    monkeypatch.setattr('utils.model_client.MIN_BUFFER_BYTES', 16)
+    client.detect('yolov8n', [np.zeros((2, 2, 3), dtype=np.uint8)], 0.25)
+
+    results, names, model = client.detect('unknown', [np.ones((8, 8, 3), dtype=np.uint8)], 0.25)
+    assert model == 'yolov8s'
+    assert results[0][0, 4] == 192
+
+def test_model_server_reports_cpu_settings(client, monkeypatch):
+    monkeypatch.setattr(model_server, 'current_settings', lambda: {"torch_intra_op_threads": 4})
+    settings = client.cpu_settings()
+    assert settings == {"plan": None, "process": {"torch_intra_op_threads": 4}}
+
+def test_model_server_reports_errors(client):
+    with pytest.raises(ModelServerError):
+        client.request({"op": "unknown"})
+
+def test_client_without_server(tmp_path):
+    client = ModelServerClient(str(tmp_path / 'missing.sock'), timeout=1)
+    with pytest.raises(ModelServerError):
+        client.status()
@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+from utils.quantization import (
+    int8_weights_name, letterbox, list_calibration_images, ImageFolderCalibrationReader,
+    match_detections, detection_agreement
+)
+
+def test_int8_weights_name():
+    assert int8_weights_name('yolov8s.pt') == 'yolov8s-int8.onnx'
+
+def test_letterbox_matches_model_input():
+    img = np.full((48, 64, 3), 200, dtype=np.uint8)
+    blob = letterbox(img, 32)
+
+    assert blob.shape == (1, 3, 32, 32)
+    assert blob.dtype == np.float32
+    # 宽度方向填满，高度方向上下填充灰色
+    assert np.allclose(blob[0, :, 16, :], 200 / 255.0)
+    assert np.allclose(blob[0, :, 0, :], 114 / 255.0)
+
+def test_calibration_reader_iterates_folder(tmp_path):
+    for name in ('b.jpg', 'a.png'):
+        cv2.imwrite(str(tmp_path / name), np.zeros((20, 30, 3), dtype=np.uint8))
+    (tmp_path / 'notes.txt').write_text('not an image')
+
+    paths = list_calibration_images(str(tmp_path))
+    assert [p.rsplit('/', 1)[-1] for p in paths] == ['a.png', 'b.jpg']
+
+    reader = ImageFolderCalibrationReader(paths, 'images', imgsz=32)
+    batches = list(reader)
+    assert len(batches) == 2
+    assert batches[0]['images'].shape == (1, 3, 32, 32)
+    assert reader.get_next() is None
+
+    reader.rewind()
+    assert reader.get_next() is not None
+
+def test_detection_agreement():
+    reference = np.array([
+        [0, 0, 10, 10, 0.9, 0],
+        [20, 20, 40, 40, 0.8, 1]
+    ], dtype=np.float32)
+
+    assert detection_agreement([(reference, reference.copy())]) == {
+        "precision": 1.0, "recall": 1.0, "ap": 1.0, "reference_objects": 2
+    }
+
+    # 一个框类别错误，一个框漏检
+    candidate = np.array([[0, 0, 10, 10, 0.7, 2]], dtype=np.float32)
+    assert match_detections(reference, candidate) == [(np.float32(0.7).item(), False)]
+    agreement = detection_agreement([(reference, candidate)])
+    assert agreement["precision"] == 0.0
+    assert agreement["recall"] == 0.0
+
+    # 只检测到其中一个
+    agreement = detection_agreement([(reference, reference[:1])])
+    assert agreement["precision"] == 1.0
+    assert agreement["recall"] == 0.5
+    assert agreement["ap"] == 0.5
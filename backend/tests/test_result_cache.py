@@ -0,0 +1,88 @@
+import os
+import time
+
+from utils.result_cache import ResultCache, make_cache_key
+
+ENTRY = {"results": [], "processing_time": 0.1, "result_path": None}
+
+def test_cache_key_depends_on_content_and_parameters():
+    key = make_cache_key(b'image', 'yolov8s', 0.25, '{}')
+
+    assert key == make_cache_key(b'image', 'yolov8s', 0.25, '{}')
+    assert key != make_cache_key(b'other', 'yolov8s', 0.25, '{}')
+    assert key != make_cache_key(b'image', 'yolov8n', 0.25, '{}')
+    assert key != make_cache_key(b'image', 'yolov8s', 0.5, '{}')
+    assert key != make_cache_key(b'image', 'yolov8s', 0.25, '{"sharpen":true}')
+
+def test_cache_key_depends_on_user():
+    key = make_cache_key(b'image', 'yolov8s', 0.25, '{}', user_id=1)
+
+    assert key == make_cache_key(b'image', 'yolov8s', 0.25, '{}', user_id=1)
+    assert key != make_cache_key(b'image', 'yolov8s', 0.25, '{}', user_id=2)
+
+def test_memory_tier_lru():
+    cache = ResultCache(max_entries=2)
+
+    cache.put('a', ENTRY)
+    cache.put('b', ENTRY)
+    cache.get('a')
+    cache.put('c', ENTRY)
+
+    assert cache.get('a') == (ENTRY, 'memory')
+    assert cache.get('b') == (None, None)
+    stats = cache.stats()
+    assert stats['memory_hits'] == 2
+    assert stats['misses'] == 1
+
+def test_disk_tier_shared_and_expires(tmp_path):
+    writer = ResultCache(disk_dir=str(tmp_path), ttl=60)
+    writer.put('a', ENTRY)
+
+    # 另一个进程（新实例）从磁盘命中
+    reader = ResultCache(disk_dir=str(tmp_path), ttl=60)
+    assert reader.get('a') == (ENTRY, 'disk')
+    assert reader.get('a') == (ENTRY, 'memory')
+
+    # 超过TTL的磁盘条目失效
+    path = os.path.join(str(tmp_path), 'a.json')
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert ResultCache(disk_dir=str(tmp_path), ttl=60).get('a') == (None, None)
+    assert not os.path.exists(path)
+
+def test_disk_tier_size_limit(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path), disk_max_bytes=150)
+
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, ENTRY)
+        stamp = time.time() - 100 + i
+        os.utime(os.path.join(str(tmp_path), f"{key}.json"), (stamp, stamp))
+
+    cache.put('d', ENTRY)
+
+    remaining = sorted(name for name in os.listdir(str(tmp_path)) if name.endswith('.json'))
+    assert 'd.json' in remaining
+    assert 'a.json' not in remaining
+
+def test_disk_tier_scans_only_when_needed(tmp_path, monkeypatch):
+    cache = ResultCache(disk_dir=str(tmp_path), disk_max_bytes=1000, evict_interval=60)
+    scans = []
+    evict_disk = cache._evict_disk
+
+    def counting_evict():
+        scans.append(1)
+        return evict_disk()
+
+    monkeypatch.setattr(cache, '_evict_disk', counting_evict)
+
+    # 第一次写入扫描一次得到当前大小，之后未超出上限时不再扫描
+    for i in range(10):
+        cache.put(f"key{i}", ENTRY)
+    assert len(scans) == 1
+
+    # 估计大小超出上限时扫描并淘汰
+    for i in range(10, 20):
+        cache.put(f"key{i}", ENTRY)
+    assert len(scans) > 1
+    total = sum(os.path.getsize(os.path.join(str(tmp_path), name)) for name in os.listdir(str(tmp_path)))
+    assert total <= 1000
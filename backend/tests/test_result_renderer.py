@@ -0,0 +1,96 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from flask import Flask
+
+import utils.result_renderer
+from utils.result_renderer import (
+    schedule_result_image, render_result_image, remove_result_files, save_result_image, copy_result_files
+)
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update({
+        'UPLOAD_FOLDER': str(tmp_path),
+        'RESULT_CACHE_MAX_MB': 512
+    })
+    with app.app_context():
+        yield app
+
+def test_result_image_rendered_on_first_request(app, tmp_path):
+    source_path = str(tmp_path / 'source.jpg')
+    cv2.imwrite(source_path, np.full((100, 200, 3), 127, dtype=np.uint8))
+    data = np.array([[10, 20, 60, 80, 0.9, 0]], dtype=np.float32)
+
+    result_path = schedule_result_image(source_path, data, {0: 'person'})
+
+    # 检测时不生成图像
+    assert not os.path.exists(result_path)
+
+    rendered = render_result_image(os.path.basename(result_path))
+    assert rendered == result_path
+    img = cv2.imread(rendered)
+    assert img.shape == (100, 200, 3)
+
+    # 再次请求直接使用缓存
+    assert render_result_image(os.path.basename(result_path)) == result_path
+
+    remove_result_files(result_path)
+    assert render_result_image(os.path.basename(result_path)) is None
+
+def test_result_image_rendered_with_preprocessing(app, tmp_path):
+    source_path = str(tmp_path / 'source.jpg')
+    cv2.imwrite(source_path, np.zeros((100, 200, 3), dtype=np.uint8))
+    data = np.zeros((0, 6), dtype=np.float32)
+
+    result_path = schedule_result_image(source_path, data, {}, {'resize': {'width': 50, 'height': 40}})
+    rendered = render_result_image(os.path.basename(result_path))
+
+    assert cv2.imread(rendered).shape == (40, 50, 3)
+
+def test_copied_result_files_are_independent(app, tmp_path):
+    source_path = str(tmp_path / 'source.jpg')
+    copy_source = str(tmp_path / 'copy.jpg')
+    for path in (source_path, copy_source):
+        cv2.imwrite(path, np.full((100, 200, 3), 127, dtype=np.uint8))
+    data = np.array([[10, 20, 60, 80, 0.9, 0]], dtype=np.float32)
+
+    # 懒绘制：复制的检测记录引用新记录自己的原图
+    result_path = schedule_result_image(source_path, data, {0: 'person'})
+    copied = copy_result_files(result_path, copy_source)
+    remove_result_files(result_path)
+    os.remove(source_path)
+    assert render_result_image(os.path.basename(copied)) == copied
+
+    # 立即绘制：删除原记录的图像不影响副本
+    result_path = save_result_image(np.zeros((100, 200, 3), dtype=np.uint8), data, {0: 'person'})
+    copied = copy_result_files(result_path)
+    remove_result_files(result_path)
+    assert cv2.imread(copied).shape == (100, 200, 3)
+
+def test_unknown_result_image(app):
+    assert render_result_image('result_missing.jpg') is None
+
+def test_cache_limit_counts_sidecars_and_scans_periodically(app, tmp_path, monkeypatch):
+    source_path = str(tmp_path / 'source.jpg')
+    cv2.imwrite(source_path, np.full((100, 200, 3), 127, dtype=np.uint8))
+    data = np.array([[10, 20, 60, 80, 0.9, 0]], dtype=np.float32)
+    # 上限小于检测记录本身的大小
+    app.config['RESULT_CACHE_MAX_MB'] = 1e-6
+    paths = [schedule_result_image(source_path, data, {0: 'person'}) for _ in range(3)]
+
+    # 首次绘制时扫描目录，检测记录计入总大小，图像被淘汰
+    render_result_image(os.path.basename(paths[0]))
+    assert not os.path.exists(paths[0])
+
+    # 没有可淘汰的图像时不会每次绘制都重新扫描
+    render_result_image(os.path.basename(paths[1]))
+    assert os.path.exists(paths[1])
+
+    monkeypatch.setattr(utils.result_renderer, 'CACHE_SCAN_INTERVAL', 0)
+    render_result_image(os.path.basename(paths[2]))
+    assert not os.path.exists(paths[1])
+    assert not os.path.exists(paths[2])
+    assert all(os.path.exists(os.path.splitext(path)[0] + '.json') for path in paths)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import utils.detection_utils
+from utils.tiling import tile_origins, iter_tiles, iter_batches, non_max_suppression, normalize_tiling
+
+def test_tile_origins_cover_image():
+    assert tile_origins(500, 640, 128) == [0]
+    assert tile_origins(1000, 640, 128) == [0, 360]
+    assert tile_origins(2000, 640, 128) == [0, 512, 1024, 1360]
+
+def test_iter_tiles_yields_views():
+    image = np.zeros((1000, 1500, 3), dtype=np.uint8)
+    tiles = list(iter_tiles(image, 640, 0.2))
+
+    assert len(tiles) == 2 * 3
+    for x0, y0, tile in tiles:
+        assert tile.shape == (640, 640, 3)
+        assert np.shares_memory(tile, image)
+        tile[:] = 1
+    # 所有像素至少被一个分块覆盖
+    assert image.all()
+
+def test_iter_batches_streams():
+    assert list(iter_batches(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+
+def test_non_max_suppression_is_class_aware():
+    data = np.array([
+        [0, 0, 100, 100, 0.9, 0],
+        [5, 5, 100, 100, 0.8, 0],   # 与第一个框重复
+        [5, 5, 100, 100, 0.7, 1],   # 同一位置的其他类别
+        [300, 300, 400, 400, 0.6, 0]
+    ], dtype=np.float32)
+
+    kept = non_max_suppression(data, 0.5)
+    assert kept[:, 4].tolist() == pytest.approx([0.9, 0.7, 0.6])
+
+def test_normalize_tiling_rejects_invalid_values():
+    assert normalize_tiling('512', '0.25', '4') == {"tile_size": 512, "overlap": 0.25, "batch_size": 4}
+    with pytest.raises(ValueError):
+        normalize_tiling(64, 0.2, 4)
+    with pytest.raises(ValueError):
+        normalize_tiling(640, 0.9, 4)
+
+def test_infer_tiled_merges_tiles(monkeypatch):
+    batches = []
+
+    def fake_infer(model_name, images, confidence, batch=True):
+        batches.append(len(images))
+        detections = []
+        for image in images:
+            if image.shape[:2] == (1000, 1500):
+                # 整图推理：同一个物体，与分块结果重复
+                detections.append(np.array([[522, 370, 562, 410, 0.5, 0]], dtype=np.float32))
+            else:
+                # 每个分块都检测到左上角的物体（坐标相对于分块）
+                detections.append(np.array([[10, 10, 50, 50, 0.9, 0]], dtype=np.float32))
+        return detections, {0: 'person'}, 0.01
+
+    monkeypatch.setattr(utils.detection_utils, 'infer_detections', fake_infer)
+    image = np.zeros((1000, 1500, 3), dtype=np.uint8)
+    data, names, processing_time = utils.detection_utils.infer_tiled(
+        'yolov8n', image, 0.25, {"tile_size": 640, "overlap": 0.2, "batch_size": 4}
+    )
+
+    # 6 个分块加整图，按每批 4 张推理
+    assert batches == [4, 3]
+    assert names == {0: 'person'}
+    assert len(data) == 6
+    # 坐标已映射回原图
+    assert sorted(data[:, 0].tolist()) == [10, 10, 522, 522, 870, 870]
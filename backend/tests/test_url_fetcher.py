@@ -0,0 +1,111 @@
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.url_fetcher import UrlFetcher, FetchError, sniff_image_format
+
+PNG = cv2.imencode('.png', np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes()
+JPEG = cv2.imencode('.jpg', np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes()
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """本地测试服务器：按路径返回图像、超大文件、慢响应等"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body, content_length=True):
+        self.send_response(200)
+        if content_length:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for start in range(0, len(body), 4096):
+                chunk = body[start:start + 4096]
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        if self.path.startswith('/image.png'):
+            self.send_body(PNG)
+        elif self.path == '/image.jpg':
+            self.send_body(JPEG)
+        elif self.path == '/large':
+            self.send_body(PNG + b'\0' * 100000)
+        elif self.path == '/large-chunked':
+            self.send_body(PNG + b'\0' * 100000, content_length=False)
+        elif self.path == '/page.html':
+            self.send_body(b'<html><body>not an image</body></html>')
+        elif self.path == '/slow':
+            time.sleep(1)
+            self.send_body(PNG)
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    httpd.connections = set()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_sniff_image_format():
+    assert sniff_image_format(PNG[:12]) == 'png'
+    assert sniff_image_format(JPEG[:12]) == 'jpeg'
+    assert sniff_image_format(b'RIFF\0\0\0\0WEBPVP8 ') == 'webp'
+    assert sniff_image_format(b'GIF89a') is None
+
+def test_fetch_reuses_connection(server):
+    httpd, base_url = server
+    fetcher = UrlFetcher(max_bytes=50000)
+
+    for i in range(3):
+        data, image_format = fetcher.fetch(f"{base_url}/image.png?{i}")
+        assert data == PNG
+        assert image_format == 'png'
+
+    # keep-alive：三次请求使用同一个连接
+    assert len(httpd.connections) == 1
+
+def test_fetch_enforces_limits(server):
+    httpd, base_url = server
+    fetcher = UrlFetcher(max_bytes=50000, read_timeout=0.3)
+
+    for path in ('/large', '/large-chunked'):
+        with pytest.raises(FetchError, match='too large'):
+            fetcher.fetch(base_url + path)
+    with pytest.raises(FetchError, match='Unsupported'):
+        fetcher.fetch(base_url + '/page.html')
+    with pytest.raises(FetchError, match='timed out'):
+        fetcher.fetch(base_url + '/slow')
+    with pytest.raises(FetchError, match='404'):
+        fetcher.fetch(base_url + '/missing')
+    with pytest.raises(FetchError):
+        fetcher.fetch('file:///etc/passwd')
+
+def test_prefetch_keeps_order(server):
+    httpd, base_url = server
+    fetcher = UrlFetcher(max_bytes=50000, read_timeout=5, max_workers=3)
+    urls = [f"{base_url}/slow", f"{base_url}/image.jpg", f"{base_url}/page.html", f"{base_url}/image.png"]
+
+    start = time.monotonic()
+    results = list(fetcher.prefetch(urls))
+
+    assert [result[0] for result in results] == urls
+    assert [result[2] for result in results] == ['png', 'jpeg', None, 'png']
+    assert results[2][3] == 'Unsupported image format'
+    # 慢请求与其他请求并发执行
+    assert time.monotonic() - start < 1.9
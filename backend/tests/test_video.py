@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+import pytest
+
+import utils.video
+from utils.video import VideoFrameSampler, IouTracker, detect_video, format_frame
+
+def write_video(path, colors):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    if not writer.isOpened():
+        pytest.skip('OpenCV video writer not available')
+    for color in colors:
+        writer.write(np.full((48, 64, 3), color, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+def fake_infer(model_name, images, confidence, batch=True):
+    """每帧返回一个随帧号（像素值）向右移动的框"""
+    detections = []
+    for image in images:
+        x = round(float(image[0, 0, 0]) / 10)
+        detections.append(np.array([[x, 0, x + 20, 20, 0.9, 0]], dtype=np.float32))
+    return detections, {0: 'person'}, 0.01
+
+def test_interval_sampling_interpolates_skipped_frames(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils.video, 'infer_detections', fake_infer)
+    path = write_video(tmp_path / 'clip.avi', [i * 10 for i in range(12)])
+
+    stats = {}
+    frames = list(detect_video(VideoFrameSampler(path, sample_every=5), 'yolov8n', 0.25, batch_size=2, stats=stats))
+
+    assert [frame['frame'] for frame in frames] == list(range(12))
+    assert [frame['frame'] for frame in frames if frame['sampled']] == [0, 5, 10]
+    assert stats['frames'] == 12
+    assert stats['sampled_frames'] == 3
+
+    # 跳过的帧由前后采样帧插值，同一目标保持相同的 track_id
+    assert frames[2]['data'][0, 0] == pytest.approx(frames[0]['data'][0, 0] * 0.6 + frames[5]['data'][0, 0] * 0.4)
+    assert {int(frame['track_ids'][0]) for frame in frames} == {1}
+    # 最后一个采样帧之后的帧沿用其结果
+    assert frames[11]['data'][0, 0] == frames[10]['data'][0, 0]
+
+def test_scene_sampling_detects_cuts(tmp_path):
+    path = write_video(tmp_path / 'cuts.avi', [0] * 6 + [255] * 6)
+
+    sampled = [index for index, frame in VideoFrameSampler(path, sample_every=100, sampling='scene') if frame is not None]
+    assert sampled == [0, 6]
+
+def test_tracker_assigns_new_ids_to_new_objects():
+    tracker = IouTracker()
+    first = tracker.update(np.array([[0, 0, 10, 10, 0.9, 0]], dtype=np.float32))
+    second = tracker.update(np.array([
+        [1, 1, 11, 11, 0.9, 0],
+        [50, 50, 60, 60, 0.8, 0]
+    ], dtype=np.float32))
+
+    assert first.tolist() == [1]
+    assert second.tolist() == [1, 2]
+
+    results = format_frame(np.array([[1, 1, 11, 11, 0.9, 0]], dtype=np.float32), second[:1], {0: 'person'})
+    assert results[0]['track_id'] == 1
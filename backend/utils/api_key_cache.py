@@ -0,0 +1,159 @@
+import time
+import atexit
+import threading
+from datetime import datetime
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import case
+
+from models import db, ApiKey
+
+class ApiKeyCache:
+    """已验证 API 密钥的进程内缓存
+
+    缓存密钥对应的 key_id、user_id 和过期时间，TTL 内不再查询数据库。删除密钥时
+    调用 invalidate() 立即失效；其他 worker 进程中的缓存最多在 TTL 后失效。
+    """
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, api_key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is not None:
+                expired = now - entry['cached_at'] > self.ttl
+                # 缓存期间密钥本身可能已经到期
+                if not expired and entry['expires_at'] is not None and entry['expires_at'] <= datetime.utcnow():
+                    expired = True
+                if expired:
+                    del self._entries[api_key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(api_key)
+            self.hits += 1
+            return entry
+
+    def put(self, api_key, key_obj):
+        entry = {
+            "key_id": key_obj.id,
+            "user_id": key_obj.user_id,
+            "expires_at": key_obj.expires_at,
+            "cached_at": time.time()
+        }
+        with self._lock:
+            self._entries[api_key] = entry
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, api_key):
+        with self._lock:
+            self._entries.pop(api_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0
+            }
+
+class UsageRecorder:
+    """API 密钥使用记录的延迟写入
+
+    请求中只在内存里累计每个密钥的使用次数和最后使用时间，后台线程每隔
+    flush_interval 秒用一条 UPDATE 语句批量写入；进程退出时写入剩余记录。
+    """
+
+    def __init__(self, app, flush_interval=10):
+        self.app = app
+        self.flush_interval = float(flush_interval)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.flushes = 0
+
+    def record(self, key_id):
+        with self._lock:
+            count, _ = self._pending.get(key_id, (0, None))
+            self._pending[key_id] = (count + 1, datetime.utcnow())
+            if self._thread is None:
+                # 首次记录时才启动线程（gunicorn 预加载时在 worker 中启动）
+                self._thread = threading.Thread(target=self._run, name='api-key-usage', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """把累计的使用记录写入数据库，返回更新的密钥数"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        ids = list(pending)
+        table = ApiKey.__table__
+        statement = table.update().where(table.c.id.in_(ids)).values(
+            usage_count=db.func.coalesce(table.c.usage_count, 0) + case(
+                {key_id: count for key_id, (count, _) in pending.items()}, value=table.c.id
+            ),
+            last_used=case(
+                {key_id: last_used for key_id, (_, last_used) in pending.items()}, value=table.c.id
+            )
+        )
+        with self.app.app_context():
+            try:
+                db.session.execute(statement)
+                db.session.commit()
+                self.flushes += 1
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error flushing API key usage: {e}")
+                return 0
+        return len(ids)
+
+# 每个进程一份缓存和使用记录，首次使用时根据应用配置创建
+_cache = None
+_recorder = None
+_lock = threading.Lock()
+
+def get_api_key_cache():
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ApiKeyCache(
+                ttl=current_app.config['API_KEY_CACHE_TTL'],
+                max_entries=current_app.config['API_KEY_CACHE_ENTRIES']
+            )
+        return _cache
+
+def get_usage_recorder():
+    global _recorder
+    with _lock:
+        if _recorder is None:
+            _recorder = UsageRecorder(
+                current_app._get_current_object(),
+                flush_interval=current_app.config['API_KEY_USAGE_FLUSH_INTERVAL']
+            )
+        return _recorder
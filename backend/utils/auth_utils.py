@@ -3,7 +3,9 @@ from functools import wraps
 from flask import request, jsonify, current_app, g
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
 
-from models import db, ApiKey, User
+from models import ApiKey
+from utils.api_key_cache import get_api_key_cache, get_usage_recorder
+from utils.user_cache import get_user_snapshot
 
 def validate_email(email):
     """验证电子邮件格式是否正确"""
@@ -23,53 +25,72 @@ def validate_password(password):
     return True
 
 def get_user_by_api_key(api_key):
-    """通过API密钥获取用户"""
+    """通过API密钥获取用户快照
+
+    验证过的密钥在进程内缓存，缓存有效期内不查询密钥表；最后使用时间和使用
+    次数在后台批量写入，不在请求中提交。
+    """
     if not api_key:
         return None
-        
-    key_obj = ApiKey.query.filter_by(key=api_key, active=True).first()
     
-    if not key_obj or not key_obj.is_valid():
-        return None
+    cache = get_api_key_cache()
+    entry = cache.get(api_key)
+    if entry is None:
+        key_obj = ApiKey.query.filter_by(key=api_key, active=True).first()
+        
+        if not key_obj or not key_obj.is_valid():
+            return None
+        entry = cache.put(api_key, key_obj)
         
-    # 更新最后使用时间
-    key_obj.use()
-    db.session.commit()
+    # 记录最后使用时间
+    get_usage_recorder().record(entry['key_id'])
     
-    return User.query.get(key_obj.user_id)
+    return get_user_snapshot(entry['user_id'])
+
+def get_request_credential():
+    """从请求中取出凭据，返回 (类型, 令牌)，类型为 'jwt'、'api_key' 或 None
+
+    Bearer 令牌按格式区分：JWT 由三段以点分隔的 base64url 组成，API 密钥不含点。
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        token = auth_header[len('Bearer '):].strip()
+        if token.count('.') == 2:
+            return 'jwt', token
+        return 'api_key', token
+    
+    api_key = request.args.get('api_key')
+    if api_key:
+        return 'api_key', api_key
+    return None, None
 
 def api_key_required(f):
-    """API密钥验证装饰器"""
+    """JWT 或 API 密钥验证装饰器
+
+    根据凭据格式只走一种验证方式，用户信息从快照缓存中读取。
+    """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # 检查是否已经通过JWT认证
-        try:
-            verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            g.current_user = User.query.get(user_id)
-            return f(*args, **kwargs)
-        except:
-            # 如果JWT认证失败，尝试API密钥
-            pass
-            
-        # 从请求头或查询参数获取API密钥
-        api_key = None
-        auth_header = request.headers.get('Authorization')
+        credential_type, token = get_request_credential()
         
-        if auth_header and auth_header.startswith('Bearer '):
-            api_key = auth_header.split('Bearer ')[1]
-        else:
-            api_key = request.args.get('api_key')
-            
-        if not api_key:
+        if credential_type is None:
             return jsonify({"error": "Missing API key"}), 401
-            
-        user = get_user_by_api_key(api_key)
         
-        if not user:
-            return jsonify({"error": "Invalid or expired API key"}), 401
+        if credential_type == 'jwt':
+            # 无效或过期的 JWT 由 flask_jwt_extended 返回错误响应
+            verify_jwt_in_request()
+            user = get_user_snapshot(get_jwt_identity())
+            if not user:
+                return jsonify({"error": "User not found"}), 401
+        else:
+            user = get_user_by_api_key(token)
+            if not user:
+                return jsonify({"error": "Invalid or expired API key"}), 401
+        
+        if not user.active:
+            return jsonify({"error": "Account is disabled"}), 403
             
         g.current_user = user
         return f(*args, **kwargs)
     
-    return decorated_function 
\ No newline at end of file
+    return decorated_function
@@ -0,0 +1,170 @@
+import time
+import queue
+import weakref
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from flask import current_app
+
+class BatchScheduler:
+    """推理调度器：将同一模型的并发请求合并为一个批次执行
+
+    每个模型对应一个队列和一个后台线程。线程取到第一个请求后，最多再等待
+    max_wait_ms 毫秒收集更多请求，批次大小不超过 max_batch_size。
+    模型被淘汰（release）后仍持有它的请求直接在调用线程中推理，不再为其创建队列。
+    """
+
+    def __init__(self, max_batch_size=8, max_wait_ms=10):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._names = {}
+        # 已释放的模型，弱引用，模型对象被回收后自动移除
+        self._released = weakref.WeakSet()
+        self._batch_sizes = {}
+        self._wait_time = Counter()
+
+    def submit(self, model_name, model, image, confidence):
+        """提交一张图像，返回 Future，结果为该图像的 YOLO Results"""
+        future = Future()
+        item = (image, confidence, time.time(), future)
+        # 在锁内入队，保证不会排在 release() 放入的结束标记之后
+        with self._lock:
+            released = model in self._released
+            if not released:
+                self._get_queue(model_name, model).put(item)
+        if released:
+            # 模型已被淘汰，不再创建调度线程（否则模型永远不会被释放）
+            self._process(model_name, model, [item])
+        return future
+
+    def infer(self, model_name, model, image, confidence, timeout=None):
+        """提交并等待单张图像的推理结果"""
+        return self.submit(model_name, model, image, confidence).result(timeout)
+
+    def _get_queue(self, model_name, model):
+        # 按模型对象区分队列，回退到默认模型的请求会与其共用同一个队列
+        key = id(model)
+        if key not in self._queues:
+            self._queues[key] = queue.Queue()
+            self._names[key] = model_name
+            self._batch_sizes.setdefault(model_name, Counter())
+            threading.Thread(
+                target=self._run,
+                args=(model_name, model, self._queues[key]),
+                name=f"batch-scheduler-{model_name}",
+                daemon=True
+            ).start()
+        return self._queues[key]
+
+    def release(self, model):
+        """停止某个模型的调度线程（模型被淘汰时调用），已入队的请求仍会处理完"""
+        with self._lock:
+            self._released.add(model)
+            requests = self._queues.pop(id(model), None)
+            self._names.pop(id(model), None)
+        if requests is not None:
+            requests.put(None)
+
+    def _collect(self, requests):
+        """在等待窗口内收集一个批次，遇到结束标记时停止收集"""
+        batch = [requests.get()]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size and batch[-1] is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, model_name, model, requests):
+        while True:
+            batch = self._collect(requests)
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if batch:
+                self._process(model_name, model, batch)
+            if stop:
+                return
+
+    def _process(self, model_name, model, batch):
+        started = time.time()
+        images = [item[0] for item in batch]
+        # 以批次中最低的置信度推理，再按各请求的阈值过滤
+        batch_confidence = min(item[1] for item in batch)
+
+        try:
+            results = model(images, conf=batch_confidence, verbose=False, save=False)
+        except Exception as e:
+            for item in batch:
+                item[3].set_exception(e)
+            return
+
+        with self._lock:
+            self._batch_sizes.setdefault(model_name, Counter())[len(batch)] += 1
+            self._wait_time[model_name] += sum(started - item[2] for item in batch)
+
+        for (image, confidence, submitted, future), result in zip(batch, results):
+            if confidence > batch_confidence and result.boxes is not None:
+                result = result[result.boxes.conf >= confidence]
+            future.set_result(result)
+
+    def stats(self):
+        """返回各模型实际形成的批次大小分布"""
+        with self._lock:
+            queued = Counter()
+            for key, requests in self._queues.items():
+                queued[self._names[key]] += requests.qsize()
+
+            stats = {}
+            for model_name, sizes in self._batch_sizes.items():
+                batches = sum(sizes.values())
+                requests = sum(size * count for size, count in sizes.items())
+                stats[model_name] = {
+                    "batches": batches,
+                    "requests": requests,
+                    "mean_batch_size": round(requests / batches, 2) if batches else 0,
+                    "mean_queue_wait_ms": round(self._wait_time[model_name] * 1000 / requests, 2) if requests else 0,
+                    "batch_sizes": {str(size): count for size, count in sorted(sizes.items())},
+                    "queued": queued[model_name]
+                }
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "models": stats
+            }
+
+# 每个进程一个调度器
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_batch_scheduler():
+    """根据应用配置获取（或创建）批量推理调度器"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BatchScheduler(
+                max_batch_size=current_app.config.get('BATCH_MAX_SIZE', 8),
+                max_wait_ms=current_app.config.get('BATCH_MAX_WAIT_MS', 10)
+            )
+        return _scheduler
+
+def release_model(model_name, model):
+    """模型被淘汰时停止其调度线程，以便释放模型内存"""
+    if _scheduler is not None:
+        _scheduler.release(model)
+
+def get_batch_stats():
+    """获取批量推理统计信息，调度器未启动时返回空统计"""
+    if _scheduler is None:
+        return {
+            "max_batch_size": current_app.config.get('BATCH_MAX_SIZE', 8),
+            "max_wait_ms": current_app.config.get('BATCH_MAX_WAIT_MS', 10),
+            "models": {}
+        }
+    return _scheduler.stats()
@@ -0,0 +1,125 @@
+import threading
+from collections import Counter
+
+from flask import current_app
+
+# 客户端使用该模型 id 时按级联方式选择模型
+CASCADE_MODEL = 'auto'
+
+# 不确定性信号
+SIGNAL_LOW_CONFIDENCE = 'low_confidence'
+SIGNAL_NO_DETECTIONS = 'no_detections'
+SIGNAL_CROWDED = 'crowded'
+
+def cascade_rules():
+    """从应用配置读取级联的各级模型和升级条件"""
+    config = current_app.config
+    return {
+        "stages": config['CASCADE_STAGES'],
+        "low_confidence": config['CASCADE_LOW_CONFIDENCE'],
+        "max_low_confidence_ratio": config['CASCADE_MAX_LOW_CONFIDENCE_RATIO'],
+        "escalate_on_empty": config['CASCADE_ESCALATE_ON_EMPTY'],
+        "crowded_objects": config['CASCADE_CROWDED_OBJECTS']
+    }
+
+def uncertainty_signals(data, rules):
+    """判断一级模型的结果是否不确定，返回触发的信号列表
+
+    data 为 (N, 6) 检测数组；低置信度框占比过高、没有检测到物体、物体过多
+    （密集场景中小模型漏检较多）时升级到下一级模型。
+    """
+    signals = []
+    if len(data) == 0:
+        if rules['escalate_on_empty']:
+            signals.append(SIGNAL_NO_DETECTIONS)
+        return signals
+
+    low_ratio = float((data[:, 4] < rules['low_confidence']).mean())
+    if low_ratio > rules['max_low_confidence_ratio']:
+        signals.append(SIGNAL_LOW_CONFIDENCE)
+    if rules['crowded_objects'] and len(data) >= rules['crowded_objects']:
+        signals.append(SIGNAL_CROWDED)
+    return signals
+
+class CascadeStats:
+    """级联统计：各级模型的运行次数、升级原因和最终使用的模型"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.stage_runs = Counter()
+        self.escalations = Counter()
+        self.signals = Counter()
+        self.final_stage = Counter()
+
+    def record(self, stages):
+        """记录一张图像的级联过程，stages 为依次运行的各级结果"""
+        with self._lock:
+            self.images += 1
+            for stage in stages:
+                self.stage_runs[stage['model']] += 1
+                if stage['signals']:
+                    self.escalations[stage['model']] += 1
+                    self.signals.update(stage['signals'])
+            self.final_stage[stages[-1]['model']] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "images": self.images,
+                "stages": {
+                    model: {
+                        "runs": runs,
+                        "escalations": self.escalations[model],
+                        "escalation_rate": round(self.escalations[model] / runs, 4) if runs else 0
+                    }
+                    for model, runs in self.stage_runs.items()
+                },
+                "signals": dict(self.signals),
+                "final_stage": dict(self.final_stage),
+                # 平均每张图像运行的模型次数，衡量级联的推理成本
+                "runs_per_image": round(sum(self.stage_runs.values()) / self.images, 4) if self.images else 0
+            }
+
+# 每个进程一份统计
+cascade_stats = CascadeStats()
+
+def run_cascade(images, infer, rules):
+    """对一组图像执行级联检测
+
+    infer(model_name, images) 返回 (检测数组列表, 类别名称, 推理耗时)。每一级只对
+    上一级结果不确定的图像运行，最后一级的结果直接采用。返回
+    (检测数组列表, 类别名称, 总推理耗时, 每张图像的各级运行记录)。
+    """
+    stage_models = rules['stages']
+    results = [None] * len(images)
+    stages = [[] for _ in images]
+    pending = list(range(len(images)))
+    names = {}
+    processing_time = 0
+
+    for level, model_name in enumerate(stage_models):
+        detections, names, stage_time = infer(model_name, [images[i] for i in pending])
+        processing_time += stage_time
+        last = level == len(stage_models) - 1
+
+        escalated = []
+        for i, data in zip(pending, detections):
+            signals = [] if last else uncertainty_signals(data, rules)
+            stages[i].append({
+                "model": model_name,
+                "objects": len(data),
+                "signals": signals,
+                "processing_time": round(stage_time / len(pending), 4)
+            })
+            results[i] = data
+            if signals:
+                escalated.append(i)
+
+        pending = escalated
+        if not pending:
+            break
+
+    for image_stages in stages:
+        cascade_stats.record(image_stages)
+    return results, names, processing_time, stages
@@ -0,0 +1,92 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+import numpy as np
+from flask import current_app
+
+from utils.image_utils import letterbox_image
+from utils.quantization import box_iou_matrix
+from utils.detection_utils import infer_detections, unletterbox_detections
+
+# 对比时两个框 IoU 达到该值且类别相同才视为同一物体
+COMPARE_IOU_THRESHOLD = 0.5
+
+# 每个进程一个对比线程池，首次使用时按配置创建
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_compare_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['COMPARE_MAX_WORKERS'], thread_name_prefix='compare'
+            )
+        return _executor
+
+def match_boxes(data_a, data_b, iou_threshold=COMPARE_IOU_THRESHOLD):
+    """按 IoU 从高到低贪心一对一匹配两组检测框（类别必须相同），返回匹配对的 IoU 列表"""
+    if len(data_a) == 0 or len(data_b) == 0:
+        return []
+
+    ious = box_iou_matrix(data_a, data_b)
+    ious[data_a[:, 5][:, None] != data_b[:, 5][None, :]] = 0
+
+    matched = []
+    while True:
+        i, j = np.unravel_index(int(ious.argmax()), ious.shape)
+        if ious[i, j] < iou_threshold:
+            return matched
+        matched.append(float(ious[i, j]))
+        ious[i, :] = 0
+        ious[:, j] = 0
+
+def model_agreement(detections, iou_threshold=COMPARE_IOU_THRESHOLD):
+    """计算每两个模型之间的一致性
+
+    detections 为 {模型: 检测数组}。agreement 为匹配框数占两边框数均值的比例
+    （两边都没有检测到物体时为 1）。
+    """
+    pairs = []
+    for model_a, model_b in combinations(detections, 2):
+        data_a, data_b = detections[model_a], detections[model_b]
+        matched = match_boxes(data_a, data_b, iou_threshold)
+        total = len(data_a) + len(data_b)
+        pairs.append({
+            "models": [model_a, model_b],
+            "objects": [len(data_a), len(data_b)],
+            "matched": len(matched),
+            "agreement": round(2 * len(matched) / total, 4) if total else 1.0,
+            "mean_iou": round(sum(matched) / len(matched), 4) if matched else 0.0
+        })
+    return pairs
+
+def compare_models(image, model_names, confidence, input_size=640):
+    """用多个模型检测同一张图像
+
+    图像只 letterbox 一次，各模型在线程池中并发推理，检测框映射回 image 的坐标。
+    返回 ({模型: (检测数组, 类别名称, 耗时)}, 总耗时)；某个模型失败时对应的值为异常对象。
+    """
+    canvas, ratio, padding = letterbox_image(image, input_size)
+    app = current_app._get_current_object()
+
+    def run(model_name):
+        with app.app_context():
+            start_time = time.time()
+            (data,), names, _ = infer_detections(model_name, [canvas], confidence, batch=False)
+            return unletterbox_detections(data, ratio, padding, image.shape), names, time.time() - start_time
+
+    start_time = time.time()
+    executor = get_compare_executor()
+    futures = {model_name: executor.submit(run, model_name) for model_name in model_names}
+
+    outputs = {}
+    for model_name, future in futures.items():
+        try:
+            outputs[model_name] = future.result()
+        except Exception as e:
+            print(f"Error comparing model {model_name}: {e}")
+            outputs[model_name] = e
+    return outputs, time.time() - start_time
@@ -0,0 +1,189 @@
+import os
+import json
+import math
+
+# 每个 worker 默认使用的推理线程数：线程过多时 GEMM 的同步开销超过收益，
+# 多个较小的 worker 通常能获得更高的总吞吐
+DEFAULT_THREADS_PER_WORKER = 4
+
+# 每个 worker 默认的请求处理线程数（gthread）。与推理线程数分开规划：worker 数按核心数
+# 减少后，仍需要足够的并发，避免一个慢请求（大模型检测、NDJSON 流、长轮询）阻塞健康检查等请求
+DEFAULT_HTTP_THREADS = 4
+
+def available_cpus():
+    """当前进程允许使用的逻辑 CPU 编号（考虑 taskset / cpuset 限制）"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def cgroup_cpu_quota(root='/sys/fs/cgroup'):
+    """读取 cgroup 的 CPU 配额（核数，可以是小数），未限制时返回 None"""
+    # cgroup v2: "max 100000" 或 "200000 100000"
+    value = _read(os.path.join(root, 'cpu.max'))
+    if value:
+        quota, _, period = value.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / int(period)
+        return None
+
+    # cgroup v1
+    quota = _read(os.path.join(root, 'cpu', 'cpu.cfs_quota_us')) or _read(os.path.join(root, 'cpu.cfs_quota_us'))
+    period = _read(os.path.join(root, 'cpu', 'cpu.cfs_period_us')) or _read(os.path.join(root, 'cpu.cfs_period_us'))
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+def physical_cores(cpus, sysfs='/sys/devices/system/cpu'):
+    """将逻辑 CPU 按物理核心分组（超线程的兄弟线程在同一组），无法读取拓扑时每个 CPU 单独一组"""
+    cores = {}
+    for cpu in cpus:
+        topology = os.path.join(sysfs, f'cpu{cpu}', 'topology')
+        package = _read(os.path.join(topology, 'physical_package_id'))
+        core = _read(os.path.join(topology, 'core_id'))
+        key = (package, core) if package is not None and core is not None else ('cpu', cpu)
+        cores.setdefault(key, []).append(cpu)
+    return sorted(cores.values())
+
+def load_benchmark(path, effective_cores):
+    """读取基准测试结果中吞吐最高的配置，测试时的核心数与当前不同则忽略"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            benchmark = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error reading CPU benchmark {path}: {e}")
+        return None
+    if benchmark.get('effective_cores') != effective_cores or not benchmark.get('best'):
+        return None
+    return benchmark['best']
+
+def make_plan(workers=None, threads_per_worker=None, interop_threads=1, pin=False, benchmark_path=None,
+              http_threads=None):
+    """根据可用核心和 cgroup 配额，统一规划 worker 数、PyTorch 线程数和 OpenCV 线程数
+
+    推理线程按物理核心规划（超线程对卷积几乎没有收益），worker 数 x 线程数
+    不超过可用核心数，避免多个 worker 之间互相抢占。每个 worker 另有 http_threads
+    个请求处理线程，请求并发数不随推理线程数减少。
+    """
+    cpus = available_cpus()
+    quota = cgroup_cpu_quota()
+    cores = physical_cores(cpus)
+
+    effective = len(cores)
+    if quota is not None:
+        effective = min(effective, max(1, math.floor(quota)))
+
+    source = 'auto'
+    best = load_benchmark(benchmark_path, effective) if not (workers or threads_per_worker) else None
+    if best:
+        workers, threads_per_worker = best['workers'], best['threads']
+        pin = pin or best.get('pin', False)
+        source = 'benchmark'
+    elif workers or threads_per_worker:
+        source = 'config'
+
+    if workers and not threads_per_worker:
+        threads_per_worker = max(1, effective // workers)
+    threads_per_worker = max(1, min(threads_per_worker or DEFAULT_THREADS_PER_WORKER, effective))
+    if not workers:
+        workers = max(1, effective // threads_per_worker)
+
+    plan = {
+        "source": source,
+        "cpus": cpus,
+        "cpu_quota": quota,
+        "physical_cores": len(cores),
+        "effective_cores": effective,
+        "workers": workers,
+        "http_threads": max(1, http_threads or DEFAULT_HTTP_THREADS),
+        "torch_intra_op_threads": threads_per_worker,
+        "torch_interop_threads": interop_threads,
+        # 图像解码、缩放在请求线程中进行，单线程即可，避免与推理线程争抢
+        "opencv_threads": 1,
+        "pin": bool(pin),
+        "worker_cpu_sets": []
+    }
+
+    # 绑核：每个 worker 分配连续的物理核心（包括其超线程兄弟），worker 多于核心组时循环分配
+    if pin:
+        usable = cores[:effective]
+        groups = [usable[i:i + threads_per_worker] for i in range(0, effective, threads_per_worker)]
+        groups = [group for group in groups if len(group) == threads_per_worker] or [usable]
+        plan["worker_cpu_sets"] = [
+            sorted(cpu for core in groups[i % len(groups)] for cpu in core)
+            for i in range(workers)
+        ]
+    return plan
+
+def plan_from_env(workers=None):
+    """使用环境变量构建规划（gunicorn 配置和应用中使用同一份逻辑）"""
+    return make_plan(
+        workers=workers or int(os.environ.get('GUNICORN_WORKERS', 0)) or None,
+        threads_per_worker=int(os.environ.get('CPU_THREADS_PER_WORKER', 0)) or None,
+        interop_threads=int(os.environ.get('TORCH_INTEROP_THREADS', 1)),
+        pin=os.environ.get('CPU_PIN_WORKERS', 'false').lower() == 'true',
+        benchmark_path=os.environ.get('CPU_BENCHMARK_FILE', ''),
+        http_threads=int(os.environ.get('GUNICORN_THREADS', 0)) or None
+    )
+
+def get_cpu_plan():
+    """当前服务使用的规划：gunicorn master 规划后通过 CPU_PLAN 环境变量传给 worker，
+    worker 绑核后重新计算会得到不同的结果"""
+    if os.environ.get('CPU_PLAN'):
+        return json.loads(os.environ['CPU_PLAN'])
+    return plan_from_env()
+
+def thread_env(plan):
+    """OpenMP / MKL 线程数环境变量，需要在导入 torch 之前设置"""
+    threads = str(plan['torch_intra_op_threads'])
+    return {name: threads for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')}
+
+def apply_plan(plan, worker_index=None, torch_threads=True):
+    """在当前进程中应用规划：线程数、OpenCV 线程数，以及可选的绑核
+
+    torch_threads 为 False 时（web worker 通过模型服务推理）不导入 torch，推理线程由模型服务设置。
+    """
+    if torch_threads:
+        for name, value in thread_env(plan).items():
+            os.environ.setdefault(name, value)
+
+        import torch
+
+        torch.set_num_threads(plan['torch_intra_op_threads'])
+        try:
+            torch.set_num_interop_threads(plan['torch_interop_threads'])
+        except RuntimeError:
+            # 已执行过并行运算（例如 master 中预热过模型）后不能再修改
+            pass
+
+    import cv2
+
+    cv2.setNumThreads(plan['opencv_threads'])
+
+    if worker_index is not None and plan['worker_cpu_sets'] and hasattr(os, 'sched_setaffinity'):
+        cpu_set = plan['worker_cpu_sets'][worker_index % len(plan['worker_cpu_sets'])]
+        os.sched_setaffinity(0, cpu_set)
+
+def current_settings(torch_threads=True):
+    """当前进程实际生效的线程数和可用 CPU，torch_threads 为 False 时不导入 torch"""
+    import cv2
+
+    settings = {
+        "pid": os.getpid(),
+        "affinity": available_cpus(),
+        "opencv_threads": cv2.getNumThreads()
+    }
+    if torch_threads:
+        import torch
+
+        settings["torch_intra_op_threads"] = torch.get_num_threads()
+        settings["torch_interop_threads"] = torch.get_num_interop_threads()
+    return settings
@@ -0,0 +1,174 @@
+from datetime import datetime
+
+from sqlalchemy import and_, or_, insert, select
+
+from models import db, User, Detection
+from utils.history import encode_cursor, decode_cursor, MAX_PER_PAGE
+
+class DetectionObject(db.Model):
+    """检测记录中的单个物体，写入历史记录时同步写入，用于按类别、置信度、框大小检索
+
+    user_id 和 created_at 从检测记录冗余过来，检索只需扫描本表的索引。
+    """
+    __tablename__ = 'detection_objects'
+    __table_args__ = (
+        db.Index('ix_detection_objects_user_class_conf', 'user_id', 'class_name', 'confidence'),
+        db.Index('ix_detection_objects_user_created', 'user_id', 'created_at', 'detection_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    detection_id = db.Column(db.Integer, db.ForeignKey(Detection.id, ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey(User.id, ondelete='CASCADE'), nullable=False)
+    class_id = db.Column(db.Integer, nullable=False)
+    class_name = db.Column(db.String(64), nullable=False)
+    confidence = db.Column(db.Float, nullable=False)
+    x1 = db.Column(db.Float, nullable=False)
+    y1 = db.Column(db.Float, nullable=False)
+    x2 = db.Column(db.Float, nullable=False)
+    y2 = db.Column(db.Float, nullable=False)
+    area = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "class_id": self.class_id,
+            "class_name": self.class_name,
+            "confidence": self.confidence,
+            "bbox": {
+                "x1": self.x1,
+                "y1": self.y1,
+                "x2": self.x2,
+                "y2": self.y2,
+                "width": round(self.x2 - self.x1, 2),
+                "height": round(self.y2 - self.y1, 2)
+            }
+        }
+
+def object_rows(detection_id, user_id, created_at, results):
+    """把逐个物体格式的检测结果转换为 detection_objects 表的行"""
+    rows = []
+    for obj in results or []:
+        box = obj['bbox']
+        rows.append({
+            "detection_id": detection_id,
+            "user_id": user_id,
+            "class_id": obj['class_id'],
+            "class_name": obj['class_name'],
+            "confidence": obj['confidence'],
+            "x1": box['x1'],
+            "y1": box['y1'],
+            "x2": box['x2'],
+            "y2": box['y2'],
+            "area": (box['x2'] - box['x1']) * (box['y2'] - box['y1']),
+            "created_at": created_at
+        })
+    return rows
+
+def save_detection_objects(detections):
+    """为已 flush（已分配 id）的检测记录批量写入物体行，与检测记录在同一事务中提交"""
+    rows = []
+    for detection in detections:
+        rows.extend(object_rows(detection.id, detection.user_id, detection.created_at, detection.results))
+    if rows:
+        db.session.execute(insert(DetectionObject), rows)
+    return len(rows)
+
+def delete_detection_objects(user_id, detection_id=None):
+    """删除检测记录前删除其物体行（SQLite 等不强制外键级联）"""
+    query = DetectionObject.query.filter_by(user_id=user_id)
+    if detection_id is not None:
+        query = query.filter_by(detection_id=detection_id)
+    query.delete(synchronize_session=False)
+
+def object_filters(user_id, class_names=None, class_ids=None, min_confidence=None, max_confidence=None,
+                   min_area=None, max_area=None, since=None, until=None):
+    """检索条件，全部在 SQL 中求值"""
+    conditions = [DetectionObject.user_id == user_id]
+    if class_names:
+        conditions.append(DetectionObject.class_name.in_(class_names))
+    if class_ids:
+        conditions.append(DetectionObject.class_id.in_(class_ids))
+    if min_confidence is not None:
+        conditions.append(DetectionObject.confidence >= min_confidence)
+    if max_confidence is not None:
+        conditions.append(DetectionObject.confidence <= max_confidence)
+    if min_area is not None:
+        conditions.append(DetectionObject.area >= min_area)
+    if max_area is not None:
+        conditions.append(DetectionObject.area <= max_area)
+    if since is not None:
+        conditions.append(DetectionObject.created_at >= since)
+    if until is not None:
+        conditions.append(DetectionObject.created_at < until)
+    return conditions
+
+def search_detections(conditions, per_page=20, cursor=None):
+    """查找包含满足条件物体的检测记录，按 (created_at, detection_id) 倒序游标分页
+
+    返回 ([(detection_id, created_at, [匹配的物体, ...]), ...], 下一页游标)。
+    """
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    page_conditions = list(conditions)
+    if cursor:
+        created_at, detection_id = decode_cursor(cursor)
+        page_conditions.append(or_(
+            DetectionObject.created_at < created_at,
+            and_(DetectionObject.created_at == created_at, DetectionObject.detection_id < detection_id)
+        ))
+
+    # 先找出一页检测记录，再取这些记录中满足条件的物体
+    matches = db.session.execute(
+        select(DetectionObject.detection_id, DetectionObject.created_at)
+        .where(*page_conditions)
+        .group_by(DetectionObject.detection_id, DetectionObject.created_at)
+        .order_by(DetectionObject.created_at.desc(), DetectionObject.detection_id.desc())
+        .limit(per_page + 1)
+    ).all()
+
+    next_cursor = None
+    if len(matches) > per_page:
+        next_cursor = encode_cursor(matches[per_page - 1].created_at, matches[per_page - 1].detection_id)
+        matches = matches[:per_page]
+
+    objects = {}
+    if matches:
+        rows = DetectionObject.query.filter(
+            DetectionObject.detection_id.in_([match.detection_id for match in matches]), *conditions
+        ).order_by(DetectionObject.confidence.desc()).all()
+        for row in rows:
+            objects.setdefault(row.detection_id, []).append(row.to_dict())
+
+    return [
+        (match.detection_id, match.created_at, objects.get(match.detection_id, []))
+        for match in matches
+    ], next_cursor
+
+def backfill_detection_objects(chunk_size=1000, start_id=0, limit=None):
+    """为已有的检测记录补写物体行，按 id 分块处理，每块提交一次
+
+    已有物体行的记录会跳过，中断后可用上次输出的 id 继续。逐块产生
+    (本块最后一条记录的 id, 本块处理的记录数, 写入的物体数)。
+    """
+    last_id = start_id
+    processed = 0
+    while limit is None or processed < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - processed)
+        detections = Detection.query.filter(Detection.id > last_id).order_by(Detection.id).limit(size).all()
+        if not detections:
+            return
+
+        ids = [detection.id for detection in detections]
+        done = {
+            row[0] for row in db.session.execute(
+                select(DetectionObject.detection_id).where(DetectionObject.detection_id.in_(ids)).distinct()
+            )
+        }
+        pending = [detection for detection in detections if detection.id not in done]
+        written = save_detection_objects(pending)
+        db.session.commit()
+        # 释放本块加载的对象，内存占用不随总量增长
+        db.session.expunge_all()
+
+        last_id = ids[-1]
+        processed += len(detections)
+        yield last_id, len(pending), written
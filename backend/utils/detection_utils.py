@@ -1,39 +1,84 @@
 import os
+import gc
+import itertools
 import time
+import threading
 import cv2
-import uuid
 import numpy as np
 from flask import current_app
-from ultralytics import YOLO
 
-# 缓存已加载的模型
-model_cache = {}
+from utils.batch_scheduler import get_batch_scheduler, release_model
+from utils.model_registry import ModelRegistry
+from utils.inference_backends import load_backend_model
+from utils.quantization import int8_model_name, int8_weights_name
+from utils.model_client import get_model_client, ModelServerError
+from utils.tiling import iter_tiles, iter_batches, non_max_suppression
+from utils.cascade import CASCADE_MODEL, cascade_rules, run_cascade
+from utils.result_renderer import (
+    draw_detections, generate_color, save_result_image, schedule_result_image
+)
+
+# 可用的YOLOv8模型及对应的权重文件
+YOLO_MODELS = {
+    'yolov8n': 'yolov8n.pt',
+    'yolov8s': 'yolov8s.pt',
+    'yolov8m': 'yolov8m.pt',
+    'yolov8l': 'yolov8l.pt',
+    'yolov8x': 'yolov8x.pt'
+}
+
+# INT8 量化模型（由 quantize_models.py 离线生成），例如 yolov8s-int8 -> yolov8s-int8.onnx
+YOLO_MODELS.update({
+    int8_model_name(name): int8_weights_name(weights) for name, weights in list(YOLO_MODELS.items())
+})
+
+# 已加载模型的注册表（带内存预算和LRU淘汰），首次使用时根据应用配置创建
+model_registry = None
+_registry_lock = threading.Lock()
+
+# 已完成预热的模型及各输入尺寸的预热耗时
+warmed_models = {}
+
+# 各模型实际使用的推理后端（openvino / onnx / torch）
+model_backends = {}
+
+def _load_model(model_name):
+    # 按配置选择推理后端，没有导出模型时从本地加载或自动下载 PyTorch 权重
+    preference = current_app.config.get('INFERENCE_BACKEND_OVERRIDES', {}).get(
+        model_name, current_app.config.get('INFERENCE_BACKEND', 'auto')
+    )
+    model, backend = load_backend_model(current_app.config['MODEL_FOLDER'], YOLO_MODELS[model_name], preference)
+    model_backends[model_name] = backend
+    return model
+
+def _on_model_evicted(model_name, model):
+    warmed_models.pop(model_name, None)
+    model_backends.pop(model_name, None)
+    release_model(model_name, model)
+
+def get_model_registry():
+    """获取（或创建）当前进程的模型注册表"""
+    global model_registry
+    with _registry_lock:
+        if model_registry is None:
+            # 默认模型和预加载的模型固定常驻，不参与淘汰
+            pinned = {current_app.config['DEFAULT_MODEL']}
+            pinned.update(current_app.config.get('PRELOAD_MODELS', []))
+            model_registry = ModelRegistry(
+                _load_model,
+                memory_budget=current_app.config.get('MODEL_MEMORY_BUDGET_MB', 0) * 1024 * 1024,
+                pinned=pinned
+            )
+            model_registry.on_evict(_on_model_evicted)
+        return model_registry
 
 def get_model(model_name):
     """获取或加载指定的YOLOv8模型"""
-    if model_name in model_cache:
-        return model_cache[model_name]
-        
-    # 检查模型是否存在
-    model_folder = current_app.config['MODEL_FOLDER']
-    yolo_models = {
-        'yolov8n': 'yolov8n.pt',
-        'yolov8s': 'yolov8s.pt',
-        'yolov8m': 'yolov8m.pt',
-        'yolov8l': 'yolov8l.pt',
-        'yolov8x': 'yolov8x.pt'
-    }
-    
-    if model_name not in yolo_models:
+    if model_name not in YOLO_MODELS:
         model_name = 'yolov8s'  # 默认使用 yolov8s
-        
-    model_path = yolo_models[model_name]
     
-    # 从本地加载或自动下载模型
     try:
-        model = YOLO(model_path)
-        model_cache[model_name] = model
-        return model
+        return get_model_registry().get(model_name)
     except Exception as e:
         print(f"Error loading model {model_name}: {e}")
         # 尝试加载默认模型
@@ -41,112 +86,316 @@ def get_model(model_name):
             return get_model('yolov8s')
         raise
 
-def detect_objects(image_path, model_name='yolov8s', confidence=0.25, save_result=True):
-    """使用YOLOv8检测图像中的物体"""
-    try:
-        # 检查图像是否存在
-        if not os.path.exists(image_path):
-            return None, 0, None
-            
-        # 加载模型
+def parse_warmup_sizes(value):
+    """解析预热尺寸配置，例如 "640,1280x720"，返回 (宽, 高) 列表"""
+    sizes = []
+    for item in str(value).split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if 'x' in item:
+            width, height = item.split('x', 1)
+            sizes.append((int(width), int(height)))
+        else:
+            sizes.append((int(item), int(item)))
+    return sizes
+
+def warmup_model(model, sizes):
+    """用空白图像按各输入尺寸各推理一次，提前完成层融合和内存分配"""
+    timings = {}
+    for width, height in sizes:
+        dummy = np.zeros((height, width, 3), dtype=np.uint8)
+        start_time = time.time()
+        # 显式指定输入尺寸，否则会被缩放到默认的 640 而只预热一种尺寸
+        model(dummy, imgsz=(height, width), verbose=False, save=False)
+        timings[f"{width}x{height}"] = round(time.time() - start_time, 4)
+    return timings
+
+def preload_models(model_names, warmup_sizes):
+    """启动时加载并预热模型
+
+    在 gunicorn 以 preload_app 方式启动时于 fork 之前执行，模型权重随后
+    以写时复制方式在各 worker 之间共享。
+    """
+    for model_name in model_names:
         model = get_model(model_name)
         
-        # 开始计时
+        # 推理不需要梯度，冻结参数避免 worker 中写入权重所在的内存页（仅 PyTorch 后端）
+        if hasattr(model.model, 'parameters'):
+            for param in model.model.parameters():
+                param.requires_grad_(False)
+        
+        warmed_models[model_name] = warmup_model(model, warmup_sizes)
+        print(f"Model {model_name} warmed up: {warmed_models[model_name]}")
+    
+    # 将已加载的对象移出垃圾回收的扫描范围，fork 后不会因 GC 触碰这些页面
+    gc.collect()
+    gc.freeze()
+
+def get_model_stats():
+    """模型注册表的统计信息，附带各模型使用的推理后端"""
+    stats = get_model_registry().stats()
+    for model_name, model_stats in stats['models'].items():
+        model_stats['backend'] = model_backends.get(model_name)
+    return stats
+
+def get_readiness():
+    """返回配置的预加载模型是否都已完成预热；使用模型服务时以模型服务的状态为准"""
+    client = get_model_client()
+    if client is not None:
+        try:
+            return client.status()
+        except ModelServerError as e:
+            return {"ready": False, "error": str(e)}
+    
+    required = current_app.config.get('PRELOAD_MODELS', [])
+    pending = [name for name in required if name not in warmed_models]
+    return {
+        "ready": not pending,
+        "warmed_models": warmed_models,
+        "pending_models": pending
+    }
+
+def run_inference(model_name, model, image, confidence):
+    """对单张图像执行推理，启用批量推理时交给调度器合并请求"""
+    if current_app.config.get('BATCH_INFERENCE_ENABLED'):
+        return get_batch_scheduler().infer(model_name, model, image, confidence)
+    
+    return model(image, conf=confidence, verbose=False, save=False)[0]
+
+def run_inference_batch(model_name, model, images, confidence):
+    """对多张图像执行一次批量推理，启用调度器时由调度器统一组批"""
+    if current_app.config.get('BATCH_INFERENCE_ENABLED'):
+        scheduler = get_batch_scheduler()
+        futures = [scheduler.submit(model_name, model, image, confidence) for image in images]
+        return [future.result() for future in futures]
+    
+    return model(images, conf=confidence, verbose=False, save=False)
+
+def infer_detections(model_name, images, confidence, batch=True, stages=None):
+    """执行检测并返回 ([检测数组, ...], 类别名称, 推理耗时)
+
+    配置了模型服务时通过共享内存交给模型服务推理，否则在本进程中加载模型推理。
+    model_name 为 'auto' 时按级联方式从小模型开始，只对结果不确定的图像升级；
+    传入 stages 列表时追加每张图像的各级运行记录。
+    """
+    if model_name == CASCADE_MODEL:
+        detections, names, processing_time, image_stages = run_cascade(
+            images,
+            lambda stage_model, stage_images: infer_detections(stage_model, stage_images, confidence, batch),
+            cascade_rules()
+        )
+        if stages is not None:
+            stages.extend(image_stages)
+        return detections, names, processing_time
+    
+    client = get_model_client()
+    if client is not None:
         start_time = time.time()
+        detections, names, _ = client.detect(model_name, images, confidence)
+        return detections, names, time.time() - start_time
+    
+    model = get_model(model_name)
+    
+    start_time = time.time()
+    if batch:
+        results = run_inference_batch(model_name, model, images, confidence)
+    else:
+        results = [run_inference(model_name, model, image, confidence) for image in images]
+    processing_time = time.time() - start_time
+    
+    # 处理结果：整个 boxes 张量一次性转换
+    return [extract_detections(result) for result in results], results[0].names, processing_time
+
+def infer_tiled(model_name, image, confidence, tiling):
+    """分块推理：将大图切成有重叠的分块，按批次推理后用 NMS 合并
+
+    分块按批次流式生成，任何时刻只有一个批次的分块在推理中；整图缩小后
+    也推理一次，找回跨越多个分块的大物体。返回 (检测数组, 类别名称, 推理耗时)。
+    """
+    tiles = iter_tiles(image, tiling['tile_size'], tiling['overlap'])
+    if max(image.shape[:2]) > tiling['tile_size']:
+        tiles = itertools.chain([(0, 0, image)], tiles)
+    
+    merged = []
+    names = None
+    processing_time = 0
+    for batch in iter_batches(tiles, tiling['batch_size']):
+        detections, names, batch_time = infer_detections(model_name, [tile for _, _, tile in batch], confidence)
+        processing_time += batch_time
+        for (x0, y0, _), data in zip(batch, detections):
+            if len(data):
+                data = data.copy()
+                data[:, [0, 2]] += x0
+                data[:, [1, 3]] += y0
+                merged.append(data)
+    
+    data = np.concatenate(merged) if merged else np.zeros((0, 6), dtype=np.float32)
+    return non_max_suppression(data, tiling.get('iou_threshold', 0.5)), names, processing_time
+
+def extract_detections(result):
+    """将检测结果一次性转换为 (N, 6) 数组：x1, y1, x2, y2, confidence, class_id"""
+    if result is None or result.boxes is None or len(result.boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    
+    data = result.boxes.data.cpu().numpy()
+    # 跟踪模式下会多出一列 track_id，只保留坐标、置信度和类别
+    return np.concatenate([data[:, :4], data[:, -2:]], axis=1)
+
+def scale_detections(data, scale):
+    """把缩小解码图像上的检测框映射回原图坐标，scale 为 (x 缩放, y 缩放)"""
+    if scale is None or tuple(scale) == (1.0, 1.0):
+        return data
+    data = data.copy()
+    data[:, [0, 2]] *= scale[0]
+    data[:, [1, 3]] *= scale[1]
+    return data
+
+def unletterbox_detections(data, ratio, padding, shape):
+    """把 letterbox 图像上的检测框映射回 letterbox 之前的图像坐标并裁剪到图像范围内"""
+    data = data.copy()
+    data[:, [0, 2]] = (data[:, [0, 2]] - padding[0]) / ratio
+    data[:, [1, 3]] = (data[:, [1, 3]] - padding[1]) / ratio
+    data[:, [0, 2]] = data[:, [0, 2]].clip(0, shape[1])
+    data[:, [1, 3]] = data[:, [1, 3]].clip(0, shape[0])
+    return data
+
+def objects_from_array(data, names):
+    """将检测数组转换为逐个物体的字典列表"""
+    if len(data) == 0:
+        return []
+    
+    # 整列取整后一次性转为 Python 列表
+    xyxy = np.round(data[:, :4].astype(np.float64), 2).tolist()
+    sizes = np.round((data[:, 2:4] - data[:, :2]).astype(np.float64), 2).tolist()
+    confidences = np.round(data[:, 4].astype(np.float64), 4).tolist()
+    class_ids = data[:, 5].astype(np.int64).tolist()
+    
+    return [
+        {
+            'id': i,
+            'class_id': class_id,
+            'class_name': names[class_id],
+            'confidence': conf,
+            'bbox': {
+                'x1': box[0],
+                'y1': box[1],
+                'x2': box[2],
+                'y2': box[3],
+                'width': size[0],
+                'height': size[1]
+            }
+        }
+        for i, (box, size, conf, class_id) in enumerate(zip(xyxy, sizes, confidences, class_ids))
+    ]
+
+def columnar_from_array(data, names):
+    """将检测数组转换为列式结构（class_id、confidence、xyxy 三个平行数组）"""
+    class_ids = data[:, 5].astype(np.int64)
+    
+    return {
+        'class_id': class_ids.tolist(),
+        'confidence': np.round(data[:, 4].astype(np.float64), 4).tolist(),
+        'xyxy': np.round(data[:, :4].astype(np.float64), 2).tolist(),
+        'class_names': {str(class_id): names[class_id] for class_id in np.unique(class_ids).tolist()}
+    }
+
+def objects_from_columnar(columnar):
+    """将列式结果还原为逐个物体的字典列表"""
+    objects = []
+    for i, (class_id, conf, box) in enumerate(zip(columnar['class_id'], columnar['confidence'], columnar['xyxy'])):
+        x1, y1, x2, y2 = box
+        objects.append({
+            'id': i,
+            'class_id': class_id,
+            'class_name': columnar['class_names'][str(class_id)],
+            'confidence': conf,
+            'bbox': {
+                'x1': x1,
+                'y1': y1,
+                'x2': x2,
+                'y2': y2,
+                'width': round(x2 - x1, 2),
+                'height': round(y2 - y1, 2)
+            }
+        })
+    return objects
+
+def format_detections(data, names, result_format='objects'):
+    """按请求的格式转换检测数组"""
+    if result_format == 'columnar':
+        return columnar_from_array(data, names)
+    return objects_from_array(data, names)
+
+def count_detections(results):
+    """统计检测结果中的物体数量，兼容两种结果格式"""
+    if isinstance(results, dict):
+        return len(results['class_id'])
+    return len(results)
+
+def detect_objects(image, model_name='yolov8s', confidence=0.25, save_result=True, result_format='objects',
+                   render='sync', source_path=None, preprocessing=None, tiling=None, stages=None, scale=None):
+    """使用YOLOv8检测图像中的物体
+
+    image 可以是图像路径，也可以是已解码的 BGR NumPy 数组。
+    result_format 为 'columnar' 时返回列式结果，否则返回逐个物体的字典列表。
+    render 为 'lazy' 且提供了原图路径 source_path 时，结果图像在首次访问时才绘制，
+    绘制前会对原图重新应用 preprocessing。
+    提供 tiling（tile_size、overlap、batch_size）时使用分块推理。
+    model_name 为 'auto' 时使用级联模型，传入 stages 列表可获取各级运行记录。
+    image 是缩小解码的图像时传入 scale，返回的检测框为原图坐标。
+    """
+    try:
+        if isinstance(image, np.ndarray):
+            img = image
+        else:
+            # 检查图像是否存在
+            if not os.path.exists(image):
+                return None, 0, None
+            img = cv2.imread(image)
         
+        if img is None:
+            return None, 0, None
+            
         # 执行检测
-        results = model(image_path, conf=confidence, verbose=False, save=False)
+        if tiling:
+            data, names, processing_time = infer_tiled(model_name, img, confidence, tiling)
+        else:
+            image_stages = []
+            (data,), names, processing_time = infer_detections(
+                model_name, [img], confidence, batch=False, stages=image_stages
+            )
+            if stages is not None and image_stages:
+                stages.extend(image_stages[0])
         
-        # 计算处理时间
-        processing_time = time.time() - start_time
+        original = scale_detections(data, scale)
+        result_objects = format_detections(original, names, result_format)
         
-        # 处理结果
-        result_objects = []
-        
-        if results and len(results) > 0:
-            # 获取第一张图片的结果
-            result = results[0]
-            
-            # 将结果转换为列表
-            for i, box in enumerate(result.boxes):
-                box_data = box.data.tolist()[0]
-                x1, y1, x2, y2, conf, cls = box_data
-                
-                class_id = int(cls)
-                class_name = result.names[class_id]
-                
-                result_objects.append({
-                    'id': i,
-                    'class_id': class_id,
-                    'class_name': class_name,
-                    'confidence': round(float(conf), 4),
-                    'bbox': {
-                        'x1': round(float(x1), 2),
-                        'y1': round(float(y1), 2),
-                        'x2': round(float(x2), 2),
-                        'y2': round(float(y2), 2),
-                        'width': round(float(x2 - x1), 2),
-                        'height': round(float(y2 - y1), 2)
-                    }
-                })
-            
-            # 保存结果图像
-            result_path = None
-            if save_result:
-                img = cv2.imread(image_path)
-                for obj in result_objects:
-                    # 获取边界框
-                    bbox = obj['bbox']
-                    x1, y1 = int(bbox['x1']), int(bbox['y1'])
-                    x2, y2 = int(bbox['x2']), int(bbox['y2'])
-                    
-                    # 绘制边界框
-                    color = generate_color(obj['class_id'])
-                    cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
-                    
-                    # 绘制标签
-                    label = f"{obj['class_name']} {obj['confidence']:.2f}"
-                    font_scale = 0.7
-                    thickness = 2
-                    (label_width, label_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
-                    
-                    # 标签背景
-                    cv2.rectangle(img, (x1, y1 - label_height - 10), (x1 + label_width, y1), color, -1)
-                    
-                    # 标签文本
-                    cv2.putText(img, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), thickness)
-                
-                # 保存结果图像
-                result_filename = f"result_{uuid.uuid4().hex}.jpg"
-                result_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'results', result_filename)
-                os.makedirs(os.path.dirname(result_path), exist_ok=True)
-                cv2.imwrite(result_path, img)
+        # 保存结果图像：lazy 模式只记录检测结果，首次访问时在原图上绘制
+        result_path = None
+        if save_result:
+            if render == 'lazy' and source_path:
+                result_path = schedule_result_image(source_path, original, names, preprocessing)
+            else:
+                result_path = save_result_image(img, data, names)
             
         return result_objects, processing_time, result_path
     except Exception as e:
         print(f"Error in object detection: {e}")
         return None, 0, None
 
-def generate_color(class_id):
-    """为类别生成唯一颜色"""
-    colors = [
-        (255, 0, 0),    # 红色
-        (0, 255, 0),    # 绿色
-        (0, 0, 255),    # 蓝色
-        (255, 255, 0),  # 黄色
-        (255, 0, 255),  # 洋红色
-        (0, 255, 255),  # 青色
-        (255, 165, 0),  # 橙色
-        (128, 0, 128),  # 紫色
-        (0, 128, 0),    # 深绿色
-        (139, 69, 19)   # 褐色
-    ]
-    
-    return colors[class_id % len(colors)]
+def detect_objects_batch(images, model_name='yolov8s', confidence=0.25):
+    """对一批已解码的图像执行检测
+
+    返回与 images 一一对应的 (检测数组, 类别名称) 列表，以及整批的推理耗时。
+    """
+    detections, names, processing_time = infer_detections(model_name, images, confidence)
+    return [(data, names) for data in detections], processing_time
 
 def get_available_models():
     """获取可用模型列表"""
     models = [
+        {"id": CASCADE_MODEL, "name": "Auto (cascade)", "description": "Starts with a small model and escalates uncertain images to larger models."},
         {"id": "yolov8n", "name": "YOLOv8 Nano", "description": "Fastest, smaller model, lower accuracy."},
         {"id": "yolov8s", "name": "YOLOv8 Small", "description": "Good balance of speed and accuracy."},
         {"id": "yolov8m", "name": "YOLOv8 Medium", "description": "Medium size model with better accuracy."},
@@ -154,4 +403,15 @@ def get_available_models():
         {"id": "yolov8x", "name": "YOLOv8 XLarge", "description": "Extra-large model for highest accuracy."}
     ]
     
+    # 已生成的 INT8 量化模型
+    model_folder = current_app.config['MODEL_FOLDER']
+    for model in list(models[1:]):
+        model_id = int8_model_name(model["id"])
+        if os.path.exists(os.path.join(model_folder, YOLO_MODELS[model_id])):
+            models.append({
+                "id": model_id,
+                "name": f"{model['name']} INT8",
+                "description": "INT8-quantized variant, faster on CPU with slightly lower accuracy."
+            })
+    
     return models 
\ No newline at end of file
@@ -0,0 +1,78 @@
+import json
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_, func, select
+
+from models import db, Detection
+
+# 与迁移 3f1c9a2b7d10 中的索引一致，游标分页和计数都只扫描该索引
+history_index = db.Index('ix_detection_user_created_id', Detection.user_id, Detection.created_at, Detection.id)
+
+MAX_PER_PAGE = 100
+
+# 近似总数最多数到这么多条，超过时返回下限
+APPROXIMATE_TOTAL_LIMIT = 10000
+
+def encode_cursor(created_at, record_id):
+    """把一条记录的 (created_at, id) 编码为不透明的游标"""
+    payload = json.dumps([created_at.isoformat(), record_id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """解析游标，返回 (created_at, id)，格式无效时抛出 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, detection_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(detection_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def get_history_page(user_id, per_page=10, cursor=None):
+    """按 (created_at, id) 倒序获取一页历史记录
+
+    cursor 为上一页返回的 next_cursor，只查询排在其后的记录，不使用 OFFSET，
+    任意深度的分页代价相同。返回 (记录列表, 下一页游标)，没有更多记录时游标为 None。
+    """
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    query = Detection.query.filter(Detection.user_id == user_id)
+    if cursor:
+        created_at, detection_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Detection.created_at < created_at,
+            and_(Detection.created_at == created_at, Detection.id < detection_id)
+        ))
+
+    # 多取一条判断是否还有下一页
+    items = query.order_by(Detection.created_at.desc(), Detection.id.desc()).limit(per_page + 1).all()
+    next_cursor = None
+    if len(items) > per_page:
+        next_cursor = encode_cursor(items[per_page - 1].created_at, items[per_page - 1].id)
+    return items[:per_page], next_cursor
+
+def get_history_offset_page(user_id, page=1, per_page=10):
+    """旧的按页码分页（已弃用，保留给尚未改用游标的客户端）
+
+    返回 (记录列表, 总数, 下一页游标)；深页需要 OFFSET 扫描，并且每次都做一次 COUNT。
+    """
+    page = max(1, int(page))
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    query = Detection.query.filter(Detection.user_id == user_id)
+    total = query.count()
+    items = query.order_by(Detection.created_at.desc(), Detection.id.desc()) \
+        .offset((page - 1) * per_page).limit(per_page).all()
+    next_cursor = None
+    if items and page * per_page < total:
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return items, total, next_cursor
+
+def approximate_history_total(user_id, limit=APPROXIMATE_TOTAL_LIMIT):
+    """统计用户的历史记录数，最多数到 limit 条
+
+    返回 (数量, 是否精确)；超过 limit 时数量为 limit，计数代价与历史总量无关。
+    """
+    rows = select(Detection.id).where(Detection.user_id == user_id).limit(limit + 1).subquery()
+    count = db.session.execute(select(func.count()).select_from(rows)).scalar()
+    if count > limit:
+        return limit, False
+    return count, True
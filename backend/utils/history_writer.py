@@ -0,0 +1,166 @@
+import atexit
+import threading
+
+from flask import current_app
+
+from models import db
+from utils.detection_objects import save_detection_objects
+
+class HistoryWriter:
+    """检测历史的延迟写入
+
+    请求只把新建的 Detection 放入内存队列，后台线程在队列达到 flush_size 或
+    每隔 flush_interval 秒时批量插入（连同物体行）并提交一次。flush_on_shutdown
+    为 True 时进程退出前写入队列中剩余的记录；进程被强制杀死时这些记录会丢失。
+    队列超过 max_pending 时 submit() 返回 False，由调用方同步写入。写入失败的记录
+    放回队列重试，连续失败 max_retries 次后丢弃并计入 failed。
+    """
+
+    def __init__(self, app, flush_size=100, flush_interval=1.0, flush_on_shutdown=True, max_pending=None,
+                 max_retries=3):
+        self.app = app
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = float(flush_interval)
+        self.flush_on_shutdown = flush_on_shutdown
+        self.max_pending = max_pending or self.flush_size * 10
+        self.max_retries = max(0, int(max_retries))
+        self._pending = []
+        # 记录 -> 已失败次数
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, detection):
+        """加入写入队列，队列已满时返回 False"""
+        with self._lock:
+            if self._stopped or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.append(detection)
+            if self._thread is None:
+                # 首次写入时才启动线程（gunicorn 预加载时在 worker 中启动）
+                self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                self._thread.start()
+                if self.flush_on_shutdown:
+                    atexit.register(self.close)
+            if len(self._pending) >= self.flush_size:
+                self._wake.set()
+        return True
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _write(self, batch):
+        """在一个事务中插入一批记录（连同物体行），失败时回滚并返回异常"""
+        try:
+            db.session.add_all(batch)
+            db.session.flush()
+            save_detection_objects(batch)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return e
+        return None
+
+    def _requeue(self, failed):
+        """失败的记录放回队首等待下次写入，超过 max_retries 次后丢弃"""
+        retry = []
+        for detection in failed:
+            attempts = self._attempts.get(detection, 0) + 1
+            if attempts > self.max_retries:
+                self._attempts.pop(detection, None)
+                self.failed += 1
+            else:
+                self._attempts[detection] = attempts
+                retry.append(detection)
+        with self._lock:
+            self._pending[:0] = retry
+        return len(retry)
+
+    def flush(self):
+        """写入队列中的所有记录，返回写入的记录数
+
+        整批写入失败时逐条重试，只有逐条写入也失败的记录才放回队列。
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            failed = []
+            with self.app.app_context():
+                error = self._write(batch)
+                if error is not None:
+                    print(f"Error flushing detection history, retrying row by row: {error}")
+                    for detection in batch:
+                        if self._write([detection]) is not None:
+                            failed.append(detection)
+
+            written = len(batch) - len(failed)
+            for detection in set(batch) - set(failed):
+                self._attempts.pop(detection, None)
+            if failed:
+                retried = self._requeue(failed)
+                print(f"Failed to write {len(failed)} detection records, {retried} requeued")
+
+            if written:
+                self.flushes += 1
+                self.written += written
+            return written
+
+    def close(self):
+        """停止后台线程并写入剩余记录（失败的记录最多再重试 max_retries 次）"""
+        with self._lock:
+            self._stopped = True
+        self._wake.set()
+        written = 0
+        for _ in range(self.max_retries + 1):
+            written += self.flush()
+            with self._lock:
+                if not self._pending:
+                    break
+        return written
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "flushes": self.flushes,
+            "written": self.written,
+            "failed": self.failed
+        }
+
+# 每个进程一个写入器，首次使用时根据应用配置创建
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_history_writer():
+    """未启用延迟写入时返回 None"""
+    global _writer
+    if not current_app.config.get('HISTORY_WRITE_BEHIND'):
+        return None
+    with _writer_lock:
+        if _writer is None:
+            config = current_app.config
+            _writer = HistoryWriter(
+                current_app._get_current_object(),
+                flush_size=config['HISTORY_FLUSH_SIZE'],
+                flush_interval=config['HISTORY_FLUSH_INTERVAL'],
+                flush_on_shutdown=config['HISTORY_FLUSH_ON_SHUTDOWN']
+            )
+        return _writer
+
+def close_history_writer():
+    """worker 退出时调用，写入尚未提交的历史记录"""
+    if _writer is not None and _writer.flush_on_shutdown:
+        _writer.close()
@@ -1,15 +1,33 @@
 import os
 import cv2
 import uuid
+import tarfile
+import zipfile
 import numpy as np
-from PIL import Image
 from io import BytesIO
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
 from werkzeug.utils import secure_filename
-from urllib.request import urlopen
+
+from utils.preprocessing import compile_preprocessing
+from utils.url_fetcher import get_url_fetcher, FetchError
 
 ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp'}
 
+# JPEG 解码时利用 DCT 缩放直接输出缩小的图像，按倍数从大到小尝试
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+# EXIF 方向标签，取值 5-8 表示图像需要旋转 90 度
+EXIF_ORIENTATION = 0x0112
+
+# 后台写盘线程池，原图持久化不阻塞请求
+_persist_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-persist')
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -23,88 +41,182 @@ def save_uploaded_file(file, subfolder=''):
         # 添加uuid前缀确保唯一性
         unique_filename = f"{uuid.uuid4().hex}_{filename}"
         
-        # 创建目标目录
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        if subfolder:
-            target_dir = os.path.join(upload_folder, subfolder)
-            os.makedirs(target_dir, exist_ok=True)
-        else:
-            target_dir = upload_folder
-            
         # 保存文件
-        file_path = os.path.join(target_dir, unique_filename)
+        file_path = os.path.join(get_target_dir(subfolder), unique_filename)
         file.save(file_path)
         
         return file_path
     
     return None
 
+def get_target_dir(subfolder=''):
+    """获取（并创建）上传目录下的子目录"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if subfolder:
+        target_dir = os.path.join(upload_folder, subfolder)
+        os.makedirs(target_dir, exist_ok=True)
+    else:
+        target_dir = upload_folder
+    return target_dir
+
+def read_uploaded_file(file):
+    """读取上传文件的原始字节，不写入磁盘"""
+    if not file or not allowed_file(file.filename):
+        return None
+    
+    data = file.read()
+    return data or None
+
+def iter_archive_images(file, max_image_size=None):
+    """逐个读取 zip/tar 压缩包中的图像，返回 (文件名, 字节数据)
+
+    跳过不支持的文件和超过 max_image_size 字节的成员，防止解压炸弹。
+    """
+    filename = (file.filename or '').lower()
+    
+    if filename.endswith('.zip'):
+        with zipfile.ZipFile(file.stream) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not allowed_file(info.filename):
+                    continue
+                if max_image_size and info.file_size > max_image_size:
+                    continue
+                yield os.path.basename(info.filename), archive.read(info)
+    else:
+        # 流式读取 tar（含 .tar.gz / .tgz），不需要随机访问
+        with tarfile.open(fileobj=file.stream, mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile() or not allowed_file(member.name):
+                    continue
+                if max_image_size and member.size > max_image_size:
+                    continue
+                yield os.path.basename(member.name), archive.extractfile(member).read()
+
+def fetch_image_from_url(url):
+    """从URL下载图像，返回 (字节数据, 图像格式)
+
+    使用带连接池的下载器，有超时和大小限制，格式根据文件头判断。
+    """
+    try:
+        return get_url_fetcher().fetch(url)
+    except FetchError as e:
+        print(f"Error downloading image from URL: {e}")
+        return None, None
+
 def save_image_from_url(url, subfolder=''):
     """从URL下载并保存图像"""
+    image_data, image_format = fetch_image_from_url(url)
+    if not image_data:
+        return None
+    
     try:
-        response = urlopen(url)
-        image_data = response.read()
-        
-        # 检查图像类型
-        pil_image = Image.open(BytesIO(image_data))
-        image_format = pil_image.format.lower()
-        
-        if image_format not in ALLOWED_EXTENSIONS and image_format != 'jpeg':
-            return None
-            
-        # 创建目标目录
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        if subfolder:
-            target_dir = os.path.join(upload_folder, subfolder)
-            os.makedirs(target_dir, exist_ok=True)
-        else:
-            target_dir = upload_folder
-            
         # 保存文件
         unique_filename = f"{uuid.uuid4().hex}.{image_format}"
-        file_path = os.path.join(target_dir, unique_filename)
+        file_path = os.path.join(get_target_dir(subfolder), unique_filename)
         
         with open(file_path, 'wb') as f:
             f.write(image_data)
             
         return file_path
     except Exception as e:
-        print(f"Error downloading image from URL: {e}")
+        print(f"Error saving image from URL: {e}")
         return None
 
+def decode_image(image_data):
+    """将图像字节直接解码为 BGR 格式的 NumPy 数组"""
+    if not image_data:
+        return None
+    
+    buffer = np.frombuffer(image_data, dtype=np.uint8)
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+def reduced_decode_factor(width, height, min_size):
+    """长边缩小后仍不小于 min_size 的最大缩小倍数，返回 (倍数, 解码标志)"""
+    long_side = max(width, height)
+    for factor, flag in REDUCED_DECODE_FLAGS:
+        if long_side // factor >= min_size:
+            return factor, flag
+    return 1, cv2.IMREAD_COLOR
+
+def decode_image_reduced(image_data, min_size):
+    """按模型输入尺寸缩小解码图像
+
+    只读取文件头获取原图尺寸，JPEG 在解码阶段按 1/2、1/4、1/8 缩小（长边不小于
+    min_size），不生成全分辨率的像素数组；其他格式按原尺寸解码。返回
+    (图像, (x 缩放, y 缩放))，缩放系数用于把检测框映射回原图坐标。
+    """
+    if not image_data:
+        return None, (1.0, 1.0)
+    
+    try:
+        with Image.open(BytesIO(image_data)) as header:
+            image_format = header.format
+            width, height = header.size
+            # imdecode 会按 EXIF 方向旋转图像，原图尺寸也要按旋转后计算
+            if header.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+                width, height = height, width
+    except Exception:
+        return decode_image(image_data), (1.0, 1.0)
+    
+    factor, flag = reduced_decode_factor(width, height, min_size) if min_size else (1, cv2.IMREAD_COLOR)
+    if image_format != 'JPEG' or factor == 1:
+        return decode_image(image_data), (1.0, 1.0)
+    
+    image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), flag)
+    if image is None:
+        return None, (1.0, 1.0)
+    return image, (width / image.shape[1], height / image.shape[0])
+
+def letterbox_image(img, size=640, pad_value=114):
+    """等比缩放并居中填充到 size x size（与 ultralytics 的预处理一致）
+
+    返回 (图像, 缩放比例, (左侧填充, 顶部填充))。已经是 size x size 的输入，
+    模型内部的 letterbox 不会再缩放或填充。
+    """
+    height, width = img.shape[:2]
+    ratio = min(size / height, size / width)
+    new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+    if (new_w, new_h) != (width, height):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    
+    canvas = np.full((size, size, 3), pad_value, dtype=np.uint8)
+    top = (size - new_h) // 2
+    left = (size - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = img
+    return canvas, ratio, (left, top)
+
+def _write_file(file_path, data):
+    # 先写临时文件再重命名，懒绘制等待到文件出现时读到的一定是完整的图像
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    except Exception as e:
+        print(f"Error persisting image {file_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def persist_image_async(image_data, filename, subfolder=''):
+    """在后台线程中保存原图，立即返回目标路径"""
+    unique_filename = f"{uuid.uuid4().hex}_{secure_filename(filename)}"
+    file_path = os.path.join(get_target_dir(subfolder), unique_filename)
+    _persist_executor.submit(_write_file, file_path, image_data)
+    return file_path
+
 def preprocess_image(image_path, preprocessing=None):
     """根据预处理参数处理图像"""
-    if not preprocessing:
-        preprocessing = {}
-        
+    pipeline = compile_preprocessing(preprocessing)
+    # 没有预处理操作时直接使用原图，不再生成副本
+    if pipeline.is_identity:
+        return image_path
+    
     # 读取图像
     img = cv2.imread(image_path)
     if img is None:
         return None
-        
-    # 应用预处理
-    # 1. 调整大小
-    if 'resize' in preprocessing:
-        width = preprocessing['resize'].get('width')
-        height = preprocessing['resize'].get('height')
-        if width and height:
-            img = cv2.resize(img, (width, height))
-            
-    # 2. 高斯模糊
-    if preprocessing.get('gaussian_blur'):
-        kernel_size = preprocessing['gaussian_blur'].get('kernel_size', 5)
-        img = cv2.GaussianBlur(img, (kernel_size, kernel_size), 0)
-        
-    # 3. 锐化
-    if preprocessing.get('sharpen'):
-        kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
-        img = cv2.filter2D(img, -1, kernel)
-        
-    # 4. 调整对比度
-    if 'contrast' in preprocessing:
-        alpha = preprocessing['contrast'].get('alpha', 1.0)
-        beta = preprocessing['contrast'].get('beta', 0)
-        img = cv2.convertScaleAbs(img, alpha=alpha, beta=beta)
+    
+    img = pipeline(img)
         
     # 保存预处理后的图像
     processed_path = image_path.replace('.', '_processed.')
@@ -112,6 +224,10 @@ def preprocess_image(image_path, preprocessing=None):
     
     return processed_path
 
+def apply_preprocessing(img, preprocessing=None):
+    """在内存中对图像数组应用预处理"""
+    return compile_preprocessing(preprocessing)(img)
+
 def get_image_dimensions(image_path):
     """获取图像尺寸"""
     try:
@@ -0,0 +1,72 @@
+import os
+import importlib.util
+
+# 按CPU推理速度从快到慢排列，auto 模式选择第一个可用的后端
+BACKENDS = ('openvino', 'onnx', 'torch')
+
+# 各后端需要的运行时模块
+BACKEND_RUNTIMES = {
+    'openvino': 'openvino',
+    'onnx': 'onnxruntime'
+}
+
+def runtime_available(backend):
+    """检查后端所需的运行时是否已安装"""
+    module = BACKEND_RUNTIMES.get(backend)
+    return module is None or importlib.util.find_spec(module) is not None
+
+def backend_weights(model_folder, weights_name, backend):
+    """返回某个后端对应的模型文件路径，例如 models/yolov8s.onnx"""
+    stem = os.path.splitext(weights_name)[0]
+    if backend == 'openvino':
+        return os.path.join(model_folder, f"{stem}_openvino_model")
+    if backend == 'onnx':
+        return os.path.join(model_folder, f"{stem}.onnx")
+
+    local_path = os.path.join(model_folder, weights_name)
+    # 本地不存在时交给 ultralytics 自动下载
+    return local_path if os.path.exists(local_path) else weights_name
+
+def parse_backend_overrides(value):
+    """解析按模型指定后端的配置，例如 "yolov8x:onnx,yolov8n:torch" """
+    overrides = {}
+    for item in str(value or '').split(','):
+        if ':' in item:
+            model_name, backend = item.split(':', 1)
+            overrides[model_name.strip()] = backend.strip().lower()
+    return overrides
+
+def select_backend(model_folder, weights_name, preference='auto'):
+    """选择可用的最快后端，返回 (后端名称, 模型路径)；始终可以回退到 PyTorch"""
+    # 量化模型只有 ONNX 格式
+    if weights_name.endswith('.onnx'):
+        return 'onnx', os.path.join(model_folder, weights_name)
+
+    if preference in BACKENDS:
+        candidates = (preference, 'torch')
+    else:
+        candidates = BACKENDS
+
+    for backend in candidates:
+        path = backend_weights(model_folder, weights_name, backend)
+        if backend == 'torch':
+            return backend, path
+        if runtime_available(backend) and os.path.exists(path):
+            return backend, path
+
+    return 'torch', backend_weights(model_folder, weights_name, 'torch')
+
+def load_backend_model(model_folder, weights_name, preference='auto'):
+    """按后端加载模型，返回 (YOLO 模型, 后端名称)；导出模型加载失败时回退到 PyTorch"""
+    # 延迟导入：使用模型服务时 web worker 不需要加载 ultralytics 和 torch
+    from ultralytics import YOLO
+
+    backend, path = select_backend(model_folder, weights_name, preference)
+    if backend != 'torch' and weights_name.endswith('.pt'):
+        try:
+            return YOLO(path, task='detect'), backend
+        except Exception as e:
+            print(f"Error loading {backend} model {path}, falling back to PyTorch: {e}")
+            backend, path = 'torch', backend_weights(model_folder, weights_name, 'torch')
+
+    return YOLO(path, task='detect'), backend
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+
+from models import db, User, Detection
+from utils.detection_objects import save_detection_objects
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+class DetectionJob(db.Model):
+    """异步检测任务，任务状态保存在数据库中，重启后不会丢失"""
+    __tablename__ = 'detection_jobs'
+    __table_args__ = (
+        db.Index('ix_detection_jobs_status_created', 'status', 'created_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = db.Column(db.Integer, db.ForeignKey(User.id), nullable=True, index=True)
+    status = db.Column(db.String(16), nullable=False, default=JOB_QUEUED)
+    model_name = db.Column(db.String(50), nullable=False)
+    confidence = db.Column(db.Float, nullable=False)
+    result_format = db.Column(db.String(16), nullable=False, default='objects')
+    preprocessing_json = db.Column(db.Text, nullable=True)
+    image_path = db.Column(db.String(255), nullable=False)
+    result_json = db.Column(db.Text, nullable=True)
+    result_path = db.Column(db.String(255), nullable=True)
+    processing_time = db.Column(db.Float, nullable=True)
+    detection_id = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def preprocessing(self):
+        return json.loads(self.preprocessing_json) if self.preprocessing_json else {}
+
+    @preprocessing.setter
+    def preprocessing(self, value):
+        self.preprocessing_json = json.dumps(value or {})
+
+    @property
+    def results(self):
+        return json.loads(self.result_json) if self.result_json else None
+
+    @results.setter
+    def results(self, value):
+        self.result_json = json.dumps(value)
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "model": self.model_name,
+            "confidence_threshold": self.confidence,
+            "result_format": self.result_format,
+            "attempts": self.attempts,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+        if self.status == JOB_SUCCEEDED:
+            results = self.results
+            data.update({
+                "detection_id": self.detection_id,
+                "processing_time": self.processing_time,
+                "objects_detected": len(results['class_id']) if isinstance(results, dict) else len(results),
+                "results": results
+            })
+            if self.result_path:
+                data["result_image"] = os.path.basename(self.result_path)
+        elif self.status == JOB_FAILED:
+            data["error"] = self.error
+        return data
+
+def submit_job(user_id, image_path, model_name, confidence, preprocessing, result_format='objects'):
+    """创建排队中的检测任务"""
+    job = DetectionJob(
+        user_id=user_id,
+        image_path=image_path,
+        model_name=model_name,
+        confidence=confidence,
+        result_format=result_format
+    )
+    job.preprocessing = preprocessing
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def claim_next_job(worker_name):
+    """领取最早排队的任务
+
+    用带状态条件的 UPDATE 抢占任务，多个 worker 并发领取时只有一个会成功，
+    不依赖 SELECT ... FOR UPDATE SKIP LOCKED，SQLite 和 MySQL 都适用。
+    """
+    while True:
+        job_id = db.session.query(DetectionJob.id) \
+            .filter(DetectionJob.status == JOB_QUEUED) \
+            .order_by(DetectionJob.created_at) \
+            .limit(1).scalar()
+        if job_id is None:
+            return None
+
+        claimed = DetectionJob.query \
+            .filter(DetectionJob.id == job_id, DetectionJob.status == JOB_QUEUED) \
+            .update({
+                DetectionJob.status: JOB_RUNNING,
+                DetectionJob.worker: worker_name,
+                DetectionJob.started_at: datetime.utcnow(),
+                DetectionJob.attempts: DetectionJob.attempts + 1
+            }, synchronize_session=False)
+        db.session.commit()
+
+        if claimed:
+            return DetectionJob.query.get(job_id)
+        # 被其他 worker 抢先领取，继续尝试下一个
+
+def requeue_stale_jobs(stale_after, max_attempts):
+    """将长时间处于运行状态的任务（worker 已退出或重启）重新排队，超过重试次数则标记失败"""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    stale = DetectionJob.query.filter(
+        DetectionJob.status == JOB_RUNNING,
+        DetectionJob.started_at < cutoff
+    ).all()
+
+    for job in stale:
+        if job.attempts >= max_attempts:
+            job.status = JOB_FAILED
+            job.error = "Job exceeded maximum attempts"
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = JOB_QUEUED
+            job.worker = None
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+def run_job(job):
+    """执行一个已领取的任务并保存结果"""
+    # 延迟导入：worker 进程才需要加载推理相关模块
+    import cv2
+    from utils.preprocessing import compile_preprocessing
+    from utils.detection_utils import detect_objects, objects_from_columnar
+
+    try:
+        image = cv2.imread(job.image_path)
+        if image is None:
+            raise ValueError("Image not found or invalid")
+
+        pipeline = compile_preprocessing(job.preprocessing)
+        results, processing_time, result_path = detect_objects(
+            pipeline(image),
+            model_name=job.model_name,
+            confidence=job.confidence,
+            result_format=job.result_format,
+            render='lazy',
+            source_path=job.image_path,
+            preprocessing=pipeline.spec
+        )
+        if results is None:
+            raise RuntimeError("Detection failed")
+
+        # 按用户偏好保存检测历史
+        user = User.query.get(job.user_id) if job.user_id else None
+        if user and user.preferences.get('saveHistory', True):
+            detection = Detection(
+                user_id=user.id,
+                model_name=job.model_name,
+                confidence_threshold=job.confidence,
+                image_path=job.image_path,
+                result_path=result_path,
+                processing_time=processing_time,
+                preprocessing=pipeline.spec
+            )
+            detection.results = objects_from_columnar(results) if job.result_format == 'columnar' else results
+            db.session.add(detection)
+            db.session.flush()
+            save_detection_objects([detection])
+            job.detection_id = detection.id
+
+        job.results = results
+        job.result_path = result_path
+        job.processing_time = processing_time
+        job.status = JOB_SUCCEEDED
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error running detection job {job.id}: {e}")
+        job.status = JOB_FAILED
+        job.error = str(e)[:255]
+
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+def wait_for_job(job_id, timeout, poll_interval=0.25):
+    """长轮询：等待任务结束或超时，返回最新的任务状态"""
+    deadline = time.time() + timeout
+    while True:
+        # 丢弃会话中的缓存，读取其他进程写入的最新状态
+        db.session.expire_all()
+        job = DetectionJob.query.get(job_id)
+        if job is None or job.finished or time.time() >= deadline:
+            return job
+        time.sleep(poll_interval)
+
+def worker_loop(worker_name, poll_interval=1.0, stop_event=None):
+    """worker 主循环：不断领取并执行任务，需要在应用上下文中调用"""
+    stale_after = current_app.config['JOB_STALE_SECONDS']
+    max_attempts = current_app.config['JOB_MAX_ATTEMPTS']
+    last_check = 0
+
+    while stop_event is None or not stop_event.is_set():
+        # 定期回收卡住的任务
+        if time.time() - last_check > stale_after / 2:
+            requeue_stale_jobs(stale_after, max_attempts)
+            last_check = time.time()
+
+        job = claim_next_job(worker_name)
+        if job is None:
+            db.session.remove()
+            time.sleep(poll_interval)
+            continue
+
+        run_job(job)
+        db.session.remove()
@@ -0,0 +1,171 @@
+import json
+import atexit
+import socket
+import struct
+import threading
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+from flask import current_app
+
+# 消息格式：4 字节大端长度 + UTF-8 JSON；图像像素不经过 socket，
+# 而是写入客户端创建的共享内存，服务端按名称映射后直接读取
+HEADER = struct.Struct('>I')
+
+# 共享内存缓冲区的最小尺寸，按 2 的幂增长，减少重新分配
+MIN_BUFFER_BYTES = 4 * 1024 * 1024
+
+class ModelServerError(Exception):
+    """模型服务不可用或返回错误"""
+
+def send_message(sock, message):
+    payload = json.dumps(message).encode('utf-8')
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Model server connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def recv_message(sock):
+    """读取一条消息，对端关闭连接时抛出 ConnectionError"""
+    (size,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    return json.loads(_recv_exact(sock, size))
+
+def attach_shared_memory(name):
+    """映射对端创建的共享内存；不交给本进程的 resource_tracker 管理，
+    否则本进程退出时会删除仍在使用的共享内存"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+class ModelServerClient:
+    """模型服务客户端
+
+    每个线程持有一个 Unix socket 连接和一块可复用的共享内存缓冲区，
+    gunicorn 多线程 worker 中的并发请求互不阻塞，由模型服务统一组批。
+    """
+
+    def __init__(self, socket_path, timeout=30):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._buffers = []
+        self._buffers_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise ModelServerError(f"Cannot connect to model server at {self.socket_path}: {e}")
+        return sock
+
+    def _buffer(self, size):
+        """获取当前线程的共享内存缓冲区，不够大时重新分配"""
+        shm = getattr(self._local, 'shm', None)
+        if shm is not None and shm.size >= size:
+            return shm
+
+        capacity = MIN_BUFFER_BYTES
+        while capacity < size:
+            capacity *= 2
+        new_shm = shared_memory.SharedMemory(create=True, size=capacity)
+        with self._buffers_lock:
+            self._buffers.append(new_shm)
+            if shm is not None:
+                self._release(shm)
+        self._local.shm = new_shm
+        return new_shm
+
+    def _release(self, shm):
+        self._buffers.remove(shm)
+        try:
+            shm.close()
+            shm.unlink()
+        except (BufferError, OSError):
+            pass
+
+    def request(self, message):
+        """发送请求并等待响应；连接断开（例如模型服务重启）时重连一次"""
+        for attempt in range(2):
+            sock = getattr(self._local, 'sock', None)
+            if sock is None:
+                sock = self._local.sock = self._connect()
+            try:
+                send_message(sock, message)
+                response = recv_message(sock)
+                break
+            except (ConnectionError, OSError) as e:
+                sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise ModelServerError(f"Model server request failed: {e}")
+
+        if 'error' in response:
+            raise ModelServerError(response['error'])
+        return response
+
+    def detect(self, model_name, images, confidence):
+        """对一组 BGR 图像执行检测，返回 ([检测数组, ...], 类别名称, 实际使用的模型)"""
+        images = [np.ascontiguousarray(image) for image in images]
+        shm = self._buffer(sum(image.nbytes for image in images))
+
+        frames = []
+        offset = 0
+        for image in images:
+            np.ndarray(image.shape, image.dtype, buffer=shm.buf, offset=offset)[...] = image
+            frames.append({"offset": offset, "shape": list(image.shape), "dtype": str(image.dtype)})
+            offset += image.nbytes
+
+        response = self.request({
+            "op": "detect",
+            "model": model_name,
+            "confidence": confidence,
+            "shm": shm.name,
+            "frames": frames
+        })
+        results = [np.asarray(data, dtype=np.float32).reshape(-1, 6) for data in response['results']]
+        # JSON 的键只能是字符串，转换回类别 id
+        names = {int(class_id): name for class_id, name in response['names'].items()}
+        return results, names, response['model']
+
+    def status(self):
+        return self.request({"op": "status"})
+
+    def stats(self):
+        return self.request({"op": "stats"})
+
+    def cpu_settings(self):
+        return self.request({"op": "cpu"})
+
+    def close(self):
+        with self._buffers_lock:
+            for shm in list(self._buffers):
+                self._release(shm)
+
+# 每个进程一个客户端
+_client = None
+_client_lock = threading.Lock()
+
+def get_model_client():
+    """配置了 MODEL_SERVER_SOCKET 时返回模型服务客户端，否则返回 None（在本进程中推理）"""
+    global _client
+    socket_path = current_app.config.get('MODEL_SERVER_SOCKET')
+    if not socket_path:
+        return None
+    with _client_lock:
+        if _client is None or _client.socket_path != socket_path:
+            _client = ModelServerClient(socket_path, current_app.config.get('MODEL_SERVER_TIMEOUT', 30))
+        return _client
@@ -0,0 +1,142 @@
+import os
+import threading
+from collections import OrderedDict
+
+def path_bytes(path):
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, dirs, files in os.walk(path) for name in files
+        )
+    return os.path.getsize(path)
+
+def estimate_model_bytes(model):
+    """估算模型常驻内存：参数和缓冲区占用的字节数
+
+    ONNX / OpenVINO 等导出模型没有 PyTorch 参数，以模型文件大小近似。
+    """
+    module = getattr(model, 'model', None)
+    if isinstance(module, str) and os.path.exists(module):
+        return path_bytes(module)
+    if module is None or not hasattr(module, 'parameters'):
+        return 0
+
+    total = 0
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+class ModelRegistry:
+    """带内存预算的模型缓存
+
+    超出预算时按最近最少使用的顺序淘汰未固定的模型，固定的模型（例如
+    默认模型）始终常驻。memory_budget 为 0 表示不限制。
+    """
+
+    def __init__(self, loader, memory_budget=0, pinned=None, size_of=estimate_model_bytes):
+        self._loader = loader
+        self._size_of = size_of
+        self.memory_budget = int(memory_budget)
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._pinned = set(pinned or [])
+        self._evict_callbacks = []
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, model_name):
+        """获取模型，未加载时通过 loader 加载"""
+        with self._lock:
+            if model_name in self._models:
+                self._models.move_to_end(model_name)
+                self.hits += 1
+                return self._models[model_name]
+            self.misses += 1
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+
+        # 加载在全局锁之外进行，加载大模型时不阻塞其他模型的请求；
+        # 同一模型的并发请求只会加载一次
+        with load_lock:
+            with self._lock:
+                if model_name in self._models:
+                    self._models.move_to_end(model_name)
+                    return self._models[model_name]
+
+            model = self._loader(model_name)
+            size = self._size_of(model)
+
+            with self._lock:
+                self._models[model_name] = model
+                self._sizes[model_name] = size
+                self.loads += 1
+                self._evict(keep=model_name)
+            return model
+
+    def __contains__(self, model_name):
+        with self._lock:
+            return model_name in self._models
+
+    def pin(self, model_name):
+        with self._lock:
+            self._pinned.add(model_name)
+
+    def unpin(self, model_name):
+        with self._lock:
+            self._pinned.discard(model_name)
+            self._evict()
+
+    def on_evict(self, callback):
+        """注册淘汰回调，参数为 (model_name, model)"""
+        self._evict_callbacks.append(callback)
+
+    @property
+    def resident_bytes(self):
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def _evict(self, keep=None):
+        if not self.memory_budget:
+            return
+
+        while self.resident_bytes > self.memory_budget:
+            victim = next(
+                (name for name in self._models if name not in self._pinned and name != keep),
+                None
+            )
+            if victim is None:
+                # 剩下的都是固定模型或刚加载的模型，只能超出预算
+                break
+
+            model = self._models.pop(victim)
+            self._sizes.pop(victim)
+            self.evictions += 1
+            for callback in self._evict_callbacks:
+                try:
+                    callback(victim, model)
+                except Exception as e:
+                    print(f"Error in model eviction callback for {victim}: {e}")
+
+    def stats(self):
+        """返回加载次数、淘汰次数、各模型常驻内存和命中率"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "memory_budget_bytes": self.memory_budget,
+                "resident_bytes": sum(self._sizes.values()),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / requests, 4) if requests else 0,
+                "models": {
+                    name: {
+                        "resident_bytes": self._sizes[name],
+                        "pinned": name in self._pinned
+                    }
+                    for name in self._models
+                }
+            }
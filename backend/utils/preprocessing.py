@@ -0,0 +1,163 @@
+import json
+import threading
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# 锐化卷积核只构建一次
+SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
+
+# 预处理参数上限，防止异常请求占用过多资源
+MAX_RESIZE_DIMENSION = 8192
+MAX_BLUR_KERNEL_SIZE = 31
+
+# 已编译的预处理流水线缓存数量
+PIPELINE_CACHE_SIZE = 128
+
+def _as_number(value, name):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Preprocessing parameter '{name}' must be a number")
+    return value
+
+def normalize_preprocessing(preprocessing):
+    """校验预处理参数并转换为规范形式，参数无效时抛出 ValueError"""
+    if not preprocessing:
+        return {}
+    if not isinstance(preprocessing, dict):
+        raise ValueError("Preprocessing options must be a JSON object")
+
+    unknown = set(preprocessing) - {'resize', 'gaussian_blur', 'sharpen', 'contrast'}
+    if unknown:
+        raise ValueError(f"Unknown preprocessing option: {', '.join(sorted(unknown))}")
+
+    spec = {}
+
+    # 1. 调整大小
+    if preprocessing.get('resize'):
+        resize = preprocessing['resize']
+        if not isinstance(resize, dict):
+            raise ValueError("Preprocessing option 'resize' must be an object")
+        width = _as_number(resize.get('width'), 'resize.width')
+        height = _as_number(resize.get('height'), 'resize.height')
+        if int(width) != width or int(height) != height:
+            raise ValueError("Resize width and height must be integers")
+        if not (0 < width <= MAX_RESIZE_DIMENSION and 0 < height <= MAX_RESIZE_DIMENSION):
+            raise ValueError(f"Resize width and height must be between 1 and {MAX_RESIZE_DIMENSION}")
+        spec['resize'] = {'width': int(width), 'height': int(height)}
+
+    # 2. 高斯模糊
+    if preprocessing.get('gaussian_blur'):
+        blur = preprocessing['gaussian_blur']
+        kernel_size = blur.get('kernel_size', 5) if isinstance(blur, dict) else 5
+        kernel_size = _as_number(kernel_size, 'gaussian_blur.kernel_size')
+        if int(kernel_size) != kernel_size or kernel_size % 2 == 0 \
+                or not 1 <= kernel_size <= MAX_BLUR_KERNEL_SIZE:
+            raise ValueError(f"Blur kernel size must be an odd integer between 1 and {MAX_BLUR_KERNEL_SIZE}")
+        if kernel_size > 1:
+            spec['gaussian_blur'] = {'kernel_size': int(kernel_size)}
+
+    # 3. 锐化
+    if preprocessing.get('sharpen'):
+        spec['sharpen'] = True
+
+    # 4. 调整对比度
+    if preprocessing.get('contrast'):
+        contrast = preprocessing['contrast']
+        if not isinstance(contrast, dict):
+            raise ValueError("Preprocessing option 'contrast' must be an object")
+        alpha = float(_as_number(contrast.get('alpha', 1.0), 'contrast.alpha'))
+        beta = float(_as_number(contrast.get('beta', 0), 'contrast.beta'))
+        # alpha=1, beta=0 不改变图像
+        if alpha != 1.0 or beta != 0.0:
+            spec['contrast'] = {'alpha': alpha, 'beta': beta}
+
+    return spec
+
+def preprocessing_key(spec):
+    """规范化参数的字符串表示，相同参数得到相同的键"""
+    return json.dumps(spec, sort_keys=True, separators=(',', ':'))
+
+class PreprocessingPipeline:
+    """编译后的预处理流水线
+
+    各步骤在编译时确定（卷积核、查找表等只计算一次），运行时在内存中
+    依次执行，中间结果写入按线程复用的缓冲区。
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.key = preprocessing_key(spec)
+        self.ops = self._compile(spec)
+        self._buffers = threading.local()
+
+    @property
+    def is_identity(self):
+        return not self.ops
+
+    @staticmethod
+    def _compile(spec):
+        ops = []
+
+        if 'resize' in spec:
+            size = (spec['resize']['width'], spec['resize']['height'])
+            ops.append(('resize', lambda src, dst: cv2.resize(src, size, dst=dst)))
+
+        if 'gaussian_blur' in spec:
+            k = spec['gaussian_blur']['kernel_size']
+            ops.append(('gaussian_blur', lambda src, dst: cv2.GaussianBlur(src, (k, k), 0, dst=dst)))
+
+        if 'sharpen' in spec:
+            ops.append(('sharpen', lambda src, dst: cv2.filter2D(src, -1, SHARPEN_KERNEL, dst=dst)))
+
+        if 'contrast' in spec:
+            # 对比度调整折叠为一次查找表运算，结果与 cv2.convertScaleAbs 一致
+            alpha = spec['contrast']['alpha']
+            beta = spec['contrast']['beta']
+            lut = cv2.convertScaleAbs(np.arange(256, dtype=np.uint8).reshape(1, 256), alpha=alpha, beta=beta)
+            ops.append(('contrast', lambda src, dst: cv2.LUT(src, lut, dst=dst)))
+
+        return ops
+
+    def _buffer(self, index, shape, dtype):
+        """获取当前线程中第 index 步的输出缓冲区"""
+        buffers = getattr(self._buffers, 'items', None)
+        if buffers is None:
+            buffers = self._buffers.items = {}
+        buf = buffers.get(index)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = buffers[index] = np.empty(shape, dtype=dtype)
+        return buf
+
+    def _output_shape(self, name, src):
+        if name == 'resize':
+            return (self.spec['resize']['height'], self.spec['resize']['width']) + src.shape[2:]
+        return src.shape
+
+    def __call__(self, img):
+        """执行预处理，返回新数组；没有任何操作时直接返回输入"""
+        if self.is_identity or img is None:
+            return img
+
+        last = len(self.ops) - 1
+        for index, (name, op) in enumerate(self.ops):
+            shape = self._output_shape(name, img)
+            # 最后一步写入新数组，因为结果会交给调用方持有
+            if index == last:
+                dst = np.empty(shape, dtype=img.dtype)
+            else:
+                dst = self._buffer(index, shape, img.dtype)
+            img = op(img, dst)
+
+        return img
+
+@lru_cache(maxsize=PIPELINE_CACHE_SIZE)
+def _compile_key(key):
+    return PreprocessingPipeline(json.loads(key))
+
+def compile_preprocessing(preprocessing):
+    """校验并编译预处理参数，相同参数复用同一个流水线对象"""
+    if isinstance(preprocessing, PreprocessingPipeline):
+        return preprocessing
+    spec = normalize_preprocessing(preprocessing)
+    return _compile_key(preprocessing_key(spec))
@@ -0,0 +1,177 @@
+import os
+
+import cv2
+import numpy as np
+
+from utils.image_utils import letterbox_image
+
+# INT8 量化模型的名称后缀，例如 yolov8s-int8
+INT8_SUFFIX = '-int8'
+
+CALIBRATION_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+# 检测头（第 22 层）负责框解码和 DFL，对量化误差非常敏感，保持 FP32
+FP32_NODE_PREFIXES = ('/model.22/',)
+
+def int8_model_name(model_name):
+    return f"{model_name}{INT8_SUFFIX}"
+
+def int8_weights_name(weights_name):
+    """量化模型的文件名，例如 yolov8s.pt -> yolov8s-int8.onnx"""
+    stem = os.path.splitext(weights_name)[0]
+    return f"{stem}{INT8_SUFFIX}.onnx"
+
+def list_calibration_images(folder, limit=None):
+    """列出目录下的图像文件（按文件名排序，结果可复现）"""
+    paths = sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(CALIBRATION_EXTENSIONS)
+    )
+    return paths[:limit] if limit else paths
+
+def letterbox(img, size=640, pad_value=114):
+    """按 ultralytics 的方式等比缩放并填充到 size x size，返回 NCHW float32 输入"""
+    canvas, _, _ = letterbox_image(img, size, pad_value)
+
+    # BGR -> RGB, HWC -> CHW, 归一化到 0~1
+    blob = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+    return np.ascontiguousarray(blob[np.newaxis])
+
+class ImageFolderCalibrationReader:
+    """onnxruntime 静态量化的校准数据读取器，逐张读取本地目录中的图像"""
+
+    def __init__(self, image_paths, input_name, imgsz=640):
+        self.image_paths = list(image_paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._iter = iter(self.image_paths)
+
+    def get_next(self):
+        for path in self._iter:
+            img = cv2.imread(path)
+            if img is None:
+                print(f"Skipping unreadable calibration image: {path}")
+                continue
+            return {self.input_name: letterbox(img, self.imgsz)}
+        return None
+
+    def rewind(self):
+        self._iter = iter(self.image_paths)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self.get_next()
+        if item is None:
+            raise StopIteration
+        return item
+
+def quantize_onnx_model(fp32_path, int8_path, image_paths, imgsz=640):
+    """用校准图像对 ONNX 模型做静态 INT8 量化（权重按通道 INT8，激活 UINT8）"""
+    import onnx
+    from onnxruntime.quantization import (
+        quantize_static, QuantFormat, QuantType, CalibrationMethod
+    )
+
+    graph = onnx.load(fp32_path).graph
+    input_name = graph.input[0].name
+    excluded = [node.name for node in graph.node if node.name.startswith(FP32_NODE_PREFIXES)]
+
+    quantize_static(
+        fp32_path,
+        int8_path,
+        ImageFolderCalibrationReader(image_paths, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=excluded
+    )
+    return int8_path
+
+def box_iou_matrix(boxes_a, boxes_b):
+    """计算两组 xyxy 框两两之间的 IoU，返回 (len(a), len(b)) 矩阵"""
+    a = boxes_a[:, None, :4]
+    b = boxes_b[None, :, :4]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / (area_a + area_b - inter + 1e-9)
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """以参考结果为真值，按置信度从高到低贪心匹配候选结果
+
+    两个参数都是 (N, 6) 检测数组（x1, y1, x2, y2, confidence, class_id），
+    返回候选框按置信度排序后的 (置信度, 是否匹配) 列表。
+    """
+    if len(candidate) == 0:
+        return []
+    order = np.argsort(-candidate[:, 4])
+    candidate = candidate[order]
+    if len(reference) == 0:
+        return [(float(conf), False) for conf in candidate[:, 4]]
+
+    ious = box_iou_matrix(candidate, reference)
+    # 类别不同的框不能匹配
+    ious[candidate[:, 5][:, None] != reference[:, 5][None, :]] = 0
+    used = np.zeros(len(reference), dtype=bool)
+
+    matches = []
+    for i in range(len(candidate)):
+        row = np.where(used, 0, ious[i])
+        j = int(row.argmax())
+        matched = row[j] >= iou_threshold
+        if matched:
+            used[j] = True
+        matches.append((float(candidate[i, 4]), bool(matched)))
+    return matches
+
+def detection_agreement(pairs, iou_threshold=0.5):
+    """以 FP32 结果作为伪标签计算量化模型的一致性（mAP 的近似）
+
+    pairs 为 (FP32 检测数组, INT8 检测数组) 列表，返回 precision、recall
+    以及 IoU 阈值下的 AP（所有类别合并计算）。
+    """
+    matches = []
+    total = 0
+    for reference, candidate in pairs:
+        matches.extend(match_detections(reference, candidate, iou_threshold))
+        total += len(reference)
+
+    if not matches or not total:
+        # 两边都没有检测到物体时视为完全一致
+        agree = not matches and not total
+        return {"precision": float(agree), "recall": float(agree), "ap": float(agree), "reference_objects": total}
+
+    matches.sort(key=lambda item: -item[0])
+    hits = np.array([matched for conf, matched in matches], dtype=np.float64)
+    tp = np.cumsum(hits)
+    precision = tp / np.arange(1, len(hits) + 1)
+    recall = tp / total
+
+    # 全点插值的 AP（与 COCO / VOC2010+ 相同）
+    envelope = np.maximum.accumulate(precision[::-1])[::-1]
+    recall_steps = np.diff(np.concatenate([[0.0], recall]))
+    ap = float(np.sum(recall_steps * envelope))
+
+    return {
+        "precision": round(float(precision[-1]), 4),
+        "recall": round(float(recall[-1]), 4),
+        "ap": round(ap, 4),
+        "reference_objects": total
+    }
+
+def resident_memory_bytes():
+    """当前进程的常驻内存（Linux 读取 /proc，其他平台返回 0）"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
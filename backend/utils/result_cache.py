@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app
+
+def make_cache_key(image_data, model_name, confidence, preprocessing_key, result_format='objects', tiling=None,
+                   decode_size=0, user_id=None):
+    """根据图像内容哈希、检测参数和用户生成缓存键
+
+    缓存的结果图像属于写入它的用户（删除历史记录时会一并删除），因此不同用户的缓存互不共享。
+    """
+    digest = hashlib.sha256(image_data).hexdigest()
+    params = f"{user_id}|{model_name}|{round(float(confidence), 4)}|{preprocessing_key}|{result_format}"
+    if tiling:
+        params += f"|{json.dumps(tiling, sort_keys=True)}"
+    if decode_size:
+        params += f"|decode={decode_size}"
+    return hashlib.sha256(f"{digest}|{params}".encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """检测结果缓存：进程内 LRU 一级缓存，加可选的磁盘二级缓存
+
+    磁盘缓存以 JSON 文件保存，按 TTL 过期，总大小超出上限时淘汰最旧的条目，
+    同一主机上的多个 worker 可以共享。写入时不扫描目录，只在估计的总大小（上次
+    扫描的结果加本进程此后的写入量）超出上限，或距上次扫描超过 evict_interval 秒时扫描。
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, disk_dir=None, disk_max_bytes=0, evict_interval=60):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = int(disk_max_bytes)
+        self.evict_interval = float(evict_interval)
+        self._disk_bytes = 0
+        self._last_evict = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _expired(self, stored_at):
+        return self.ttl > 0 and time.time() - stored_at > self.ttl
+
+    def get(self, key):
+        """查找缓存，返回 (条目, 命中层级)，未命中时返回 (None, None)"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                stored_at, entry = item
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry, 'memory'
+                del self._entries[key]
+
+        entry = self._disk_get(key)
+        with self._lock:
+            if entry is not None:
+                self.disk_hits += 1
+                self._put_memory(key, entry, time.time())
+                return entry, 'disk'
+            self.misses += 1
+        return None, None
+
+    def put(self, key, entry):
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, entry, now)
+        self._disk_put(key, entry)
+
+    def discard(self, key):
+        """删除失效的缓存条目"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _put_memory(self, key, entry, stored_at):
+        self._entries[key] = (stored_at, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            if self._expired(os.path.getmtime(path)):
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key, entry):
+        if not self.disk_dir:
+            return
+
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        data = json.dumps(entry)
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._maybe_evict_disk(len(data))
+        except OSError as e:
+            print(f"Error writing detection cache entry: {e}")
+
+    def _maybe_evict_disk(self, written):
+        now = time.time()
+        with self._lock:
+            self._disk_bytes += written
+            over_limit = self.disk_max_bytes and self._disk_bytes > self.disk_max_bytes
+            if not over_limit and now - self._last_evict < self.evict_interval:
+                return
+            self._last_evict = now
+        total = self._evict_disk()
+        with self._lock:
+            self._disk_bytes = total
+
+    def _evict_disk(self):
+        """删除过期条目，并在超出大小上限时从最旧的条目开始淘汰，返回剩余的总大小"""
+        files = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            stat = entry.stat()
+            if self._expired(stat.st_mtime):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        if not self.disk_max_bytes:
+            return total
+        for mtime, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        return total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "disk_enabled": bool(self.disk_dir),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0
+            }
+
+# 每个进程一个结果缓存
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_result_cache():
+    """根据应用配置获取（或创建）检测结果缓存，未启用时返回 None"""
+    global _cache
+    if not current_app.config.get('DETECTION_CACHE_ENABLED'):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(
+                max_entries=current_app.config.get('DETECTION_CACHE_ENTRIES', 1024),
+                ttl=current_app.config.get('DETECTION_CACHE_TTL', 3600),
+                disk_dir=current_app.config.get('DETECTION_CACHE_DIR'),
+                disk_max_bytes=current_app.config.get('DETECTION_CACHE_DISK_MAX_MB', 256) * 1024 * 1024
+            )
+        return _cache
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+import cv2
+import numpy as np
+from flask import current_app
+
+from utils.preprocessing import compile_preprocessing
+
+# 等待原图后台写盘完成的最长时间（秒）
+SOURCE_WAIT_TIMEOUT = 2.0
+
+# 结果目录的最长扫描间隔（秒），用于计入其他 worker 写入的文件
+CACHE_SCAN_INTERVAL = 60
+
+# 结果目录 -> [上次扫描得到的总大小, 此后本进程写入的字节数, 上次扫描时间]
+_cache_state = {}
+_cache_lock = threading.Lock()
+
+def draw_detections(img, data, names):
+    """在图像上绘制检测框和标签"""
+    for x1, y1, x2, y2, conf, cls in data.tolist():
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        class_id = int(cls)
+        
+        # 绘制边界框
+        color = generate_color(class_id)
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+        
+        # 绘制标签
+        label = f"{names[class_id]} {conf:.2f}"
+        font_scale = 0.7
+        thickness = 2
+        (label_width, label_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        
+        # 标签背景
+        cv2.rectangle(img, (x1, y1 - label_height - 10), (x1 + label_width, y1), color, -1)
+        
+        # 标签文本
+        cv2.putText(img, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), thickness)
+    
+    return img
+
+def generate_color(class_id):
+    """为类别生成唯一颜色"""
+    colors = [
+        (255, 0, 0),    # 红色
+        (0, 255, 0),    # 绿色
+        (0, 0, 255),    # 蓝色
+        (255, 255, 0),  # 黄色
+        (255, 0, 255),  # 洋红色
+        (0, 255, 255),  # 青色
+        (255, 165, 0),  # 橙色
+        (128, 0, 128),  # 紫色
+        (0, 128, 0),    # 深绿色
+        (139, 69, 19)   # 褐色
+    ]
+    
+    return colors[class_id % len(colors)]
+
+def get_results_dir():
+    results_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'results')
+    os.makedirs(results_dir, exist_ok=True)
+    return results_dir
+
+def _new_result_path():
+    return os.path.join(get_results_dir(), f"result_{uuid.uuid4().hex}.jpg")
+
+def _sidecar_path(result_path):
+    return os.path.splitext(result_path)[0] + '.json'
+
+def _write_atomic(result_path, img):
+    """先写临时文件再重命名，避免并发请求读到写了一半的图像"""
+    tmp_path = f"{result_path}.{uuid.uuid4().hex}.tmp.jpg"
+    cv2.imwrite(tmp_path, img)
+    os.replace(tmp_path, result_path)
+
+def save_result_image(img, data, names):
+    """立即绘制并保存结果图像，返回保存路径"""
+    # 在副本上绘制，避免修改调用方传入的图像
+    canvas = draw_detections(img.copy(), data, names)
+    result_path = _new_result_path()
+    cv2.imwrite(result_path, canvas)
+    return result_path
+
+def schedule_result_image(source_path, data, names, preprocessing=None):
+    """只记录绘制所需的信息，结果图像在首次请求时生成，返回将来的图像路径"""
+    result_path = _new_result_path()
+    class_ids = np.unique(data[:, 5].astype(np.int64)).tolist()
+    pipeline = compile_preprocessing(preprocessing)
+    
+    with open(_sidecar_path(result_path), 'w') as f:
+        json.dump({
+            "source": source_path,
+            "preprocessing": pipeline.spec,
+            "detections": data.tolist(),
+            "names": {str(class_id): names[class_id] for class_id in class_ids}
+        }, f)
+    
+    return result_path
+
+def _read_source(source_path):
+    # 原图可能仍在后台写盘，短暂等待
+    deadline = time.time() + SOURCE_WAIT_TIMEOUT
+    while not os.path.exists(source_path) and time.time() < deadline:
+        time.sleep(0.05)
+    return cv2.imread(source_path)
+
+def render_result_image(filename):
+    """返回结果图像路径，尚未绘制时根据记录的检测结果绘制并缓存到磁盘"""
+    result_path = os.path.join(get_results_dir(), filename)
+    
+    if os.path.isfile(result_path):
+        # 更新访问时间，用于缓存淘汰
+        os.utime(result_path)
+        return result_path
+    
+    sidecar_path = _sidecar_path(result_path)
+    if not filename.endswith('.jpg') or not os.path.exists(sidecar_path):
+        return None
+    
+    with open(sidecar_path) as f:
+        record = json.load(f)
+    
+    img = _read_source(record['source'])
+    if img is None:
+        return None
+    
+    img = compile_preprocessing(record['preprocessing'])(img)
+    data = np.array(record['detections'], dtype=np.float32).reshape(-1, 6)
+    names = {int(class_id): name for class_id, name in record['names'].items()}
+    
+    _write_atomic(result_path, draw_detections(img, data, names))
+    enforce_cache_limit(os.path.getsize(result_path))
+    
+    return result_path
+
+def enforce_cache_limit(written=0):
+    """按访问时间淘汰懒绘制生成的结果图像，使其与检测记录的总大小不超过上限
+
+    只淘汰仍保留检测记录的图像，它们在下次请求时可以重新绘制；检测记录计入总大小，
+    但只随历史记录删除。不是每次绘制都扫描目录：只在估计的总大小（上次扫描的结果
+    加本进程此后写入的字节数）超出上限，或距上次扫描超过 CACHE_SCAN_INTERVAL 秒时扫描。
+    """
+    max_bytes = current_app.config.get('RESULT_CACHE_MAX_MB', 512) * 1024 * 1024
+    if max_bytes <= 0:
+        return
+    
+    results_dir = get_results_dir()
+    now = time.time()
+    with _cache_lock:
+        state = _cache_state.setdefault(results_dir, [0, 0, 0.0])
+        state[1] += written
+        scanned, pending, last_scan = state
+        # 上次扫描后仍超出上限（没有可淘汰的图像）时，只按间隔重新扫描
+        over_limit = scanned <= max_bytes < scanned + pending
+        if not over_limit and now - last_scan < CACHE_SCAN_INTERVAL:
+            return
+        state[1:] = [0, now]
+    
+    rendered = []
+    total = 0
+    for entry in os.scandir(results_dir):
+        if '.tmp.' in entry.name:
+            continue
+        if entry.name.endswith('.json'):
+            total += entry.stat().st_size
+            continue
+        if not entry.name.endswith('.jpg') or not os.path.exists(_sidecar_path(entry.path)):
+            continue
+        stat = entry.stat()
+        rendered.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+    
+    for mtime, size, path in sorted(rendered):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    
+    with _cache_lock:
+        state[0] = total
+
+def copy_result_files(result_path, source_path=None):
+    """为另一条检测记录复制结果图像及其检测记录，返回新的结果路径
+
+    图像使用硬链接（文件系统不支持时复制），删除任一条记录只删除它自己的文件。
+    复制的检测记录改为引用 source_path（新记录自己保存的原图）；未提供时先绘制出
+    图像，使新记录不依赖原记录的原图。
+    """
+    new_path = _new_result_path()
+    sidecar_path = _sidecar_path(result_path)
+    has_sidecar = os.path.exists(sidecar_path)
+    if has_sidecar and not source_path and not os.path.isfile(result_path):
+        render_result_image(os.path.basename(result_path))
+    
+    if os.path.isfile(result_path):
+        try:
+            os.link(result_path, new_path)
+        except FileNotFoundError:
+            # 刚被缓存淘汰，只要有检测记录就可以重新绘制
+            pass
+        except OSError:
+            shutil.copyfile(result_path, new_path)
+    
+    if has_sidecar:
+        with open(sidecar_path) as f:
+            record = json.load(f)
+        if source_path:
+            record['source'] = source_path
+        with open(_sidecar_path(new_path), 'w') as f:
+            json.dump(record, f)
+    
+    return new_path
+
+def result_image_available(result_path):
+    """结果图像已生成，或仍可以根据检测记录重新绘制"""
+    return os.path.isfile(result_path) or os.path.exists(_sidecar_path(result_path))
+
+def remove_result_files(result_path):
+    """删除结果图像及其检测记录"""
+    for path in (result_path, _sidecar_path(result_path)):
+        if path and os.path.exists(path):
+            os.remove(path)
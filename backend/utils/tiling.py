@@ -0,0 +1,75 @@
+import numpy as np
+
+# 分块推理参数的取值范围
+MIN_TILE_SIZE = 128
+MAX_TILE_SIZE = 4096
+MAX_TILE_OVERLAP = 0.5
+MAX_TILE_BATCH_SIZE = 64
+
+def normalize_tiling(tile_size, overlap, batch_size):
+    """校验分块参数，参数无效时抛出 ValueError"""
+    tile_size = int(tile_size)
+    overlap = float(overlap)
+    batch_size = int(batch_size)
+    if not MIN_TILE_SIZE <= tile_size <= MAX_TILE_SIZE:
+        raise ValueError(f"Tile size must be between {MIN_TILE_SIZE} and {MAX_TILE_SIZE}")
+    if not 0 <= overlap <= MAX_TILE_OVERLAP:
+        raise ValueError(f"Tile overlap must be between 0 and {MAX_TILE_OVERLAP}")
+    if not 1 <= batch_size <= MAX_TILE_BATCH_SIZE:
+        raise ValueError(f"Tile batch size must be between 1 and {MAX_TILE_BATCH_SIZE}")
+    return {"tile_size": tile_size, "overlap": overlap, "batch_size": batch_size}
+
+def tile_origins(length, tile_size, overlap_px):
+    """一个方向上各分块的起点，最后一块与边缘对齐"""
+    if length <= tile_size:
+        return [0]
+    step = max(1, tile_size - overlap_px)
+    origins = list(range(0, length - tile_size, step))
+    origins.append(length - tile_size)
+    return origins
+
+def iter_tiles(image, tile_size, overlap):
+    """逐个产生 (x0, y0, 分块)；分块是原图的视图，不复制像素"""
+    height, width = image.shape[:2]
+    overlap_px = int(tile_size * overlap)
+    for y0 in tile_origins(height, tile_size, overlap_px):
+        for x0 in tile_origins(width, tile_size, overlap_px):
+            yield x0, y0, image[y0:y0 + tile_size, x0:x0 + tile_size]
+
+def iter_batches(items, batch_size):
+    """把迭代器按 batch_size 分组，任何时刻只持有一个批次"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def non_max_suppression(data, iou_threshold=0.5):
+    """按类别的 NMS，合并相邻分块重叠区域中的重复检测
+
+    data 为 (N, 6) 检测数组（x1, y1, x2, y2, confidence, class_id），返回保留的行。
+    """
+    if len(data) == 0:
+        return data
+
+    # 按类别平移坐标，不同类别的框不会相交
+    offsets = data[:, 5:6] * (data[:, :4].max() + 1)
+    boxes = data[:, :4] + offsets
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-data[:, 4], kind='stable')
+
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter_w = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        inter_h = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return data[np.sort(keep)]
@@ -0,0 +1,143 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+
+# 每次从连接读取的块大小
+CHUNK_SIZE = 64 * 1024
+
+# 识别格式所需的最少字节数（WebP 需要 12 字节）
+SNIFF_BYTES = 12
+
+class FetchError(Exception):
+    """URL 下载失败（超时、过大、不是支持的图像格式等）"""
+
+def sniff_image_format(head):
+    """根据文件头魔数判断图像格式，不解码图像；不支持的格式返回 None"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if len(head) >= 12 and head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+class UrlFetcher:
+    """带连接池的图像下载器
+
+    同一主机的请求复用 keep-alive 连接；连接和读取分别设置超时，并限制
+    整个下载的总时长；响应体流式读取，超过 max_bytes 立即中止，读到文件头
+    即可判断格式，不是图像时不再继续下载。
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=3.0, read_timeout=10.0, total_timeout=30.0,
+                 max_bytes=10 * 1024 * 1024, max_workers=8):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_bytes = max_bytes
+        self.max_workers = max(1, int(max_workers))
+        self._pool_size = pool_size
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='url-fetch')
+
+    @property
+    def session(self):
+        # requests.Session 不保证线程安全，每个线程一个会话，各自维护连接池
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self._pool_size, pool_maxsize=self._pool_size, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def fetch(self, url):
+        """下载图像，返回 (字节数据, 图像格式)，失败时抛出 FetchError"""
+        if urlparse(url).scheme not in ('http', 'https'):
+            raise FetchError("Only http and https URLs are supported")
+
+        deadline = time.monotonic() + self.total_timeout
+        try:
+            with self.session.get(url, stream=True, timeout=(self.connect_timeout, self.read_timeout)) as response:
+                if response.status_code != 200:
+                    raise FetchError(f"Unexpected HTTP status {response.status_code}")
+
+                content_length = response.headers.get('Content-Length')
+                if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+                    raise FetchError("Image too large")
+
+                data = bytearray()
+                image_format = None
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    data += chunk
+                    if len(data) > self.max_bytes:
+                        raise FetchError("Image too large")
+                    if time.monotonic() > deadline:
+                        raise FetchError("Download timed out")
+                    if image_format is None and len(data) >= SNIFF_BYTES:
+                        image_format = sniff_image_format(bytes(data[:SNIFF_BYTES]))
+                        if image_format is None:
+                            raise FetchError("Unsupported image format")
+        except requests.Timeout:
+            raise FetchError("Download timed out")
+        except requests.RequestException as e:
+            raise FetchError(f"Download failed: {e}")
+
+        image_format = image_format or sniff_image_format(bytes(data))
+        if image_format is None:
+            raise FetchError("Unsupported image format")
+        return bytes(data), image_format
+
+    def _fetch_result(self, url):
+        try:
+            data, image_format = self.fetch(url)
+            return url, data, image_format, None
+        except FetchError as e:
+            return url, None, None, str(e)
+
+    def prefetch(self, urls):
+        """并发下载多个 URL，按输入顺序逐个产生 (url, 字节数据, 格式, 错误信息)
+
+        最多同时下载 max_workers 个，调用方处理当前结果时后面的 URL 已在下载，
+        内存中最多保留 max_workers 个下载结果。
+        """
+        urls = iter(urls)
+        in_flight = deque()
+        for url in urls:
+            in_flight.append(self._executor.submit(self._fetch_result, url))
+            if len(in_flight) >= self.max_workers:
+                break
+
+        while in_flight:
+            result = in_flight.popleft().result()
+            next_url = next(urls, None)
+            if next_url is not None:
+                in_flight.append(self._executor.submit(self._fetch_result, next_url))
+            yield result
+
+# 每个进程一个下载器
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+def get_url_fetcher():
+    """根据应用配置获取（或创建）URL 下载器"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            config = current_app.config
+            _fetcher = UrlFetcher(
+                pool_size=config['URL_FETCH_POOL_SIZE'],
+                connect_timeout=config['URL_FETCH_CONNECT_TIMEOUT'],
+                read_timeout=config['URL_FETCH_READ_TIMEOUT'],
+                total_timeout=config['URL_FETCH_TOTAL_TIMEOUT'],
+                max_bytes=config['MAX_CONTENT_LENGTH'],
+                max_workers=config['URL_FETCH_CONCURRENCY']
+            )
+        return _fetcher
@@ -0,0 +1,91 @@
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+
+from models import db, User
+
+# 认证后的用户快照，只包含检测接口需要的字段；preferences 只读
+UserSnapshot = namedtuple('UserSnapshot', ['id', 'active', 'preferences'])
+
+class UserSnapshotCache:
+    """认证用户的进程内快照缓存
+
+    TTL 内不再查询用户表。用户资料或偏好更新时调用 invalidate() 立即失效；
+    其他 worker 进程中的快照最多在 TTL 后刷新。
+    """
+
+    def __init__(self, ttl=30, max_entries=10000):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(user_id)
+            if item is not None and now - item[1] > self.ttl:
+                del self._entries[user_id]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return item[0]
+
+    def put(self, user_id, snapshot):
+        with self._lock:
+            self._entries[user_id] = (snapshot, time.time())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0
+            }
+
+# 每个进程一份缓存，首次使用时根据应用配置创建
+_cache = None
+_lock = threading.Lock()
+
+def get_user_cache():
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = UserSnapshotCache(
+                ttl=current_app.config['USER_CACHE_TTL'],
+                max_entries=current_app.config['USER_CACHE_ENTRIES']
+            )
+        return _cache
+
+def get_user_snapshot(user_id):
+    """获取用户快照，缓存未命中时查询数据库；用户不存在时返回 None"""
+    user_id = int(user_id)
+    cache = get_user_cache()
+    snapshot = cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot(user.id, bool(user.active), dict(user.preferences or {}))
+        cache.put(user_id, snapshot)
+    return snapshot
+
+def invalidate_user(user_id):
+    """用户资料或偏好更新后调用，使该用户的快照失效"""
+    get_user_cache().invalidate(int(user_id))
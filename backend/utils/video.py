@@ -0,0 +1,197 @@
+import cv2
+import numpy as np
+
+from utils.detection_utils import infer_detections, format_detections
+from utils.quantization import box_iou_matrix
+
+VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
+
+# 场景变化检测使用的缩略图尺寸和直方图桶数
+SCENE_THUMBNAIL_SIZE = (64, 36)
+SCENE_HISTOGRAM_BINS = 32
+
+# 相邻采样帧之间的框 IoU 达到该值才视为同一目标
+TRACK_IOU_THRESHOLD = 0.3
+
+def allowed_video(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in VIDEO_EXTENSIONS
+
+class SceneChangeDetector:
+    """用缩略图灰度直方图的 Bhattacharyya 距离判断场景是否变化"""
+
+    def __init__(self, threshold=0.3):
+        self.threshold = threshold
+        self._reference = None
+
+    def _histogram(self, frame):
+        thumbnail = cv2.resize(frame, SCENE_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        hist = cv2.calcHist([gray], [0], None, [SCENE_HISTOGRAM_BINS], [0, 256])
+        return cv2.normalize(hist, hist).flatten()
+
+    def changed(self, frame):
+        hist = self._histogram(frame)
+        if self._reference is None:
+            self._reference = hist
+            return True
+        return cv2.compareHist(self._reference, hist, cv2.HISTCMP_BHATTACHARYYA) > self.threshold
+
+    def reset(self, frame):
+        """以当前帧作为新的参照（每次采样后调用）"""
+        self._reference = self._histogram(frame)
+
+class VideoFrameSampler:
+    """流式解码视频并采样
+
+    逐帧产生 (帧序号, 图像)，未采样的帧图像为 None。interval 模式每 sample_every
+    帧采样一次，跳过的帧只 grab 不转换；scene 模式在场景变化时采样，且两次采样
+    之间最多间隔 sample_every 帧，保证跟踪插值的精度。
+    """
+
+    def __init__(self, path, sample_every=5, sampling='interval', scene_threshold=0.3, max_frames=0):
+        self.path = path
+        self.sample_every = max(1, int(sample_every))
+        self.sampling = sampling
+        self.scene_threshold = scene_threshold
+        self.max_frames = max_frames
+        self.fps = 0.0
+        self.truncated = False
+
+    def __iter__(self):
+        capture = cv2.VideoCapture(self.path)
+        if not capture.isOpened():
+            raise ValueError("Invalid or unsupported video")
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+
+        detector = SceneChangeDetector(self.scene_threshold) if self.sampling == 'scene' else None
+        index = 0
+        last_sample = None
+        try:
+            while True:
+                if self.max_frames and index >= self.max_frames:
+                    self.truncated = capture.grab()
+                    return
+
+                due = last_sample is None or index - last_sample >= self.sample_every
+                if detector is None and not due:
+                    # 不需要像素的帧只解复用/解码，不做颜色转换
+                    if not capture.grab():
+                        return
+                    yield index, None
+                    index += 1
+                    continue
+
+                ok, frame = capture.read()
+                if not ok:
+                    return
+                if due or detector.changed(frame):
+                    if detector is not None:
+                        detector.reset(frame)
+                    last_sample = index
+                    yield index, frame
+                else:
+                    yield index, None
+                index += 1
+        finally:
+            capture.release()
+
+class IouTracker:
+    """基于相邻采样帧 IoU 的简单跟踪器，为检测框分配 track_id"""
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD):
+        self.iou_threshold = iou_threshold
+        self.next_id = 1
+        self._data = np.zeros((0, 6), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+
+    def update(self, data):
+        ids = np.zeros(len(data), dtype=np.int64)
+        if len(data) and len(self._data):
+            ious = box_iou_matrix(data, self._data)
+            ious[data[:, 5][:, None] != self._data[:, 5][None, :]] = 0
+            # 按置信度从高到低贪心匹配
+            for i in np.argsort(-data[:, 4]):
+                j = int(ious[i].argmax())
+                if ious[i, j] >= self.iou_threshold:
+                    ids[i] = self._ids[j]
+                    ious[:, j] = 0
+        for i in np.where(ids == 0)[0]:
+            ids[i] = self.next_id
+            self.next_id += 1
+
+        self._data, self._ids = data, ids
+        return ids
+
+def interpolate_tracks(start, end, alpha):
+    """在两个采样帧之间线性插值同一 track 的框和置信度
+
+    start、end 为 (检测数组, track_ids)，只保留两帧中都出现的 track。
+    """
+    start_data, start_ids = start
+    end_data, end_ids = end
+    common, start_index, end_index = np.intersect1d(start_ids, end_ids, return_indices=True)
+    data = start_data[start_index].copy()
+    data[:, :5] += (end_data[end_index, :5] - data[:, :5]) * alpha
+    return data, common
+
+def format_frame(data, track_ids, names, result_format='objects'):
+    """格式化一帧的检测结果并附加 track_id"""
+    results = format_detections(data, names, result_format)
+    track_ids = track_ids.tolist()
+    if result_format == 'columnar':
+        results['track_id'] = track_ids
+    else:
+        for obj, track_id in zip(results, track_ids):
+            obj['track_id'] = track_id
+    return results
+
+def detect_video(sampler, model_name, confidence, batch_size=8, transform=None, stats=None):
+    """对视频执行检测，按帧顺序逐帧产生结果
+
+    只有采样帧送入模型（按 batch_size 组批），跳过的帧用前后两个采样帧的
+    跟踪结果插值；最后一个采样帧之后的帧沿用其结果。内存中最多保留一个
+    批次的采样帧。产生的字典包含 frame、sampled、data、track_ids、names；
+    stats 中累计帧数、采样帧数和推理耗时。
+    """
+    tracker = IouTracker()
+    stats = stats if stats is not None else {}
+    stats.update({"frames": 0, "sampled_frames": 0, "processing_time": 0.0})
+    state = {"previous": None, "names": {}}
+
+    def flush(batch):
+        images = [transform(frame) if transform else frame for _, frame, _ in batch]
+        detections, names, processing_time = infer_detections(model_name, images, confidence)
+        state['names'] = names
+        stats['processing_time'] += processing_time
+        stats['sampled_frames'] += len(batch)
+
+        for (index, _, skipped), data in zip(batch, detections):
+            current = (data, tracker.update(data))
+            previous = state['previous']
+            for skipped_index in skipped:
+                alpha = (skipped_index - previous[0]) / (index - previous[0])
+                interpolated, ids = interpolate_tracks(previous[1], current, alpha)
+                yield {"frame": skipped_index, "sampled": False, "data": interpolated, "track_ids": ids, "names": names}
+            yield {"frame": index, "sampled": True, "data": data, "track_ids": current[1], "names": names}
+            state['previous'] = (index, current)
+
+    batch = []
+    skipped = []
+    for index, frame in sampler:
+        stats['frames'] += 1
+        if frame is None:
+            skipped.append(index)
+            continue
+        batch.append((index, frame, skipped))
+        skipped = []
+        if len(batch) >= batch_size:
+            yield from flush(batch)
+            batch = []
+    if batch:
+        yield from flush(batch)
+
+    # 最后一个采样帧之后的帧沿用其结果
+    if state['previous'] is not None:
+        data, ids = state['previous'][1]
+        for index in skipped:
+            yield {"frame": index, "sampled": False, "data": data, "track_ids": ids, "names": state['names']}